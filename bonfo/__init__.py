@@ -4,5 +4,19 @@ __author__ = """Patrick Forringer"""
 __email__ = "patrick@forringer.com"
 __version__ = "0.1.0"
 
-from .board import Board  # noqa
-from .profile import Profile  # noqa
+from typing import Any
+
+__all__ = ["Board", "Profile"]
+
+
+def __getattr__(name: str) -> Any:
+    # Board and Profile pull in the serial and fields modules, only import them when used
+    if name == "Board":
+        from .board import Board
+
+        return Board
+    if name == "Profile":
+        from .profile import Profile
+
+        return Profile
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
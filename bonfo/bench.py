@@ -0,0 +1,173 @@
+"""Latency and throughput benchmarks of board requests."""
+from __future__ import annotations
+
+import asyncio
+import math
+import platform
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Sequence, Tuple, Type
+
+from construct import ChecksumError
+
+from . import __version__
+from .exceptions import MessageError
+from .msp.fields.base import MSPFields
+from .msp.fields.sensors import Attitude
+from .msp.fields.statuses import ApiVersion, RawIMU, StatusEx
+
+if TYPE_CHECKING:
+    from .board import Board
+
+
+__all__ = ["BenchResult", "run_bench", "bench_report", "BENCH_FIELDS", "MODES"]
+
+BENCH_FIELDS: Tuple[Type[MSPFields], ...] = (ApiVersion, StatusEx, Attitude, RawIMU)
+MODES = ("single", "concurrent", "batch")
+# a request failing with these is counted as a failure, a bad link shouldn't end the run
+REQUEST_ERRORS = (ChecksumError, MessageError, asyncio.TimeoutError)
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest rank percentile, q between 0 and 100."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(q * len(ordered) / 100), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class BenchResult:
+    """Timings of one message in one mode, latencies are in milliseconds.
+
+    Batch mode times whole batches, its latencies are per batch while requests
+    counts every message in them. Failures count requests without an answer, or whose answer
+    was corrupt or for another message, a failed batch counts all of its requests.
+    """
+
+    message: str
+    mode: str
+    requests: int
+    failures: int
+    seconds: float
+    requests_per_second: float
+    p50: float
+    p95: float
+    p99: float
+
+    @classmethod
+    def from_samples(
+        cls, fields: Type[MSPFields], mode: str, latencies: List[float], requests: int, failures: int, seconds: float
+    ) -> "BenchResult":
+        return cls(
+            message=fields.__name__,
+            mode=mode,
+            requests=requests,
+            failures=failures,
+            seconds=seconds,
+            requests_per_second=requests / seconds if seconds else 0.0,
+            p50=percentile(latencies, 50) * 1000,
+            p95=percentile(latencies, 95) * 1000,
+            p99=percentile(latencies, 99) * 1000,
+        )
+
+
+async def bench_single(board: "Board", fields: Type[MSPFields], requests: int) -> BenchResult:
+    """One request at a time, the round trip of every request."""
+    latencies, failures = [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        sent = time.perf_counter()
+        try:
+            result = await board.get(fields)
+        except REQUEST_ERRORS:
+            result = None
+        latencies.append(time.perf_counter() - sent)
+        failures += result is None
+    return BenchResult.from_samples(fields, "single", latencies, requests, failures, time.perf_counter() - started)
+
+
+async def bench_concurrent(board: "Board", fields: Type[MSPFields], requests: int, concurrency: int) -> BenchResult:
+    """Requests from several tasks at once, latency includes waiting for the link."""
+    latencies: List[float] = []
+    failures = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            sent = time.perf_counter()
+            try:
+                result = await board.get(fields)
+            except REQUEST_ERRORS:
+                result = None
+            latencies.append(time.perf_counter() - sent)
+            failures += result is None
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return BenchResult.from_samples(fields, "concurrent", latencies, requests, failures, time.perf_counter() - started)
+
+
+async def bench_batch(board: "Board", fields: Type[MSPFields], requests: int, batch: int) -> BenchResult:
+    """Pipelined batches of requests, see Board.get_many."""
+    latencies, failures, sent_requests = [], 0, 0
+    started = time.perf_counter()
+    while sent_requests < requests:
+        size = min(batch, requests - sent_requests)
+        sent = time.perf_counter()
+        try:
+            results = await board.get_many(*[fields] * size)
+        except REQUEST_ERRORS:
+            results = [None] * size
+        latencies.append(time.perf_counter() - sent)
+        failures += sum(result is None for result in results)
+        sent_requests += size
+    return BenchResult.from_samples(fields, "batch", latencies, requests, failures, time.perf_counter() - started)
+
+
+async def run_bench(
+    board: "Board",
+    fields: Iterable[Type[MSPFields]] = BENCH_FIELDS,
+    modes: Iterable[str] = MODES,
+    requests: int = 100,
+    concurrency: int = 8,
+    batch: int = 8,
+    warmup: int = 5,
+) -> List[BenchResult]:
+    """Benchmark every message in every mode, after a few untimed warm up requests each."""
+    results = []
+    for bench_fields in fields:
+        for _ in range(warmup):
+            try:
+                await board.get(bench_fields)
+            except REQUEST_ERRORS:
+                pass
+        for mode in modes:
+            if mode == "single":
+                results.append(await bench_single(board, bench_fields, requests))
+            elif mode == "concurrent":
+                results.append(await bench_concurrent(board, bench_fields, requests, concurrency))
+            elif mode == "batch":
+                results.append(await bench_batch(board, bench_fields, requests, batch))
+            else:
+                raise ValueError(f"Unknown bench mode {mode}, expected one of {', '.join(MODES)}")
+    return results
+
+
+def bench_report(board: "Board", results: Iterable[BenchResult], **settings: Any) -> Dict[str, Any]:
+    """JSON ready report of results with what they were measured on, to compare runs."""
+    return dict(
+        bonfo=__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        created=datetime.now(timezone.utc).isoformat(),
+        device=board.device,
+        baudrate=board.baudrate,
+        msp=str(board.msp_version) if board.msp_version is not None else None,
+        settings=settings,
+        results=[asdict(result) for result in results],
+    )
@@ -4,28 +4,48 @@ from __future__ import annotations
 import asyncio
 import logging
 from contextlib import asynccontextmanager
-from dataclasses import dataclass, field
-from typing import AsyncIterator, Coroutine, Iterable, Optional
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Coroutine, Iterable, List, Optional
 
-from construct import ConstError, StreamError
+from construct import ChecksumError, ConstError, StreamError
 from semver import VersionInfo
 from serial_asyncio import open_serial_connection, serial
 
-from bonfo.exceptions import BonfoOperatorException
+from bonfo.exceptions import BonfoOperatorException, MessageError
 
+from .board_cache import BoardCache
 from .msp.codes import MSP
 from .msp.fields.base import Direction
 from .msp.fields.pids import MSPFields
-from .msp.fields.statuses import ApiVersion, BoardInfo, BuildInfo, CombinedBoardInfo, FcVariant, FcVersion, Name, Uid
-from .msp.message import Data, Preamble
-from .msp.utils import msg_data, out_message_builder
+from .msp.fields.statuses import (
+    ApiVersion,
+    BoardInfo,
+    BuildInfo,
+    CombinedBoardInfo,
+    FcVariant,
+    FcVersion,
+    Name,
+    StatusEx,
+    Uid,
+)
+from .msp.cache import PayloadCache
+from .msp.checksum import ChecksumStats, xor_checksum
+from .msp.message import Preamble
+from .msp.utils import msp_name, out_message_builder, parse_payload
 from .profile import Profile
+from .transaction import Transaction
 
 logger = logging.getLogger(__name__)
 
 
 __all__ = ["Board"]
 
+# seconds without a byte from the board before a resync is done
+RESYNC_QUIET = 0.1
+RESYNC_READ_SIZE = 4096
+# seconds a reply's preamble, and then the rest of its frame, have to arrive in
+READ_TIMEOUT = 1.0
+
 
 @dataclass
 class Board:
@@ -36,8 +56,17 @@ class Board:
     initial_data: bool = True
     loop: Optional[asyncio.AbstractEventLoop] = None
     profile: Optional[Profile] = None
+    # optional memoization of decoded payloads that rarely change, see PayloadCache
+    payload_cache: Optional[PayloadCache] = None
+    # drop frames that fail their checksum instead of raising a ChecksumError
+    drop_corrupt: bool = False
+    # on disk cache of board identity to skip most of the bootstrap requests, see BoardCache
+    cache: Optional[BoardCache] = None
+    # seconds to wait for each part of a reply before raising asyncio.TimeoutError, None waits forever
+    read_timeout: Optional[float] = READ_TIMEOUT
 
     _ready_tasks: Iterable[Coroutine] = field(default_factory=lambda: list(), init=False, repr=False)
+    _sinks: List[Callable[[Any], Any]] = field(default_factory=lambda: list(), init=False, repr=False)
 
     def __post_init__(self) -> None:
         # board events
@@ -47,6 +76,11 @@ class Board:
         self.read_lock = asyncio.Lock()
         self.write_lock = asyncio.Lock()
         self.message_lock = asyncio.Lock()
+        # replies may be left unread on the link, see exchange
+        self.desynced = False
+
+        # received frame and checksum failure counts
+        self.checksum_stats = ChecksumStats()
 
         if self.loop is None:
             self.loop = asyncio.get_running_loop()
@@ -59,7 +93,9 @@ class Board:
         # TODO: handle assigning board to custom profiles
         if self.profile is None:
             self.profile = Profile(board=self)
-        self._ready_task(self.profile._check_connection())
+        if self.cache is None or not self.initial_data:
+            self._ready_task(self.profile._check_connection())
+        # otherwise the selected profiles are read along with the board info
 
         # TODO: register configs for saving/applying?
         # self.rx_conf = RxConfig()
@@ -70,6 +106,14 @@ class Board:
             self._ready_task(self.get_board_info())
         self.loop.create_task(self._run_ready_tasks())
 
+    def subscribe(self, sink: Callable[[Any], Any]) -> Callable[[], None]:
+        """Call sink with every decoded message the board sends, returns a function that unsubscribes it.
+
+        Sinks run while the response is being read, they should be quick, like appending to a TelemetryStore.
+        """
+        self._sinks.append(sink)
+        return lambda: self._sinks.remove(sink) if sink in self._sinks else None
+
     def _ready_task(self, coro: Coroutine) -> None:
         self._ready_tasks.append(coro)  # type:ignore
 
@@ -79,13 +123,24 @@ class Board:
 
     async def get_board_info(self) -> CombinedBoardInfo:
         await self.connected.wait()
-        name = await (self > Name)
-        api = await (self > ApiVersion)
-        version = await (self > FcVersion)
-        build_info = await (self > BuildInfo)
-        board_info = await (self > BoardInfo)
-        variant = await (self > FcVariant)
-        uid = await (self > Uid)
+        if self.cache is not None:
+            # one pipelined exchange checks the cache and reads the selected profiles
+            uid, build_info, name, status = await self.get_many(Uid, BuildInfo, Name, StatusEx)
+            self.profile._sync_from_status(status)  # type:ignore
+            cached = self.cache.load(uid, build_info)
+            if cached is not None:
+                self.info = replace(cached, name=name)
+                return self.info
+            # a miss only needs what the first exchange didn't read
+            api, version, board_info, variant = await self.get_many(ApiVersion, FcVersion, BoardInfo, FcVariant)
+        else:
+            name = await (self > Name)
+            api = await (self > ApiVersion)
+            version = await (self > FcVersion)
+            build_info = await (self > BuildInfo)
+            board_info = await (self > BoardInfo)
+            variant = await (self > FcVariant)
+            uid = await (self > Uid)
         self.info = CombinedBoardInfo(
             name,
             api,
@@ -95,6 +150,8 @@ class Board:
             variant,
             uid,
         )
+        if self.cache is not None:
+            self.cache.store(self.info)
         return self.info
 
     @property
@@ -160,55 +217,125 @@ class Board:
             finally:
                 logger.debug("sent: %s %s", code, buff)
 
-    async def receive_msg(self):
+    async def receive_msg(self, lazy=False, compact=False):
         """Read the current line from the serial port and parse the MSP message.
 
         Parse the message and return a construct Container.
 
+        Args:
+            lazy (bool, optional): Keep the raw payload and decode fields on first access. Defaults to False.
+            compact (bool, optional): Return slotted, read only, fields for high rate polling. Defaults to False.
+
         Returns:
             Container | None: Containter holding the message data, or None on no data.
         """
         # "All this because reader.readline wasn't working... :/"
         async with self.read_lock:
-            preamble_bytes = await self.reader.read(5)
+            preamble_bytes = await self._read_exactly(Preamble.sizeof())
 
             try:
                 preamble = Preamble.parse(preamble_bytes)
             except (StreamError, ConstError) as e:
                 logger.exception("Error with preamble bytes", exc_info=e)
+                # the rest of the frame is still on the link
+                self.desynced = True
                 return None, None
-            logger.debug(
-                "received: preamble code %s (%s): %s", MSP(preamble.frame_id), preamble.data_length, preamble_bytes
-            )
-            if preamble.data_length > 0:
-                total_length = preamble.data_length + 1
-                data_bytes = await self.reader.read(total_length)
-                all_bytes = preamble_bytes + data_bytes
-                data_bytes = preamble_bytes[3:5] + data_bytes
-                logger.debug("all bytes: %s", all_bytes)
-                msp = self.msp_version
-                msg = Data.parse(data_bytes, msp=msp)
-                data = msg_data(msg)
-                logger.debug("msp: %s fields: %s", msp, data)
-                return preamble, data
-            else:
-                # read last crc byte
-                # TODO: fix message struct as to actually perform crc when receiving messages
-                await self.reader.read(1)
-
-            return preamble, None
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "received: preamble code %s (%s): %s",
+                    msp_name(preamble.frame_id),
+                    preamble.data_length,
+                    preamble_bytes,
+                )
+            # payload and the trailing crc byte
+            data_bytes = await self._read_exactly(preamble.data_length + 1)
+            logger.debug("all bytes: %s", preamble_bytes + data_bytes)
+            payload, crc = data_bytes[:-1], data_bytes[-1:]
+            checksum = xor_checksum(preamble_bytes[3:5] + payload)
+            valid = len(data_bytes) == preamble.data_length + 1 and crc[0] == checksum
+            self.checksum_stats.record(preamble.frame_id, valid)
+            if not valid:
+                message = f"wrong checksum for {msp_name(preamble.frame_id)}, read {crc!r}, computed {checksum:#04x}"
+                if not self.drop_corrupt:
+                    raise ChecksumError(message)
+                logger.warning("Dropping frame: %s", message)
+                self.checksum_stats.dropped += 1
+                return preamble, None
+
+            msp = self.msp_version
+            parse = parse_payload if self.payload_cache is None else self.payload_cache.parse
+            data = parse(preamble.frame_id, payload, lazy=lazy, compact=compact, msp=msp)
+            logger.debug("msp: %s fields: %s", msp, data)
+            if data is not None:
+                for sink in self._sinks:
+                    try:
+                        sink(data)
+                    except Exception as e:
+                        logger.exception("Error in message sink %s", sink, exc_info=e)
+            return preamble, data
+
+    async def _read_exactly(self, size: int) -> bytes:
+        """Read size bytes however the link splits them, fewer only when it closed part way."""
+        try:
+            return await asyncio.wait_for(self.reader.readexactly(size), self.read_timeout)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+
+    async def resync(self, quiet: float = RESYNC_QUIET) -> int:
+        """Drop everything the board sends until it has been quiet for quiet seconds.
+
+        Returns:
+            int: bytes dropped
+        """
+        dropped = 0
+        async with self.read_lock:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(self.reader.read(RESYNC_READ_SIZE), quiet)
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                dropped += len(chunk)
+        self.desynced = False
+        if dropped:
+            logger.warning("Dropped %s bytes of unread replies from %s", dropped, self.device)
+        return dropped
+
+    @asynccontextmanager
+    async def exchange(self) -> AsyncIterator["Board"]:
+        """Hold the message lock for a request and reply exchange.
+
+        When an exchange fails, replies to its requests may still be on their way. The link is
+        resynced before the next exchange, so they can't be taken for that exchange's replies.
+        """
+        async with self.message_lock:
+            if self.desynced:
+                await self.resync()
+            try:
+                yield self
+            except BaseException:
+                self.desynced = True
+                raise
+
+    def _check_reply(self, code: int, pre: Any) -> None:
+        if pre is not None and pre.frame_id != code:
+            raise MessageError(f"Expected a reply to {msp_name(code)}, received {msp_name(pre.frame_id)}")
 
     async def send_receive(self, code: MSP, fields):
         # TODO: Use an asyncio Queue to make sure the send/receive happens consecutively?
-        async with self.message_lock:
+        async with self.exchange():
             await self.send_msg(code, fields=fields)
             return await self.receive_msg()
 
-    async def get(self, fields):
+    async def get(self, fields, lazy=False, compact=False):
         """Get data from the board with optional fields values.
 
         Args:
             fields (Fields): The un-initialized or MSPFields instance with values.
+            lazy (bool, optional): Only decode the fields of the response when they are accessed. Defaults to False.
+            compact (bool, optional): Return a slotted CompactFields result, see MSPFields.get_compact_type.
+                Defaults to False.
 
         Returns:
             DataclassStruct: The data class instance related to the get request
@@ -216,16 +343,46 @@ class Board:
         assert fields.get_direction() in [Direction.OUT, Direction.BOTH]
         assert fields.get_code is not None
 
-        async with self.message_lock:
+        async with self.exchange():
             await self.send_msg(fields.get_code)
-            pre, data = await self.receive_msg()
+            pre, data = await self.receive_msg(lazy=lazy, compact=compact)
             if pre is None:
                 return None
-            # assert code received is the same get_code
-            assert fields.get_code == pre.frame_id
-            # TODO: raise error if preamble received is an error
+            self._check_reply(fields.get_code, pre)
             return data
 
+    async def get_many(self, *fields, lazy=False, compact=False) -> List[Any]:
+        """Get several fields from the board in one pipelined exchange.
+
+        Every request is written before any response is read, so the link isn't idle
+        waiting on a round trip per message. The board answers in request order. If reading
+        fails part way, the replies still on the link are dropped before the next exchange.
+
+        Args:
+            fields (Fields): The un-initialized or MSPFields instances to request.
+            lazy (bool, optional): Only decode the fields of the responses when they are accessed. Defaults to False.
+            compact (bool, optional): Return slotted CompactFields results. Defaults to False.
+
+        Returns:
+            List[DataclassStruct]: The data class instances, in the same order as the requested fields
+
+        Raises:
+            MessageError: a reply was for a different message than was requested.
+        """
+        for requested in fields:
+            assert requested.get_direction() in [Direction.OUT, Direction.BOTH]
+            assert requested.get_code is not None
+
+        results: List[Any] = []
+        async with self.exchange():
+            for requested in fields:
+                await self.send_msg(requested.get_code)
+            for requested in fields:
+                pre, data = await self.receive_msg(lazy=lazy, compact=compact)
+                self._check_reply(requested.get_code, pre)
+                results.append(data)
+        return results
+
     async def set(self, fields):
         """Sends a set message to the board with the values of the given fields.
 
@@ -234,20 +391,60 @@ class Board:
 
         Returns:
             DataclassStruct: The data class instance related to the set request
+
+        Raises:
+            MessageError: the board refused the set, or didn't acknowledge it.
         """
         assert fields.get_direction() in [Direction.IN, Direction.BOTH]
         assert fields.set_code is not None
 
-        async with self.message_lock:
+        async with self.exchange():
             await self.send_msg(fields.set_code, fields=fields)
             pre, data = await self.receive_msg()
             if pre is None:
-                return None
-            # assert code received is the same set_code
-            assert fields.set_code == pre.frame_id
-            # TODO: raise error if preamble received is an error
+                raise MessageError(f"No acknowledgement of {msp_name(fields.set_code)}")
+            self._check_reply(fields.set_code, pre)
+            if pre.message_type == "ERR":
+                raise MessageError(f"The board refused {msp_name(fields.set_code)}")
             return data
 
+    async def set_many(self, *fields) -> List[Any]:
+        """Send several set messages in one pipelined exchange.
+
+        Args:
+            fields (Fields): MSPFields instances with values.
+
+        Returns:
+            List[Container]: The preamble of each acknowledgement, None where nothing was received,
+                in the same order as the fields
+        """
+        for requested in fields:
+            assert requested.get_direction() in [Direction.IN, Direction.BOTH]
+            assert requested.set_code is not None
+
+        acks: List[Any] = []
+        async with self.exchange():
+            for requested in fields:
+                await self.send_msg(requested.set_code, fields=requested)
+            for requested in fields:
+                pre, _ = await self.receive_msg()
+                acks.append(pre)
+        return acks
+
+    @asynccontextmanager
+    async def transaction(self, verify: bool = False) -> AsyncIterator[Transaction]:
+        """Stage set messages and commit them together with a single EepromWrite.
+
+        Sets are sent when the context exits, nothing is sent if the body raises.
+        If any set fails, the values it replaced are restored and a TransactionError is raised.
+
+        Args:
+            verify (bool, optional): Read each set back and compare before saving. Defaults to False.
+        """
+        transaction = Transaction(self, verify=verify)
+        yield transaction
+        await transaction.commit()
+
     async def __gt__(self, other):
         """Get data from the board with the > operator."""
         if isinstance(other, MSPFields) or issubclass(other, MSPFields):
@@ -0,0 +1,64 @@
+"""Persistent cache of static board identity, keyed by board UID and firmware build."""
+from __future__ import annotations
+
+import logging
+import shelve
+from dataclasses import replace
+from os import PathLike
+from typing import Optional, Union
+
+from .msp.fields.statuses import BuildInfo, CombinedBoardInfo, Uid
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["BoardCache"]
+
+
+def cache_key(uid: Uid, build: BuildInfo) -> str:
+    """Boards are identified by their UID, the firmware by its git hash and build time."""
+    board_id = "".join(f"{part:08x}" for part in uid.uid)
+    return f"{board_id}:{build.git_hash}:{build.date_time}"
+
+
+class BoardCache:
+    """On disk cache of the board info that only changes when the board is flashed.
+
+    Reconnecting to a known board reads its Uid, BuildInfo, Name and StatusEx in one pipelined
+    exchange, the rest of the CombinedBoardInfo comes from here. A new firmware build is a new key.
+
+    Args:
+        path (PathLike): Shelve file to store cached boards in.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        self.path = str(path)
+
+    def load(self, uid: Optional[Uid], build: Optional[BuildInfo]) -> Optional[CombinedBoardInfo]:
+        if uid is None or build is None:
+            return None
+        try:
+            with shelve.open(self.path, flag="c") as store:
+                info = store.get(cache_key(uid, build))
+        except Exception as e:
+            logger.exception("Error loading board cache", exc_info=e)
+            return None
+        if info is None:
+            return None
+        logger.debug("Loaded cached board info for %s", uid)
+        return replace(info, uid=uid, build=build)
+
+    def store(self, info: CombinedBoardInfo) -> None:
+        if info.uid is None or info.build is None:
+            return
+        # the name can be changed without flashing, it's always read from the board
+        info = replace(info, name=None)
+        try:
+            with shelve.open(self.path, flag="c") as store:
+                store[cache_key(info.uid, info.build)] = info
+        except Exception as e:
+            logger.exception("Error saving board cache", exc_info=e)
+
+    def clear(self) -> None:
+        with shelve.open(self.path, flag="n"):
+            pass
@@ -1,26 +1,27 @@
-"""Console script for bonfo."""
+"""Console script for bonfo.
+
+Only click is imported up front, so `--help` and shell completion stay fast. Commands
+import the board, fields and rich modules they use when they run, and the state store
+is opened the first time a command needs it.
+"""
 
-import asyncio
 import atexit
 import functools
 import logging
 import os
-import shelve
 import sys
 from dataclasses import dataclass
-from typing import Optional, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Sequence
 
 import rich_click as click
-from click import Abort
-from construct import StreamError
-from loca import Loca
-from rich import print
-from serial.tools.list_ports import comports
-from serial.tools.list_ports_common import ListPortInfo
 
-from bonfo.board import Board
-from bonfo.msp.codes import MSP
-from bonfo.msp.fields.boxes import BoxIds
+if TYPE_CHECKING:
+    from serial.tools.list_ports_common import ListPortInfo
+
+    from bonfo.board import Board
+    from bonfo.daemon import DaemonClient
+    from bonfo.store import SnapshotStore
 
 click.rich_click.USE_MARKDOWN = True
 click.rich_click.SHOW_ARGUMENTS = True
@@ -28,33 +29,76 @@ click.rich_click.GROUP_ARGUMENTS_OPTIONS = True
 
 logger = logging.getLogger(__name__)
 
-logging.basicConfig(
-    format="[%(levelname)s] [%(asctime)s]: %(message)s", level=getattr(logging, "DEBUG"), stream=sys.stdout
-)
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
 
 # config things
 # TODO: use datawizard instead, and init the board/port via property.
-try:
-    loca = Loca()
-    path = loca.user.state.config()
+@functools.lru_cache(maxsize=None)
+def state_dir() -> Path:
+    """Directory of the CLI's state, created on first use."""
+    from loca import Loca
+
+    path = Loca().user.state.config()
     if isinstance(path, list):
         path = path.pop()
     bonfo_state_dir = path / "bonfo"
-    state_file = str(bonfo_state_dir / "cli_state")
-    os.makedirs(bonfo_state_dir)
-except FileExistsError:
-    pass
-finally:
-    logger.debug("State file: %s", state_file)
+    os.makedirs(bonfo_state_dir, exist_ok=True)
+    return bonfo_state_dir
+
+
+def board_cache_file() -> str:
+    return str(state_dir() / "boards")
+
+
+def daemon_socket() -> str:
+    from bonfo.daemon import SOCKET_NAME
+
+    return str(state_dir() / SOCKET_NAME)
+
+
+def daemon_device() -> Optional[str]:
+    """Device the running board daemon holds open, None when no daemon is running."""
+    from bonfo.daemon import daemon_client
+    from bonfo.exceptions import DaemonError
+
+    client = daemon_client(daemon_socket())
+    if client is None:
+        return None
     try:
-        state_store = shelve.open(state_file, flag="c")
-    except Exception as e:
-        logger.exception("Error loading state", exc_info=e)
+        with client:
+            return client.request("status")["device"]
+    except DaemonError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def state_store() -> "SnapshotStore":
+    """Snapshot store holding the CLI state, opened on first use."""
+    import shelve
+
+    from bonfo.store import SnapshotStore
+
+    state_file = str(state_dir() / "bonfo.db")
+    logger.debug("State file: %s", state_file)
+    store = SnapshotStore(state_file)
+    atexit.register(store.close)
+    # carry the selected port over from the shelve state file used previously
+    if store.get_state("port") is None:
+        try:
+            with shelve.open(str(state_dir() / "cli_state"), flag="r") as legacy:
+                if "port" in legacy:
+                    store.set_state("port", legacy["port"])
+        except Exception:
+            pass
+    return store
 
 
 def async_cmd(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        import asyncio
+
         return asyncio.run(func(*args, **kwargs))
 
     return wrapper
@@ -63,43 +107,88 @@ def async_cmd(func):
 @dataclass
 class BonfoContext:
     # TODO: hook/bring in state_store as a storage backend, possible change to data class and use the data class wizard?
-    port: Optional[ListPortInfo] = None
+    # send commands through a running board daemon when there is one
+    use_daemon: bool = True
     # Go this direction of only working on one rate/pid profile?
     # Profile to switch to
     # profile: = None
     # Rate profile to act on
     # rate_profile: = None
 
+    _port = None
     _board = None
 
     @property
-    def board(self) -> Optional[Board]:
+    def port(self) -> Optional["ListPortInfo"]:
+        if self._port is None:
+            self._port = state_store().get_state("port")
+        return self._port
+
+    @property
+    def board(self) -> Optional["Board"]:
+        """Board on the selected port, exits when the daemon has the port open.
+
+        Two processes reading the same port steal each other's bytes, commands the daemon doesn't
+        serve have to wait for it to be stopped.
+        """
         if self._board is None and self.port is not None:
+            from bonfo.board import Board
+            from bonfo.board_cache import BoardCache
+
             # TODO: instantiate board with stored values to do diffing?
             # Possibly on board connect, it grabs the uid of the board and hydrates from
             # last state that way?
-            self._board = Board(self.port.device)
+            if daemon_device() == self.port.device:
+                raise click.ClickException(
+                    f"The board daemon is running on {self.port.device}, stop it with `bonfo daemon stop` first"
+                )
+            self._board = Board(self.port.device, cache=BoardCache(board_cache_file()))
         return self._board
 
+    @property
+    def daemon(self) -> Optional["DaemonClient"]:
+        """Client of the running board daemon, None when not running or not wanted."""
+        if not self.use_daemon:
+            return None
+        from bonfo.daemon import daemon_client
+
+        return daemon_client(daemon_socket())
+
 
 bonfo_context = click.make_pass_decorator(BonfoContext)
 
 
 @click.group("bonfo")
+@click.option("--no-daemon", is_flag=True, help="don't send commands through a running board daemon")
+@click.option(
+    "-l",
+    "--log-level",
+    type=click.Choice(LOG_LEVELS, case_sensitive=False),
+    default="WARNING",
+    show_default=True,
+    envvar="BONFO_LOG_LEVEL",
+)
 @click.pass_context
-def cli(ctx):
+def cli(ctx, no_daemon, log_level):
     """Bonfo is configuration management for flight controllers running **MSP v1**.
 
     > Supported flight controller software:
     >  - BetaFlight(>=3.4)
     """
-    ctx.obj = BonfoContext(port=state_store.get("port", None))
+    logging.basicConfig(
+        format="[%(levelname)s] [%(asctime)s]: %(message)s",
+        level=getattr(logging, log_level.upper()),
+        stream=sys.stdout,
+    )
+    ctx.obj = BonfoContext(use_daemon=not no_daemon)
 
 
 @cli.command()
 @bonfo_context
 def check_context(ctx: BonfoContext):
     """Output current context values."""
+    from rich import print
+
     print(ctx.board)
     print(ctx.port)
 
@@ -110,6 +199,8 @@ def connect(ctx: BonfoContext):
     """Connect to the FC board."""
     if ctx.board is None:
         return click.echo("No port selected")
+    from bonfo.msp.codes import MSP
+
     with ctx.board.connect() as board:
         click.echo(board.send_msg(MSP.API_VERSION))
 
@@ -119,6 +210,10 @@ def connect(ctx: BonfoContext):
 @async_cmd
 async def test(ctx: BonfoContext):
     """Just me, testing things."""
+    from rich import print
+
+    from bonfo.msp.fields.boxes import BoxIds
+
     if ctx.board is None:
         return click.echo("No port selected")
     async with ctx.board.connect() as board:
@@ -156,28 +251,63 @@ async def test(ctx: BonfoContext):
 @bonfo_context
 @async_cmd
 async def msp_cli(ctx: BonfoContext):
-    """Drop into the MSP CLI."""
+    """Drop into the MSP CLI, leaving it with `exit` reboots the board."""
+    from click import Abort
+
+    from bonfo.passthrough import cli_session
+
     if ctx.board is None:
         return click.echo("No port selected")
     async with ctx.board.connect() as board:
-        board.writer.write(b"#")
-
         try:
-            while True:
-                cmd = click.prompt("$")
-                command = b"# " + cmd.encode("utf-8")
-                logger.debug(command)
-                board.writer.write(command)
-                line = await board.reader.readuntil()
-                print(line)
-        except (StreamError, Exception) as e:
-            logger.exception("Error in cli", exc_info=e)
-            logger.info("Exiting due to exception")
+            async with cli_session(board) as session:
+                while True:
+                    cmd = click.prompt("#", prompt_suffix=" ")
+                    if cmd.strip() == "exit":
+                        break
+                    async for line in session.stream(cmd):
+                        click.echo(line)
         except (KeyboardInterrupt, Abort) as e:
             logger.exception("Interrupted", exc_info=e)
             logger.info("Exiting CLI")
-        finally:
-            board.writer.write(b"exit\r")
+        except Exception as e:
+            logger.exception("Error in cli", exc_info=e)
+            logger.info("Exiting due to exception")
+
+
+@cli.command()
+@bonfo_context
+@click.option("-c", "--command", default="diff all", show_default=True, help="CLI command to capture, like `dump`")
+@click.option("--json", "as_json", is_flag=True, help="print the indexed settings as JSON instead of the raw output")
+@click.argument("file", type=click.File("w"), default="-")
+@async_cmd
+async def capture(ctx: BonfoContext, command, as_json, file):
+    """Capture the output of a CLI command like `diff all` to FILE, the board reboots afterwards.
+
+    Output is read as the board prints it, until the prompt comes back, and indexed into
+    settings, features and profile sections along the way.
+    """
+    import asyncio
+    import json
+    from dataclasses import asdict
+
+    from bonfo.passthrough import cli_session
+
+    if ctx.board is None:
+        return click.echo("No port selected")
+    lines: List[str] = []
+    async with ctx.board.connect() as board:
+        try:
+            async with cli_session(board) as session:
+                captured = await session.capture(command, lines=lines)
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.exception("Error in cli", exc_info=e)
+            return click.echo(f"Unable to capture {command}: {str(e) or type(e).__name__}")
+        if as_json:
+            json.dump(asdict(captured), file, indent=2)
+            file.write("\n")
+        else:
+            file.write("\n".join(lines) + "\n")
 
 
 @cli.group("profiles")
@@ -191,6 +321,11 @@ def profiles(ctx: BonfoContext):
 @async_cmd
 async def get(ctx: BonfoContext):
     """Get the PID and rate profile of the flight controller."""
+    daemon = ctx.daemon
+    if daemon is not None:
+        with daemon:
+            profile = daemon.request("profile")
+        return click.echo(f"pid: {profile['pid']} rate: {profile['rate']}")
     if ctx.board is None:
         return click.echo("No port selected")
     async with ctx.board.connect() as board:
@@ -204,6 +339,13 @@ async def get(ctx: BonfoContext):
 @async_cmd
 async def set(ctx: BonfoContext, pid, rate):
     """Set the PID or rate profile of the flight controller."""
+    daemon = ctx.daemon
+    if daemon is not None:
+        with daemon:
+            before = daemon.request("profile")
+            after = daemon.request("set_profile", pid=pid, rate=rate)
+        click.echo(f"Before: pid: {before['pid']} rate: {before['rate']}")
+        return click.echo(f"After: pid: {after['pid']} rate: {after['rate']}")
     if ctx.board is None:
         return click.echo("No port selected")
     async with ctx.board.connect() as board:
@@ -216,6 +358,80 @@ async def set(ctx: BonfoContext, pid, rate):
         click.echo(f"After: {board.profile}")
 
 
+@cli.group("daemon")
+def daemon():
+    """Keep the board connected in the background so commands skip the connection setup.
+
+    Once started, commands that support it are sent to the daemon instead of opening the port.
+    """
+    pass
+
+
+@daemon.command("start")
+@bonfo_context
+@async_cmd
+async def start_daemon(ctx: BonfoContext):
+    """Connect to the board and serve commands until stopped, run it in the background with `&`."""
+    from bonfo.daemon import BoardDaemon, daemon_client
+
+    if daemon_client(daemon_socket()) is not None:
+        return click.echo(f"Daemon already running at {daemon_socket()}")
+    if ctx.board is None:
+        return click.echo("No port selected")
+    async with ctx.board.connect() as board:
+        click.echo(f"Serving {board.device} on {daemon_socket()}")
+        await BoardDaemon(board, daemon_socket()).serve()
+
+
+@daemon.command("stop")
+def stop_daemon():
+    """Stop the running daemon, releasing the port."""
+    from bonfo.daemon import daemon_client
+
+    client = daemon_client(daemon_socket())
+    if client is None:
+        return click.echo("Daemon not running")
+    with client:
+        client.request("shutdown")
+    click.echo("Daemon stopped")
+
+
+@daemon.command("status")
+def daemon_status():
+    """Show whether the daemon is running and which board it serves."""
+    from bonfo.daemon import daemon_client
+
+    client = daemon_client(daemon_socket())
+    if client is None:
+        return click.echo("Daemon not running")
+    with client:
+        status = client.request("status")
+        info = client.request("info")
+    click.echo(f"Daemon {status['pid']} serving {status['device']} for {status['uptime']:.0f}s")
+    click.echo(f"{status['requests']} requests, board: {info}")
+
+
+@daemon.command("get")
+@click.argument("fields")
+@click.option("-p", "--pid", type=int, help="PID profile to read from")
+@click.option("-r", "--rate", type=int, help="rate profile to read from")
+def daemon_get(fields, pid, rate):
+    """Read a message by its fields name, like `FeatureConfig` or `RcTuning`, through the daemon."""
+    from rich import print
+
+    from bonfo.daemon import daemon_client
+    from bonfo.exceptions import DaemonError
+
+    client = daemon_client(daemon_socket())
+    if client is None:
+        return click.echo("Daemon not running")
+    try:
+        with client:
+            print(client.request("get", fields=fields, pid=pid, rate=rate))
+    except DaemonError as e:
+        click.echo(f"Error: {e}")
+
+
 @cli.group("config")
 @bonfo_context
 def config(ctx: BonfoContext):
@@ -225,12 +441,26 @@ def config(ctx: BonfoContext):
 
 @config.command()
 @bonfo_context
-@click.option("-c", "--check", type=bool)
+@click.option("-c", "--check", is_flag=True, help="only show what would change, don't write anything")
 @click.argument("file", type=click.File("r"))
-def apply(ctx: BonfoContext, check, file):
-    """Apply passed configuration."""
-    pass
-    # click.echo(BoardConf.from_yaml(file.read()))
+@async_cmd
+async def apply(ctx: BonfoContext, check, file):
+    """Apply passed configuration, writing only the messages that changed."""
+    from bonfo.config.apply import ApplyResult, apply_config
+    from bonfo.config.root import BoardConf
+
+    if ctx.board is None:
+        return click.echo("No port selected")
+    conf = BoardConf.from_yaml(file.read())
+    result: Optional[ApplyResult] = None
+    async with ctx.board.connect() as board:
+        result = await apply_config(board, conf, check=check)
+    if result is None:
+        return click.echo("Unable to apply configuration")
+    for change in result.plan.changes:
+        scope = f"pid {change.pid} " if change.pid else f"rate {change.rate} " if change.rate else ""
+        click.echo(f"{scope}{change.fields.__name__}: {', '.join(change.changed)}")
+    click.echo(f"{len(result.plan.changes)} changed, {result.plan.unchanged} unchanged")
 
 
 @config.command()
@@ -247,11 +477,29 @@ def create(ctx: BonfoContext, file):
 @cli.command()
 @bonfo_context
 @click.option("-s", "--include-links", is_flag=True, help="include entries that are symlinks to real devices")
-def set_port(cxt: BonfoContext, include_links, err=True):
-    """Set the default port to use during this session."""
+@click.option("-a", "--auto", is_flag=True, help="only offer ports with a flight controller answering on them")
+@click.option("-t", "--timeout", type=float, default=0.5, show_default=True, help="seconds each port has to answer")
+@async_cmd
+async def set_port(cxt: BonfoContext, include_links, auto, timeout, err=True):
+    """Set the default port to use during this session.
+
+    With `--auto` every port is probed at once, a single flight controller is selected without asking.
+    """
+    from serial.tools.list_ports import comports
+
     # TODO: let user know they are changing the port from the context if it changes
     # or show current as well
     iterator = sorted(comports(include_links=include_links))
+    if auto:
+        from bonfo.discovery import discover
+
+        found = {board.device: board for board in await discover([lpi.device for lpi in iterator], timeout=timeout)}
+        iterator = [lpi for lpi in iterator if lpi.device in found]
+        if not iterator:
+            return click.echo("No flight controllers found")
+        if len(iterator) == 1:
+            click.echo(f"Selected: {iterator[0]}, uid {found[iterator[0].device].uid_hex}")
+            return state_store().set_state("port", iterator[0])
     ports = {n: lpi for n, lpi in enumerate(iterator, 1)}
     for n, (port, desc, hwid) in ports.items():
         click.echo(f"{n}: {port}, {desc}, {hwid}")
@@ -259,23 +507,306 @@ def set_port(cxt: BonfoContext, include_links, err=True):
     try:
         selected = ports[port]
         click.echo(f"Selected: {selected}")
-        state_store["port"] = selected
+        state_store().set_state("port", selected)
     except IndexError:
         click.Abort()
 
 
 @cli.command()
-@click.pass_context
-def make_snapshot():
+@click.option("-s", "--include-links", is_flag=True, help="include entries that are symlinks to real devices")
+@click.option("-t", "--timeout", type=float, default=0.5, show_default=True, help="seconds each port has to answer")
+@click.option("--json", "as_json", is_flag=True, help="print the boards found as JSON")
+@click.argument("devices", nargs=-1)
+@async_cmd
+async def discover(include_links, timeout, as_json, devices):
+    """Find flight controllers by probing every serial port, or DEVICES, at the same time.
+
+    Each port is asked for its API version and UID, ports that don't answer within the
+    timeout are skipped, so discovery takes about as long as the slowest port.
+    """
+    from bonfo.discovery import discover as discover_boards
+
+    found = await discover_boards(devices or None, timeout=timeout, include_links=include_links)
+    if as_json:
+        import json
+
+        entries = [
+            dict(device=board.device, api=str(board.api.semver), uid=board.uid_hex, elapsed=board.elapsed)
+            for board in found
+        ]
+        return click.echo(json.dumps(entries, indent=2))
+    for board in found:
+        click.echo(f"{board.device}: api {board.api.semver}, uid {board.uid_hex}, answered in {board.elapsed:.3f}s")
+    click.echo(f"{len(found)} flight controllers found")
+
+
+@cli.command()
+@bonfo_context
+@click.argument("file", type=click.Path(dir_okay=False), required=False)
+@click.option("-w", "--window", type=int, help="requests in flight at once, defaults to 8")
+@click.option("--json", "as_json", is_flag=True, help="write FILE as JSON instead of the binary format")
+@async_cmd
+async def make_snapshot(ctx: BonfoContext, file, window, as_json):
+    """Save a snapshot of every readable setting and profile on the board.
+
+    Snapshots are kept in the local snapshot store, and also written to FILE when given.
+    """
+    from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+    from bonfo.snapshot import DEFAULT_WINDOW, SnapshotProgress, take_snapshot
+
+    if ctx.board is None:
+        return click.echo("No port selected")
+    async with ctx.board.connect() as board:
+        with Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[throughput]}"),
+            TimeElapsedColumn(),
+        ) as progress:
+            task = progress.add_task("Snapshot", total=None, throughput="")
+
+            def update(report: SnapshotProgress):
+                throughput = f"{report.throughput / 1024:.1f} KiB/s"
+                progress.update(task, total=report.total, completed=report.done, throughput=throughput)
+
+            snapshot = await take_snapshot(board, window=window or DEFAULT_WINDOW, progress=update)
+        snapshot_id = state_store().put(snapshot)
+        click.echo(f"Stored snapshot {snapshot_id} with {len(snapshot.records)} records")
+        if file is not None:
+            snapshot.save(file, binary=not as_json)
+            click.echo(f"Saved {len(snapshot.records)} records to {file}")
+
+
+@cli.command()
+@bonfo_context
+@click.argument("file", type=click.Path(dir_okay=False, writable=True))
+@click.option("-w", "--window", type=int, default=4, show_default=True, help="reads in flight at once")
+@click.option("--read-size", type=int, default=240, show_default=True, help="bytes asked for per read")
+@click.option("--restart", is_flag=True, help="download from the start even if FILE holds part of the logs")
+@async_cmd
+async def download_logs(ctx: BonfoContext, file, window, read_size, restart):
+    """Download the blackbox logs on the board's dataflash to FILE.
+
+    Interrupted downloads continue where they stopped when run again with the same FILE.
+    A link usage near 100% means the download is as fast as the serial port allows.
+    """
+    from rich.progress import BarColumn, DownloadColumn, Progress, TextColumn, TimeElapsedColumn
+
+    from bonfo.dataflash import DataflashProgress, download_dataflash
+    from bonfo.exceptions import DataflashError
+
+    if ctx.board is None:
+        return click.echo("No port selected")
+    async with ctx.board.connect() as board:
+        with Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            DownloadColumn(),
+            TextColumn("{task.fields[throughput]}"),
+            TimeElapsedColumn(),
+        ) as progress:
+            task = progress.add_task("Logs", total=None, throughput="")
+
+            def update(report: DataflashProgress):
+                throughput = f"{report.throughput / 1024:.1f} KiB/s"
+                if report.link_utilization is not None:
+                    throughput += f", link {report.link_utilization:.0%}"
+                progress.update(task, total=report.total, completed=report.done, throughput=throughput)
+
+            try:
+                report = await download_dataflash(
+                    board, file, window=window, read_size=read_size, resume=not restart, progress=update
+                )
+            except DataflashError as e:
+                return click.echo(str(e))
+        click.echo(
+            f"Downloaded {report.done - report.resumed_from} bytes to {file} in {report.elapsed:.1f}s, "
+            f"{report.throughput / 1024:.1f} KiB/s"
+        )
+
+
+@cli.command()
+@bonfo_context
+@click.option("-f", "--fps", type=float, default=10.0, show_default=True, help="most frames drawn per second")
+@click.option("-i", "--interval", type=float, default=0.0, show_default=True, help="least seconds between polls")
+@click.option(
+    "-r",
+    "--record",
+    type=click.Path(file_okay=False, writable=True),
+    help="also write the telemetry to chunked columnar files in this directory",
+)
+@click.option("--format", "record_format", type=click.Choice(["npz", "arrow"]), default="npz", show_default=True)
+@async_cmd
+async def monitor(ctx: BonfoContext, fps, interval, record, record_format):
+    """Show live attitude, IMU, status and mode telemetry.
+
+    The board is polled as fast as the link allows, independent of how fast the terminal
+    draws, and link usage is shown per message. With --record every sample is also written
+    to disk, arrow needs pyarrow installed.
+    """
+    from rich.console import Group
+    from rich.live import Live
+    from rich.table import Table
+
+    from bonfo.monitor import Monitor, MonitorFrame
+    from bonfo.msp.fields.boxes import BoxIds
+    from bonfo.msp.fields.sensors import Attitude
+    from bonfo.msp.fields.statuses import RawIMU, StatusEx
+
+    if ctx.board is None:
+        return click.echo("No port selected")
+
+    def view(frame: MonitorFrame) -> Group:
+        values = Table("Telemetry", "Value", box=None)
+        attitude = frame.values.get(Attitude)
+        if attitude is not None:
+            values.add_row("attitude", f"roll {attitude.roll} pitch {attitude.pitch} yaw {attitude.yaw}")
+        imu = frame.values.get(RawIMU)
+        if imu is not None:
+            values.add_row("accelerometer", str(list(imu.accelerometer)))
+            values.add_row("gyroscope", str(list(imu.gyroscope)))
+            values.add_row("magnetometer", str(list(imu.magnetometer)))
+        status = frame.values.get(StatusEx)
+        if status is not None:
+            values.add_row("cpu load", f"{status.cpuload}%")
+            values.add_row("cycle time", f"{status.cycle_time} us")
+            values.add_row("arming disabled", str(status.arming_disable_flags))
+        boxes = frame.values.get(BoxIds)
+        if boxes is not None:
+            values.add_row("modes", str(boxes.boxes))
+        link = Table("Message", "B/s", "Link", box=None)
+        for fields, throughput in frame.throughput.items():
+            link.add_row(fields.__name__, f"{throughput:.0f}", f"{frame.utilization[fields]:.1%}")
+        summary = f"{frame.poll_hz:.1f} polls/s, {frame.cycles} polls, {frame.dropped} merged into later frames"
+        return Group(values, link, summary)
+
+    async with ctx.board.connect() as board:
+        writer = None
+        if record is not None:
+            from bonfo.export import TelemetryWriter
+
+            writer = TelemetryWriter(record, format=record_format).attach(board)
+        try:
+            with Live(auto_refresh=False) as live:
+                await Monitor(board, interval=interval).run(
+                    lambda frame: live.update(view(frame), refresh=True), fps=fps
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+@cli.command()
+@bonfo_context
+@click.option(
+    "-m", "--mode", "modes", multiple=True, type=click.Choice(["single", "concurrent", "batch"]), help="default all"
+)
+@click.option("-f", "--fields", "fields_names", multiple=True, help="message fields to time, like `StatusEx`")
+@click.option("-n", "--requests", type=int, default=100, show_default=True, help="requests per message and mode")
+@click.option("-c", "--concurrency", type=int, default=8, show_default=True, help="tasks in concurrent mode")
+@click.option("-b", "--batch", type=int, default=8, show_default=True, help="requests per batch in batch mode")
+@click.option("-s", "--simulate", is_flag=True, help="bench against a local stand-in board instead of the port")
+@click.option("--latency", type=float, default=0.0, show_default=True, help="simulated board handling time in ms")
+@click.option("-o", "--output", type=click.File("w"), default="-", help="write the JSON report here")
+@async_cmd
+async def bench(ctx: BonfoContext, modes, fields_names, requests, concurrency, batch, simulate, latency, output):
+    """Measure request latency and throughput per message, as a JSON report.
+
+    **single** times one request at a time, **concurrent** several tasks sharing the link
+    and **batch** pipelined `get_many` batches.
+    """
+    import json
+
+    from bonfo.bench import BENCH_FIELDS, MODES, bench_report, run_bench
+    from bonfo.board import Board
+    from bonfo.daemon import fields_by_name
+    from bonfo.simulator import SimulatedBoard
+
+    fields = [fields_by_name(name) for name in fields_names] or list(BENCH_FIELDS)
+    if None in fields:
+        return click.echo(f"Unknown fields, expected readable fields names like {BENCH_FIELDS[1].__name__}")
+    simulator = None
+    if simulate:
+        simulator = SimulatedBoard(baudrate=115200, latency=latency / 1000)
+        board = Board(await simulator.start(), baudrate=115200)
+    elif ctx.board is None:
+        return click.echo("No port selected")
+    else:
+        board = ctx.board
+    try:
+        async with board.connect():
+            settings = dict(requests=requests, concurrency=concurrency, batch=batch, simulated=simulate)
+            results = await run_bench(board, fields, modes or MODES, requests, concurrency, batch)
+            json.dump(bench_report(board, results, **settings), output, indent=2)
+            output.write("\n")
+    finally:
+        if simulator is not None:
+            await simulator.close()
+
+
+@cli.group("snapshots")
+def snapshots():
+    """Browse stored snapshots."""
     pass
 
 
+@snapshots.command("list")
+@click.option("-u", "--uid", help="only snapshots of the board with this UID")
+@click.option("-v", "--version", help="only snapshots of this firmware version")
+@click.option("-n", "--limit", type=int, default=20, show_default=True)
+def list_snapshots(uid, version, limit):
+    """List stored snapshots, newest first."""
+    for entry in state_store().find(uid=uid, version=version, limit=limit):
+        click.echo(f"{entry.id}: {entry.created:%Y-%m-%d %H:%M:%S} {entry.uid} {entry.version} {entry.git_hash}")
+    stats = state_store().stats()
+    click.echo(f"{stats['snapshots']} snapshots, {stats['objects']} distinct payloads, {stats['bytes']} bytes")
+
+
+@snapshots.command("export")
+@click.argument("snapshot_id", type=int)
+@click.argument("file", type=click.Path(dir_okay=False))
+@click.option(
+    "-f", "--format", "file_format", type=click.Choice(["binary", "json", "yaml"]), default="binary", show_default=True
+)
+def export_snapshot(snapshot_id, file, file_format):
+    """Write a stored snapshot to a file, yaml writes the writable settings as a config file."""
+    snapshot = state_store().get(snapshot_id)
+    if file_format == "yaml":
+        from bonfo.config.export import snapshot_conf
+
+        snapshot_conf(snapshot).to_yaml_file(file)
+    else:
+        snapshot.save(file, binary=file_format == "binary")
+
+
+@snapshots.command("diff")
+@click.argument("before", type=int)
+@click.argument("after", type=int)
+def diff(before, after):
+    """Show the settings that changed between two stored snapshots."""
+    from bonfo.msp.utils import msp_name
+    from bonfo.snapshot import diff_snapshots
+
+    store = state_store()
+    for record_diff in diff_snapshots(store.get(before), store.get(after)):
+        code, pid, rate = record_diff.key
+        scope = f"pid {pid} " if pid else f"rate {rate} " if rate else ""
+        name = record_diff.fields.__name__ if record_diff.fields else msp_name(code)
+        if record_diff.before is None:
+            click.echo(f"+ {scope}{name}")
+        elif record_diff.after is None:
+            click.echo(f"- {scope}{name}")
+        for field_name, (old, new) in record_diff.changed.items():
+            click.echo(f"~ {scope}{name}.{field_name}: {old} -> {new}")
+
+
 def main():
     cli(prog_name="bonfo")
 
 
 if __name__ == "__main__":
-    atexit.register(state_store.close)
     main()  # pragma: no cover
 
 __all__: Sequence[str] = []
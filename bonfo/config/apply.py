@@ -0,0 +1,208 @@
+"""Field level diffing and applying of a BoardConf to a board."""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field, fields as dataclass_fields, replace
+from enum import Enum
+from itertools import zip_longest
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
+
+from bonfo.msp import fields as msp_fields
+from bonfo.msp.fields.base import MSPFields
+from bonfo.msp.utils import build_payload
+from bonfo.profile import PID_PROFILE_FIELDS, RATE_PROFILE_FIELDS
+
+from .root import BoardConf
+
+if TYPE_CHECKING:
+    from bonfo.board import Board
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["ConfigChange", "ConfigPlan", "ApplyResult", "plan_config", "apply_config"]
+
+# (pid, rate) profiles a group of changes is made under
+ProfileStep = Tuple[Optional[int], Optional[int]]
+
+
+def fields_type(name: str) -> Type[MSPFields]:
+    """Look up a readable and writable fields class by name."""
+    try:
+        found = getattr(msp_fields, name)
+    except AttributeError:
+        raise ValueError(f"Unknown fields {name}") from None
+    if not (isinstance(found, type) and issubclass(found, MSPFields)):
+        raise ValueError(f"{name} is not a fields class")
+    if found.get_code is None or found.set_code is None:
+        raise ValueError(f"{name} can't be both read and written")
+    return found
+
+
+def coerce_value(current: Any, value: Any) -> Any:
+    """Convert a config value to the type of the current value, for enum and flag fields."""
+    if not isinstance(current, Enum) or isinstance(value, Enum):
+        return value
+    enum_type = type(current)
+    if isinstance(value, str):
+        return enum_type[value]
+    if isinstance(value, (list, tuple)):
+        combined = enum_type(0)
+        for name in value:
+            combined |= enum_type[name]
+        return combined
+    return enum_type(value)
+
+
+def desired_fields(current: MSPFields, values: Dict[str, Any]) -> MSPFields:
+    """The current fields with the configured values replaced."""
+    names = {f.name for f in dataclass_fields(current) if f.init}
+    unknown = set(values) - names
+    if unknown:
+        raise ValueError(f"Unknown {type(current).__name__} fields: {', '.join(sorted(unknown))}")
+    return replace(current, **{name: coerce_value(getattr(current, name), value) for name, value in values.items()})
+
+
+@dataclass
+class ConfigChange:
+    """A fields message whose built payload differs from the board's."""
+
+    fields: Type[MSPFields]
+    current: MSPFields
+    desired: MSPFields
+    changed: List[str]
+    pid: Optional[int] = None
+    rate: Optional[int] = None
+
+
+@dataclass
+class ConfigPlan:
+    """Changes needed to bring a board in line with a configuration."""
+
+    changes: List[ConfigChange] = field(default_factory=list)
+    # fields messages compared and found identical
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    def steps(self) -> Dict[ProfileStep, List[ConfigChange]]:
+        """Changes grouped by the profiles they're made under, global changes first."""
+        steps: Dict[ProfileStep, List[ConfigChange]] = dict()
+        pid_changes: Dict[int, List[ConfigChange]] = dict()
+        rate_changes: Dict[int, List[ConfigChange]] = dict()
+        for change in self.changes:
+            if change.pid is not None:
+                pid_changes.setdefault(change.pid, []).append(change)
+            elif change.rate is not None:
+                rate_changes.setdefault(change.rate, []).append(change)
+            else:
+                steps.setdefault((None, None), []).append(change)
+        # PID and rate profiles are switched side by side, so each step needs at most one switch of each
+        for pid, rate in zip_longest(sorted(pid_changes), sorted(rate_changes)):
+            steps[(pid, rate)] = pid_changes.get(pid, []) + rate_changes.get(rate, [])  # type:ignore
+        return steps
+
+
+@dataclass
+class ApplyResult:
+    plan: ConfigPlan
+    applied: List[ConfigChange] = field(default_factory=list)
+
+
+def _configured(conf: BoardConf) -> Dict[ProfileStep, List[Tuple[Type[MSPFields], Dict[str, Any]]]]:
+    """Configured fields grouped by the profiles they are read and written under."""
+    configured: Dict[ProfileStep, List[Tuple[Type[MSPFields], Dict[str, Any]]]] = dict()
+    for name, values in conf.settings.items():
+        fields = fields_type(name)
+        if fields in PID_PROFILE_FIELDS or fields in RATE_PROFILE_FIELDS:
+            raise ValueError(f"{name} is set per profile, configure it under pid_profiles or rate_profiles")
+        configured.setdefault((None, None), []).append((fields, values))
+
+    pid_profiles = {pid: _profile_fields(profile, PID_PROFILE_FIELDS) for pid, profile in conf.pid_profiles.items()}
+    rate_profiles = {
+        rate: _profile_fields(profile, RATE_PROFILE_FIELDS) for rate, profile in conf.rate_profiles.items()
+    }
+    for pid, rate in zip_longest(sorted(pid_profiles), sorted(rate_profiles)):
+        configured[(pid, rate)] = pid_profiles.get(pid, []) + rate_profiles.get(rate, [])  # type:ignore
+    return configured
+
+
+def _profile_fields(profile: Dict[str, Dict[str, Any]], allowed) -> List[Tuple[Type[MSPFields], Dict[str, Any]]]:
+    configured = []
+    for name, values in profile.items():
+        fields = fields_type(name)
+        if fields not in allowed:
+            raise ValueError(f"{name} isn't set per profile, configure it under settings")
+        configured.append((fields, values))
+    return configured
+
+
+async def _read_step(board: "Board", step: ProfileStep, requested: List[Type[MSPFields]]) -> List[Any]:
+    if step == (None, None):
+        return await board.get_many(*requested)
+    async with board.profile(pid=step[0], rate=step[1]):  # type:ignore
+        return await board.get_many(*requested)
+
+
+async def plan_config(board: "Board", conf: BoardConf) -> ConfigPlan:
+    """Read the configured fields from the board and find the ones that need writing.
+
+    Only fields messages named in the configuration are read, a message is only part of
+    the plan if its built payload differs from what the board has.
+    """
+    await board.ready.wait()
+    async with board.profile.restore_on_exit():  # type:ignore
+        return await _plan(board, conf)
+
+
+async def _plan(board: "Board", conf: BoardConf) -> ConfigPlan:
+    plan = ConfigPlan()
+    msp = board.msp_version
+    for step, configured in _configured(conf).items():
+        pid_profile, rate_profile = step
+        current_values = await _read_step(board, step, [fields for fields, _ in configured])
+        for (fields, values), current in zip(configured, current_values):
+            if current is None:
+                raise ValueError(f"Unable to read {fields.__name__} from the board")
+            desired = desired_fields(current, values)
+            if build_payload(fields.set_code, desired, msp=msp) == build_payload(fields.set_code, current, msp=msp):
+                plan.unchanged += 1
+                continue
+            changed = [name for name in values if getattr(desired, name) != getattr(current, name)]
+            pid = pid_profile if fields in PID_PROFILE_FIELDS else None
+            rate = rate_profile if fields in RATE_PROFILE_FIELDS else None
+            plan.changes.append(ConfigChange(fields, current, desired, changed, pid=pid, rate=rate))
+    logger.debug("Config plan: %s changes, %s unchanged", len(plan.changes), plan.unchanged)
+    return plan
+
+
+async def apply_config(board: "Board", conf: BoardConf, check: bool = False) -> ApplyResult:
+    """Write the changed fields of a configuration to the board.
+
+    Changes are committed in one Board.transaction, grouped by profile and read back to
+    verify, followed by a single EepromWrite. If any of them fail every change is rolled
+    back and a TransactionError raised. The originally selected profiles are restored afterwards.
+
+    Args:
+        board (Board): A ready board.
+        conf (BoardConf): The desired configuration.
+        check (bool, optional): Only plan the changes, don't write anything. Defaults to False.
+
+    Returns:
+        ApplyResult: The plan and the changes written.
+    """
+    await board.ready.wait()
+    async with board.profile.restore_on_exit():  # type:ignore
+        plan = await _plan(board, conf)
+        result = ApplyResult(plan)
+        if check or not plan:
+            return result
+
+        async with board.transaction(verify=True) as transaction:
+            for (pid, rate), changes in plan.steps().items():
+                for change in changes:
+                    logger.debug("Writing %s: %s", change.fields.__name__, ", ".join(change.changed))
+                    transaction.set(change.desired, pid=pid, rate=rate, previous=change.current)
+        result.applied = list(plan.changes)
+    return result
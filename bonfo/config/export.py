@@ -0,0 +1,58 @@
+"""Export of snapshots to human readable BoardConf configurations."""
+from __future__ import annotations
+
+from dataclasses import fields as dataclass_fields
+from enum import Enum, Flag
+from typing import Any, Dict
+
+from bonfo.msp.fields.registry import get_fields
+from bonfo.profile import PID_PROFILE_FIELDS, RATE_PROFILE_FIELDS
+from bonfo.snapshot import Snapshot
+
+from .root import BoardConf
+
+__all__ = ["snapshot_conf"]
+
+
+def plain_value(value: Any) -> Any:
+    """Convert a decoded field value to plain YAML friendly types, flags become lists of names."""
+    if isinstance(value, Flag):
+        return [member.name for member in type(value) if member.value and member in value]
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, dict):
+        return {key: plain_value(item) for key, item in value.items() if not key.startswith("_")}
+    if isinstance(value, (list, tuple)):
+        return [plain_value(item) for item in value]
+    return value
+
+
+def fields_values(decoded: Any) -> Dict[str, Any]:
+    """Configurable values of decoded fields, leaving out reserved and unavailable fields."""
+    return {
+        f.name: plain_value(getattr(decoded, f.name))
+        for f in dataclass_fields(decoded)
+        if f.init and not f.name.startswith("_") and getattr(decoded, f.name) is not None
+    }
+
+
+def snapshot_conf(snapshot: Snapshot) -> BoardConf:
+    """Writable settings of a snapshot as a BoardConf, ready to save as YAML or apply to a board."""
+    conf = BoardConf()
+    msp = snapshot.msp_version
+    for record in snapshot.records:
+        fields = get_fields(record.code)
+        if fields is None or fields.set_code is None or fields.get_code != record.code:
+            continue
+        decoded = record.decode(msp, lazy=False)
+        if decoded is None:
+            continue
+        values = fields_values(decoded)
+        name = fields.__name__
+        if fields in PID_PROFILE_FIELDS and record.pid_profile is not None:
+            conf.pid_profiles.setdefault(record.pid_profile, dict())[name] = values
+        elif fields in RATE_PROFILE_FIELDS and record.rate_profile is not None:
+            conf.rate_profiles.setdefault(record.rate_profile, dict())[name] = values
+        else:
+            conf.settings[name] = values
+    return conf
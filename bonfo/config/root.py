@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from typing import Any, Dict
 
 from dataclass_wizard import YAMLWizard
 from dataclass_wizard.enums import LetterCase
@@ -10,9 +11,10 @@ from bonfo import __version__ as current_bonfo_version
 class BoardConf(YAMLWizard, key_transform=LetterCase.SNAKE):  # type: ignore
     version: int = 1
     bonfo_version: str = field(default=current_bonfo_version)
-    # pid_profiles: dict[int, PidTranslator] | None = None
-    # rate_profiles: dict[int, RateTranslator] | None = None
-    # pids: list[PidTranslator] | None = None
-    # rates: list[RateTranslator] | None = None
+    # fields class name to the field values to set, e.g. {"FeatureConfig": {"features": ["AIRMODE", "OSD"]}}
+    settings: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # profile number to per profile fields, PidAdvanced for pid profiles and RcTuning for rate profiles
+    pid_profiles: Dict[int, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
+    rate_profiles: Dict[int, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
 
     # TODO: version validation
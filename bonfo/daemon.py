@@ -0,0 +1,222 @@
+"""Background daemon keeping a board connection open for CLI commands.
+
+The daemon owns the serial port and answers requests on a local Unix socket, one JSON
+object per line each way. Commands skip the connection bootstrap entirely, reusing the
+board info and profile state the daemon already holds.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from os import PathLike
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Set, Type, Union
+
+from .exceptions import DaemonError
+
+if TYPE_CHECKING:
+    from .board import Board
+    from .msp.fields.base import MSPFields
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["BoardDaemon", "DaemonClient", "daemon_client"]
+
+SOCKET_NAME = "daemon.sock"
+CLIENT_TIMEOUT = 5.0
+
+
+def fields_by_name(name: str) -> Optional[Type[MSPFields]]:
+    """Readable MSPFields class with the given class name."""
+    from .msp.fields.registry import FIELDS_MODULES, get_fields
+
+    for code in FIELDS_MODULES:
+        fields = get_fields(code)
+        if fields is not None and fields.__name__ == name and fields.get_code is not None:
+            return fields
+    return None
+
+
+class BoardDaemon:
+    """Serves requests for a connected board on a Unix socket.
+
+    Requests are `{"command": ..., **params}` lines, responses are `{"ok": true, "result": ...}`
+    or `{"ok": false, "error": ...}`. Requests from any number of clients may be in flight,
+    the board's locks and profile scheduler keep them from interleaving on the wire.
+
+    Args:
+        board (Board): connected board the daemon serves.
+        path (PathLike): socket path, replaced if a stale socket was left behind.
+    """
+
+    def __init__(self, board: Board, path: Union[str, PathLike]) -> None:
+        self.board = board
+        self.path = str(path)
+        self.started = time.monotonic()
+        self.requests = 0
+        self._stopped = asyncio.Event()
+        self._clients: Set[asyncio.Task] = set()
+        self.commands: Dict[str, Callable[..., Awaitable[Any]]] = dict(
+            info=self.info,
+            profile=self.profile,
+            set_profile=self.set_profile,
+            get=self.get,
+            status=self.status,
+            shutdown=self.shutdown,
+        )
+
+    async def serve(self) -> None:
+        """Accept clients until shut down."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._client, path=self.path)
+        logger.info("Board daemon listening on %s", self.path)
+        try:
+            async with server:
+                await self._stopped.wait()
+                # drop connected clients, the board is going away with the daemon
+                for client in self._clients:
+                    client.cancel()
+                await asyncio.gather(*self._clients, return_exceptions=True)
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._clients.add(task)  # type:ignore
+        try:
+            while line := await reader.readline():
+                response = await self.handle(line)
+                writer.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(task)  # type:ignore
+            writer.close()
+
+    async def handle(self, line: bytes) -> Dict[str, Any]:
+        """Run one request line and build its response."""
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            command = self.commands.get(request.pop("command", None))
+            if command is None:
+                raise DaemonError(f"Unknown command, expected one of: {', '.join(self.commands)}")
+            return dict(ok=True, result=await command(**request))
+        except Exception as e:
+            logger.exception("Error handling daemon request", exc_info=e)
+            return dict(ok=False, error=str(e) or type(e).__name__)
+
+    async def info(self) -> Dict[str, Any]:
+        from .snapshot import board_metadata
+
+        return board_metadata(self.board.info)
+
+    async def profile(self) -> Dict[str, int]:
+        profile = self.board.profile
+        return dict(pid=profile.pid, rate=profile.rate)  # type:ignore
+
+    async def set_profile(self, pid: Optional[int] = None, rate: Optional[int] = None) -> Dict[str, int]:
+        async with self.board.profile(pid, rate):  # type:ignore
+            pass
+        return await self.profile()
+
+    async def get(self, fields: str, pid: Optional[int] = None, rate: Optional[int] = None) -> Any:
+        """Read a message by fields class name, with the given profiles selected for the read."""
+        from .config.export import fields_values
+
+        fields_class = fields_by_name(fields)
+        if fields_class is None:
+            raise DaemonError(f"No readable fields named {fields}")
+        async with self.board.profile(pid, rate, revert_on_exit=True):  # type:ignore
+            result = await self.board.get(fields_class)
+        return None if result is None else fields_values(result)
+
+    async def status(self) -> Dict[str, Any]:
+        return dict(
+            pid=os.getpid(),
+            device=self.board.device,
+            uptime=time.monotonic() - self.started,
+            requests=self.requests,
+        )
+
+    async def shutdown(self) -> None:
+        self.stop()
+
+
+class DaemonClient:
+    """Blocking client for a board daemon, the connection is opened on the first request.
+
+    Plain sockets keep a request down to a round trip, without starting an event loop. The
+    client doesn't import any of the board or fields modules, only the daemon does.
+    """
+
+    def __init__(self, path: Union[str, PathLike], timeout: float = CLIENT_TIMEOUT) -> None:
+        self.path = str(path)
+        self.timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._file = None
+
+    def connect(self) -> None:
+        if self._socket is not None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise DaemonError(f"Board daemon not running at {self.path}") from e
+        self._socket = sock
+        self._file = sock.makefile("rb")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = self._file = None
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def request(self, command: str, **params: Any) -> Any:
+        """Send a command and wait for its result, raises DaemonError if the daemon refused it."""
+        self.connect()
+        try:
+            self._socket.sendall(json.dumps(dict(command=command, **params)).encode("utf-8") + b"\n")  # type:ignore
+            line = self._file.readline()  # type:ignore
+        except OSError as e:
+            self.close()
+            raise DaemonError("Lost connection to the board daemon") from e
+        if not line:
+            self.close()
+            raise DaemonError("Board daemon closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        return response.get("result")
+
+
+def daemon_client(path: Union[str, PathLike]) -> Optional[DaemonClient]:
+    """Connected client if a daemon is listening at path, otherwise None."""
+    if not os.path.exists(path):
+        return None
+    client = DaemonClient(path)
+    try:
+        client.connect()
+    except DaemonError:
+        return None
+    return client
@@ -0,0 +1,187 @@
+"""Blackbox log downloads from the board's dataflash, with several reads in flight at once."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Deque, Dict, Optional, Tuple, Union
+
+from .exceptions import DataflashError
+from .msp.codes import MSP
+from .msp.fields.dataflash import DataflashRead, DataflashReadRequest, DataflashSummary
+from .msp.utils import FRAME_OVERHEAD
+
+if TYPE_CHECKING:
+    from .board import Board
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["DataflashProgress", "download_dataflash", "read_summary"]
+
+# bytes asked for per read, the reply still fits an MSP v1 frame after its 7 byte header
+READ_SIZE = 240
+# reads in flight at once
+DEFAULT_WINDOW = 4
+# seconds to wait for a reply before the download stops
+REPLY_TIMEOUT = 2.0
+# framing, the request and the reply header around the data of every read
+READ_OVERHEAD = 2 * FRAME_OVERHEAD + DataflashReadRequest.get_struct().sizeof() + 7
+# serial 8N1 sends a start and stop bit with every byte
+BITS_PER_BYTE = 10
+
+
+@dataclass
+class DataflashProgress:
+    """Running totals of a download, in bytes of the log unless noted."""
+
+    total: int
+    done: int = 0
+    # already on disk when this run started
+    resumed_from: int = 0
+    # bytes crossing the link both ways, framing included
+    link_bytes: int = 0
+    baudrate: Optional[int] = None
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Log bytes per second read by this run."""
+        elapsed = self.elapsed
+        return (self.done - self.resumed_from) / elapsed if elapsed else 0.0
+
+    @property
+    def link_utilization(self) -> Optional[float]:
+        """Share of the serial link's capacity used, None without a baudrate.
+
+        USB boards ignore the baudrate and can go past 100%.
+        """
+        elapsed = self.elapsed
+        if not self.baudrate or not elapsed:
+            return None
+        return self.link_bytes * BITS_PER_BYTE / elapsed / self.baudrate
+
+
+async def read_summary(board: "Board") -> DataflashSummary:
+    """The board's dataflash summary, raises DataflashError unless logs can be read."""
+    summary = await board.get(DataflashSummary)
+    if summary is None or not summary.supported:
+        raise DataflashError("The board has no dataflash")
+    if not summary.ready:
+        raise DataflashError("The dataflash is busy, possibly erasing")
+    return summary
+
+
+async def _read_flash(
+    board: "Board",
+    file: BinaryIO,
+    report: DataflashProgress,
+    window: int,
+    read_size: int,
+    timeout: float,
+    progress: Optional[Callable[[DataflashProgress], Any]],
+) -> None:
+    # requested address and size of every read in flight, the board answers in request order
+    in_flight: Deque[Tuple[int, int]] = deque()
+    # the rest of reads the board cut short, asked for again before anything new
+    gaps: Deque[Tuple[int, int]] = deque()
+    # chunks waiting on an earlier gap before they can be written
+    received: Dict[int, bytes] = dict()
+    next_address = report.done
+
+    async def request() -> None:
+        nonlocal next_address
+        if gaps:
+            address, size = gaps.popleft()
+        elif next_address < report.total:
+            address, size = next_address, min(read_size, report.total - next_address)
+            next_address += size
+        else:
+            return
+        await board.send_msg(MSP.DATAFLASH_READ, fields=DataflashReadRequest(address, size, False))
+        in_flight.append((address, size))
+
+    for _ in range(max(window, 1)):
+        await request()
+    while in_flight:
+        address, size = in_flight[0]
+        try:
+            _, reply = await asyncio.wait_for(board.receive_msg(), timeout)
+        except asyncio.TimeoutError:
+            raise DataflashError(f"No reply to the read at {address} within {timeout}s") from None
+        in_flight.popleft()
+        if not isinstance(reply, DataflashRead) or reply.address != address:
+            raise DataflashError(f"Unexpected reply to the read at {address}: {reply}")
+        if reply.compression:
+            raise DataflashError(f"Compressed reply to the read at {address}, compression wasn't allowed")
+        data = reply.data[: reply.size]
+        if not data:
+            raise DataflashError(f"No data at {address} of {report.total}")
+        report.link_bytes += READ_OVERHEAD + len(data)
+        received[address] = data
+        if len(data) < size:
+            gaps.append((address + len(data), size - len(data)))
+        # write everything that now follows on from the file without a hole
+        while report.done in received:
+            chunk = received.pop(report.done)
+            file.write(chunk)
+            report.done += len(chunk)
+        if progress is not None:
+            progress(report)
+        await request()
+
+
+async def download_dataflash(
+    board: "Board",
+    path: Union[str, Path],
+    window: int = DEFAULT_WINDOW,
+    read_size: int = READ_SIZE,
+    resume: bool = True,
+    timeout: float = REPLY_TIMEOUT,
+    progress: Optional[Callable[[DataflashProgress], Any]] = None,
+) -> DataflashProgress:
+    """Download the blackbox logs on the board's dataflash to a file.
+
+    Reads are pipelined, window of them are in flight at once so the link isn't idle waiting
+    on a round trip per chunk. Chunks are written in address order as soon as everything before
+    them has arrived, reads the board cuts short are asked for again. The file always holds the
+    start of the logs without holes, an interrupted download picks up where it stopped. Replies
+    to reads still in flight when a download fails are dropped before the board's next request.
+
+    Args:
+        board (Board): A ready board.
+        path (Path): file to write the logs to.
+        window (int): reads in flight at once. Defaults to DEFAULT_WINDOW.
+        read_size (int): bytes asked for per read. Defaults to READ_SIZE.
+        resume (bool): continue after what the file already holds, or start over. Defaults to True.
+            Resuming assumes the flash hasn't been erased since.
+        timeout (float): seconds to wait for each reply.
+        progress (Callable[[DataflashProgress], Any], optional): Called after every reply.
+
+    Returns:
+        DataflashProgress: totals and throughput of the finished download.
+    """
+    await board.ready.wait()
+    summary = await read_summary(board)
+    path = Path(path)
+    offset = path.stat().st_size if resume and path.exists() else 0
+    if offset > summary.used_size:
+        raise DataflashError(
+            f"{path} holds {offset} bytes but the board only has {summary.used_size}, the flash was erased since"
+        )
+    report = DataflashProgress(total=summary.used_size, done=offset, resumed_from=offset, baudrate=board.baudrate)
+    with open(path, "r+b" if offset else "wb") as file:
+        file.seek(offset)
+        # a failed read leaves the rest of the window in flight, the exchange drops those replies
+        async with board.exchange():
+            await _read_flash(board, file, report, window, read_size, timeout, progress)
+    downloaded = report.done - offset
+    logger.info("Downloaded %s bytes of logs in %.2fs, %.0f B/s", downloaded, report.elapsed, report.throughput)
+    return report
@@ -0,0 +1,135 @@
+"""Finding flight controllers by probing every serial port at once."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Tuple
+
+from construct import ConstructError
+from serial_asyncio import connection_for_serial, serial
+
+from .msp.checksum import xor_checksum
+from .msp.codes import MSP
+from .msp.fields.statuses import ApiVersion, Uid
+from .msp.message import Preamble
+from .msp.utils import out_message_builder, parse_payload
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["DiscoveredBoard", "discover", "probe"]
+
+PROBE_TIMEOUT = 0.5
+
+
+@dataclass
+class DiscoveredBoard:
+    """A port that answered like a flight controller."""
+
+    device: str
+    api: ApiVersion
+    uid: Optional[Uid]
+    # seconds from opening the port to the last answer
+    elapsed: float
+
+    @property
+    def uid_hex(self) -> Optional[str]:
+        if self.uid is None:
+            return None
+        return "".join(f"{part:08x}" for part in self.uid.uid)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Any, Any]:
+    """Read one MSP v1 frame, returns its preamble and parsed fields."""
+    preamble_bytes = await reader.readexactly(Preamble.sizeof())
+    preamble = Preamble.parse(preamble_bytes)
+    data_bytes = await reader.readexactly(preamble.data_length + 1)
+    payload, crc = data_bytes[:-1], data_bytes[-1]
+    if crc != xor_checksum(preamble_bytes[3:5] + payload):
+        raise ValueError(f"wrong checksum for frame {preamble.frame_id}")
+    return preamble, parse_payload(preamble.frame_id, payload)
+
+
+async def open_port(device: str, baudrate: int) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open a port in a worker thread, drivers can block for a while on open and the other probes keep going."""
+    opening = asyncio.ensure_future(
+        asyncio.to_thread(
+            serial.serial_for_url,
+            device,
+            baudrate=baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=0.1,
+        )
+    )
+    try:
+        port = await asyncio.shield(opening)
+    except asyncio.CancelledError:
+        # the thread can't be stopped, close the port once it has opened
+        opening.add_done_callback(lambda done: done.exception() or done.result().close())
+        raise
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(loop=loop)
+    protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+    transport, _ = await connection_for_serial(loop, lambda: protocol, port)
+    return reader, asyncio.StreamWriter(transport, protocol, reader, loop)
+
+
+async def _exchange(device: str, baudrate: int) -> DiscoveredBoard:
+    started = time.perf_counter()
+    reader, writer = await open_port(device, baudrate)
+    try:
+        # both requests go out before either answer is read
+        writer.write(out_message_builder(MSP.API_VERSION) + out_message_builder(MSP.UID))
+        answers = dict()
+        for _ in range(2):
+            preamble, fields = await read_frame(reader)
+            answers[preamble.frame_id] = fields
+    finally:
+        writer.close()
+    api = answers.get(MSP.API_VERSION)
+    if not isinstance(api, ApiVersion):
+        raise ValueError("no API version in the answers")
+    return DiscoveredBoard(device, api, answers.get(MSP.UID), time.perf_counter() - started)
+
+
+async def probe(device: str, baudrate: int = 115200, timeout: float = PROBE_TIMEOUT) -> Optional[DiscoveredBoard]:
+    """Ask the device for its API version and UID, None unless it answers within timeout seconds."""
+    try:
+        return await asyncio.wait_for(_exchange(device, baudrate), timeout)
+    except asyncio.TimeoutError:
+        logger.debug("No answer from %s within %ss", device, timeout)
+    except (serial.SerialException, OSError) as e:
+        logger.debug("Unable to open %s: %s", device, e)
+    except (ConstructError, ValueError, asyncio.IncompleteReadError) as e:
+        # something other than a flight controller talking on the port
+        logger.debug("Not a flight controller at %s: %s", device, e)
+    return None
+
+
+async def discover(
+    devices: Optional[Iterable[str]] = None,
+    baudrate: int = 115200,
+    timeout: float = PROBE_TIMEOUT,
+    include_links: bool = False,
+) -> List[DiscoveredBoard]:
+    """Probe every device at the same time, discovery takes as long as the slowest port.
+
+    Args:
+        devices (Iterable[str], optional): ports or pyserial URLs to probe. Defaults to every serial port.
+        baudrate (int): port speed. Defaults to 115200.
+        timeout (float): seconds each port has to answer.
+        include_links (bool): also probe symlinks to ports when listing them.
+
+    Returns:
+        List[DiscoveredBoard]: the flight controllers that answered, by device name.
+    """
+    if devices is None:
+        from serial.tools.list_ports import comports
+
+        devices = [port.device for port in comports(include_links=include_links)]
+    found = await asyncio.gather(*(probe(device, baudrate, timeout) for device in devices))
+    return sorted((board for board in found if board is not None), key=lambda board: board.device)
@@ -6,5 +6,26 @@ class ConnectionException(BoardException):
     pass
 
 
+class MessageError(BoardException):
+    """The board refused a message, or answered with a reply to a different one."""
+
+
+class TransactionError(BoardException):
+    """A staged set wasn't applied, the transaction's changes were rolled back."""
+
+    def __init__(self, message: str, failed=None, rolled_back: bool = True) -> None:
+        super().__init__(message)
+        self.failed = list(failed or [])
+        self.rolled_back = rolled_back
+
+
 class BonfoOperatorException(Exception):
     pass
+
+
+class DaemonError(BoardException):
+    """The board daemon couldn't be reached or refused a request."""
+
+
+class DataflashError(BoardException):
+    """The board's dataflash couldn't be read, downloads stop where the reads did and can be resumed."""
@@ -0,0 +1,304 @@
+"""Streaming telemetry export to chunked columnar files for analysis in numpy or pandas.
+
+Every message gets its own stream of chunks with a `time` column and one column of doubles per
+flattened field, see bonfo.telemetry.flatten. Chunks are NPZ archives of `.npy` columns by default,
+written without numpy, or one Arrow IPC file per message and session when pyarrow is installed.
+"""
+from __future__ import annotations
+
+import ast
+import mmap
+import struct
+import sys
+import time
+import zipfile
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Type, Union
+
+from .msp.fields.base import MSPFields
+from .telemetry import NAN, TELEMETRY_FIELDS, fields_type, flatten
+
+if TYPE_CHECKING:
+    from .board import Board
+
+
+__all__ = ["TelemetryWriter", "read_chunks", "read_arrow", "FORMATS"]
+
+FORMATS = ("npz", "arrow")
+# rows buffered per message before a chunk is written
+CHUNK_SIZE = 4096
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_DESCR = ("<" if sys.byteorder == "little" else ">") + "f8"
+# size of a zip local file header before its name and extra field
+ZIP_LOCAL_HEADER = 30
+
+
+def npy_bytes(column: array) -> bytes:
+    """A column of doubles in the `.npy` format, version 1.0."""
+    header = f"{{'descr': '{NPY_DESCR}', 'fortran_order': False, 'shape': ({len(column)},), }}"
+    # the header ends in a newline and pads the data to a 64 byte boundary
+    header += " " * (-(len(NPY_MAGIC) + 2 + len(header) + 1) % 64) + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1") + column.tobytes()
+
+
+def npy_column(data: memoryview) -> memoryview:
+    """The doubles in `.npy` data as a memoryview over the same memory."""
+    if bytes(data[: len(NPY_MAGIC)]) != NPY_MAGIC:
+        raise ValueError("not a version 1.0 .npy column")
+    (header_length,) = struct.unpack_from("<H", data, len(NPY_MAGIC))
+    start = len(NPY_MAGIC) + 2
+    header = ast.literal_eval(bytes(data[start : start + header_length]).decode("latin1"))
+    if header["descr"] != NPY_DESCR or len(header["shape"]) != 1:
+        raise ValueError(f"unsupported .npy column {header}")
+    return data[start + header_length :].cast("d")
+
+
+class NpzChunks:
+    """Chunks of one message as numbered NPZ archives in a directory named after it."""
+
+    def __init__(self, directory: Path, name: str, compress: bool) -> None:
+        self.directory = directory / name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self.written = len(list(self.directory.glob("*.npz")))
+
+    def write(self, columns: Mapping[str, array]) -> None:
+        path = self.directory / f"{self.written:05d}.npz"
+        with zipfile.ZipFile(path, "w", compression=self.compression) as archive:
+            for name, column in columns.items():
+                archive.writestr(f"{name}.npy", npy_bytes(column))
+        self.written += 1
+
+    def close(self) -> None:
+        pass
+
+
+def _arrow_path(directory: Path, name: str, session: int) -> Path:
+    return directory / (f"{name}.arrow" if session == 0 else f"{name}.{session}.arrow")
+
+
+class ArrowChunks:
+    """Chunks of one message as record batches of an Arrow IPC file, needs pyarrow.
+
+    Files can't be appended to, every session writes the next free `<name>.<session>.arrow`.
+    """
+
+    def __init__(self, directory: Path, name: str, compress: bool) -> None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError as e:
+            raise ImportError("Arrow export needs pyarrow installed") from e
+        self.pyarrow = pyarrow
+        session = 0
+        while _arrow_path(directory, name, session).exists():
+            session += 1
+        self.path = _arrow_path(directory, name, session)
+        self.options = pyarrow.ipc.IpcWriteOptions(compression="zstd" if compress else None)
+        self.writer: Any = None
+        self.written = 0
+
+    def write(self, columns: Mapping[str, array]) -> None:
+        pyarrow = self.pyarrow
+        arrays = [
+            pyarrow.Array.from_buffers(pyarrow.float64(), len(column), [None, pyarrow.py_buffer(column)])
+            for column in columns.values()
+        ]
+        batch = pyarrow.RecordBatch.from_arrays(arrays, names=list(columns))
+        if self.writer is None:
+            self.writer = pyarrow.ipc.new_file(self.path, batch.schema, options=self.options)
+        self.writer.write_batch(batch)
+        self.written += 1
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _Stream:
+    """Rows of one message buffered in preallocated columns until a chunk is full."""
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        size: int,
+        chunks: Union[NpzChunks, ArrowChunks],
+        write: Callable[[Mapping[str, array]], None],
+    ) -> None:
+        self.columns = {name: array("d", [NAN]) * size for name in ("time", *names)}
+        self.size = size
+        self.rows = 0
+        self.chunks = chunks
+        self.write = write
+
+    def append(self, t: float, values: Mapping[str, float]) -> None:
+        for name, column in self.columns.items():
+            column[self.rows] = values.get(name, NAN)
+        self.columns["time"][self.rows] = t
+        self.rows += 1
+        if self.rows == self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.rows:
+            # slicing copies, the columns are free to fill again while the chunk is written
+            self.write({name: column[: self.rows] for name, column in self.columns.items()})
+            self.rows = 0
+
+
+class TelemetryWriter:
+    """Writes telemetry messages to chunked columnar files as they arrive.
+
+    Each message buffers at most chunk_size rows before they are written out, memory stays the same
+    however long the capture runs. Columns are laid out on the first sample of each message.
+    Full chunks are written by a worker thread, appending never waits on the disk.
+
+    Compressed chunks are smaller, uncompressed ones can be read straight from the page cache,
+    see read_chunks and read_arrow.
+
+    Args:
+        directory (Path): where the chunks go, created when missing.
+        fields (Iterable[MSPFields], optional): messages to write. Defaults to TELEMETRY_FIELDS, None writes all.
+        chunk_size (int): rows per chunk.
+        compress (bool): deflate NPZ chunks, zstd for Arrow. Defaults to True.
+        format (str): "npz" or "arrow". Defaults to "npz".
+        clock (Callable[[], float]): timestamps samples. Defaults to time.time, seconds since the epoch.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        fields: Optional[Iterable[Type[MSPFields]]] = TELEMETRY_FIELDS,
+        chunk_size: int = CHUNK_SIZE,
+        compress: bool = True,
+        format: str = "npz",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format {format}, expected one of {', '.join(FORMATS)}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fields = None if fields is None else frozenset(fields)
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.format = format
+        self.clock = clock
+        self.streams: Dict[Type[MSPFields], _Stream] = dict()
+        self._unsubscribe: Optional[Callable[[], None]] = None
+        # a single thread keeps the chunks of every message in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bonfo-export")
+        self._writes: List[Future] = list()
+
+    def append(self, value: Any, t: Optional[float] = None) -> None:
+        """Write a fields result, at t or the clock's current time."""
+        fields = fields_type(value)
+        if self.fields is not None and fields not in self.fields:
+            return
+        values = flatten(value)
+        stream = self.streams.get(fields)
+        if stream is None:
+            chunks_type = NpzChunks if self.format == "npz" else ArrowChunks
+            chunks = chunks_type(self.directory, fields.__name__, self.compress)
+            stream = self.streams[fields] = _Stream(values, self.chunk_size, chunks, partial(self._write, chunks))
+        stream.append(self.clock() if t is None else t, values)
+
+    __call__ = append
+
+    def _write(self, chunks: Union[NpzChunks, ArrowChunks], columns: Mapping[str, array]) -> None:
+        # earlier writes that failed raise here, the ones still running are checked next time
+        done = [write for write in self._writes if write.done()]
+        self._writes = [write for write in self._writes if write not in done]
+        self._writes.append(self._executor.submit(chunks.write, columns))
+        for write in done:
+            write.result()
+
+    def wait(self) -> None:
+        """Block until every chunk handed to the worker thread is written, raising the first error."""
+        writes, self._writes = self._writes, list()
+        for write in writes:
+            write.result()
+
+    def flush(self) -> None:
+        """Write every partially filled chunk, waits for the worker thread."""
+        for stream in self.streams.values():
+            stream.flush()
+        self.wait()
+
+    def close(self) -> None:
+        self.detach()
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+            for stream in self.streams.values():
+                stream.chunks.close()
+
+    def attach(self, board: "Board") -> "TelemetryWriter":
+        """Write every message the board receives, until detached or closed."""
+        self.detach()
+        self._unsubscribe = board.subscribe(self.append)
+        return self
+
+    def detach(self) -> None:
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+    def __enter__(self) -> "TelemetryWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _member_data(mapped: mmap.mmap, info: zipfile.ZipInfo) -> memoryview:
+    """The bytes of a stored zip member, inside the mapped archive."""
+    name_length, extra_length = struct.unpack_from("<HH", mapped, info.header_offset + 26)
+    start = info.header_offset + ZIP_LOCAL_HEADER + name_length + extra_length
+    return memoryview(mapped)[start : start + info.file_size]
+
+
+def _read_npz(path: Path) -> Dict[str, memoryview]:
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()
+        if any(info.compress_type != zipfile.ZIP_STORED for info in infos):
+            return {Path(info.filename).stem: npy_column(memoryview(archive.read(info))) for info in infos}
+    with open(path, "rb") as file:
+        # the mapping stays valid after the file is closed, for as long as a column uses it
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return {Path(info.filename).stem: npy_column(_member_data(mapped, info)) for info in infos}
+
+
+def read_chunks(directory: Union[str, Path], fields: Union[str, Type[MSPFields]]) -> Iterator[Dict[str, memoryview]]:
+    """Columns of every NPZ chunk written for a message, in order.
+
+    Columns are memoryviews of doubles, `numpy.asarray` wraps them without copying. Uncompressed chunks
+    are memory mapped rather than read, compressed ones are decompressed once into memory.
+    The archives also load with `numpy.load`.
+    """
+    name = fields if isinstance(fields, str) else fields.__name__
+    for path in sorted((Path(directory) / name).glob("*.npz")):
+        yield _read_npz(path)
+
+
+def read_arrow(directory: Union[str, Path], fields: Union[str, Type[MSPFields]]) -> Any:
+    """The Arrow table written for a message over every session, memory mapped. Needs pyarrow.
+
+    Uncompressed tables reference the mapped files without copying, `table.to_pandas()` converts them.
+    """
+    import pyarrow
+    import pyarrow.ipc
+
+    directory = Path(directory)
+    name = fields if isinstance(fields, str) else fields.__name__
+    # the first session is opened even when missing, to raise FileNotFoundError
+    tables = [pyarrow.ipc.open_file(pyarrow.memory_map(str(_arrow_path(directory, name, 0)))).read_all()]
+    session = 1
+    while _arrow_path(directory, name, session).exists():
+        path = _arrow_path(directory, name, session)
+        tables.append(pyarrow.ipc.open_file(pyarrow.memory_map(str(path))).read_all())
+        session += 1
+    return tables[0] if len(tables) == 1 else pyarrow.concat_tables(tables)
@@ -0,0 +1,166 @@
+"""Live telemetry polling, decoupled from how often it is displayed."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Optional, Tuple, Type
+
+from .msp.fields.base import MSPFields
+from .msp.fields.boxes import BoxIds
+from .msp.fields.sensors import Attitude
+from .msp.fields.statuses import RawIMU, StatusEx
+from .msp.utils import FRAME_OVERHEAD
+
+if TYPE_CHECKING:
+    from .board import Board
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["Monitor", "MonitorFrame", "MONITOR_FIELDS"]
+
+MONITOR_FIELDS: Tuple[Type[MSPFields], ...] = (Attitude, RawIMU, StatusEx, BoxIds)
+# serial 8N1 sends a start and stop bit with every byte
+BITS_PER_BYTE = 10
+# seconds of history rates are measured over
+RATE_SPAN = 1.0
+DEFAULT_FPS = 10.0
+
+
+class RateWindow:
+    """Rate of events over the last span seconds."""
+
+    def __init__(self, span: float = RATE_SPAN) -> None:
+        self.span = span
+        self.events: Deque[Tuple[float, float]] = deque()
+
+    def add(self, now: float, amount: float = 1) -> None:
+        self.events.append((now, amount))
+        while now - self.events[0][0] > self.span:
+            self.events.popleft()
+
+    def rate(self) -> float:
+        """Amount per second between the oldest and newest events in the window."""
+        if len(self.events) < 2:
+            return 0.0
+        elapsed = self.events[-1][0] - self.events[0][0]
+        if elapsed <= 0:
+            return 0.0
+        # the first event marks the start of the window, its amount was sent before it
+        return sum(amount for _, amount in list(self.events)[1:]) / elapsed
+
+
+@dataclass
+class MonitorFrame:
+    """Latest polled values and link statistics, as handed to the renderer."""
+
+    values: Dict[Type[MSPFields], Any]
+    # completed poll cycles
+    cycles: int
+    poll_hz: float
+    # bytes per second on the wire for each message, request and response
+    throughput: Dict[Type[MSPFields], float] = field(default_factory=dict)
+    # share of the serial link's capacity used by each message
+    utilization: Dict[Type[MSPFields], float] = field(default_factory=dict)
+    # poll cycles merged into a later frame instead of being rendered
+    dropped: int = 0
+
+
+class Monitor:
+    """Polls telemetry from the board as fast as the link allows and renders at a bounded rate.
+
+    Polling and rendering run as separate tasks. Every poll cycle requests all fields in one
+    pipelined exchange and replaces the latest values, the renderer only ever draws the newest
+    of them, so cycles that complete while a frame is drawn are merged into the next frame.
+    Frames are drawn in a worker thread, a slow terminal doesn't hold up the event loop.
+
+    Args:
+        board (Board): connected board to poll.
+        fields (Iterable[MSPFields]): messages to request every cycle. Defaults to MONITOR_FIELDS.
+        interval (float): minimum seconds between poll cycles, 0 polls continuously.
+        clock (Callable[[], float]): times cycles and frames. Defaults to time.monotonic.
+    """
+
+    def __init__(
+        self,
+        board: "Board",
+        fields: Iterable[Type[MSPFields]] = MONITOR_FIELDS,
+        interval: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.board = board
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.clock = clock
+        self.latest: Dict[Type[MSPFields], Any] = dict()
+        self.cycles = 0
+        self.rendered = 0
+        self.dropped = 0
+        self._cycle_rate = RateWindow()
+        self._byte_rates = {fields: RateWindow() for fields in self.fields}
+        self._updated = asyncio.Event()
+
+    def _record(self, now: float, results: Iterable[Any]) -> None:
+        for fields, result in zip(self.fields, results):
+            if result is None:
+                logger.debug("No response for %s", fields.__name__)
+                continue
+            self.latest[fields] = result
+            self._byte_rates[fields].add(now, 2 * FRAME_OVERHEAD + len(result.payload))
+        self.cycles += 1
+        self._cycle_rate.add(now)
+        self._updated.set()
+
+    async def poll(self) -> None:
+        """Poll the fields until cancelled."""
+        while True:
+            results = await self.board.get_many(*self.fields, lazy=True)
+            self._record(self.clock(), results)
+            # let the renderer in between cycles even when the board answers instantly
+            await asyncio.sleep(self.interval)
+
+    def frame(self) -> MonitorFrame:
+        """Snapshot of the latest values and rates."""
+        capacity = self.board.baudrate / BITS_PER_BYTE
+        throughput = {fields: rate.rate() for fields, rate in self._byte_rates.items()}
+        return MonitorFrame(
+            values=dict(self.latest),
+            cycles=self.cycles,
+            poll_hz=self._cycle_rate.rate(),
+            throughput=throughput,
+            utilization={fields: rate / capacity for fields, rate in throughput.items()},
+            dropped=self.dropped,
+        )
+
+    async def render(self, draw: Callable[[MonitorFrame], Any], fps: float = DEFAULT_FPS) -> None:
+        """Draw the newest frame at most fps times a second, until cancelled."""
+        drawn_cycles = 0
+        while True:
+            await self._updated.wait()
+            self._updated.clear()
+            started = self.clock()
+            self.dropped += max(self.cycles - drawn_cycles - 1, 0)
+            drawn_cycles = self.cycles
+            frame = self.frame()
+            await asyncio.to_thread(draw, frame)
+            self.rendered += 1
+            # drawing took part of the frame already
+            await asyncio.sleep(max(0.0, 1 / fps - (self.clock() - started)))
+
+    async def run(
+        self, draw: Callable[[MonitorFrame], Any], fps: float = DEFAULT_FPS, duration: Optional[float] = None
+    ) -> None:
+        """Poll and render together, for duration seconds or until cancelled."""
+        tasks = [asyncio.create_task(self.poll()), asyncio.create_task(self.render(draw, fps))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=duration, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                # raise whatever stopped polling or rendering
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
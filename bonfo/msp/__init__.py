@@ -1,4 +1,12 @@
+from typing import Any
+
 from .codes import MSP
-from .fields import *  # noqa
 from .message import Message
 from .utils import in_message_builder, out_message_builder
+
+
+def __getattr__(name: str) -> Any:
+    # Fields are re-exported from bonfo.msp.fields, which loads their modules on first use
+    from . import fields
+
+    return getattr(fields, name)
@@ -1,6 +1,7 @@
+from datetime import datetime, timezone
+from functools import lru_cache
 from math import floor
 
-import arrow
 from construct import Adapter, Array, Byte, ExprAdapter, Int8ub, Int16ub, PaddedString, Validator, obj_
 
 from bonfo.msp.codes import MSP
@@ -61,15 +62,46 @@ DATE_TIME_LENGTH = 11 + 8
 GIT_HASH_LENGTH = 7
 
 
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+MONTH_NUMBERS = {name: number for number, name in enumerate(MONTHS, 1)}
+
+
+@lru_cache(maxsize=64)
+def parse_btfl_timestamp(raw: str) -> datetime:
+    """Parse betaflight's build timestamp, `MMM D YYYYHH:mm:ss`.
+
+    The day is space padded by the compiler's __DATE__ macro, so both `Jan  9 2022`
+    and `Jan 12 2022` are handled in the same pass. Results are memoized by the raw string.
+    """
+    try:
+        month, day, year_time = raw.split()
+        hour, minute, second = year_time[4:].split(":")
+        return datetime(
+            int(year_time[:4]),
+            MONTH_NUMBERS[month],
+            int(day),
+            int(hour),
+            int(minute),
+            int(second),
+            tzinfo=timezone.utc,
+        )
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Invalid betaflight timestamp: {raw!r}") from e
+
+
+def format_btfl_timestamp(value: datetime) -> str:
+    return f"{MONTHS[value.month - 1]} {value.day} {value.year}{value.hour:02}:{value.minute:02}:{value.second:02}"
+
+
 class TimestampAdapter(Adapter):
-    def _decode(self, obj, context, path) -> arrow.Arrow:
-        try:
-            return arrow.get(obj, "MMM  D YYYYHH:mm:ss")
-        except arrow.ParserError:
-            return arrow.get(obj, "MMM D YYYYHH:mm:ss")
+    def _decode(self, obj, context, path) -> datetime:
+        return parse_btfl_timestamp(obj)
 
     def _encode(self, obj, context, path) -> str:
-        return arrow.get(obj).format("MMM D YYYYHH:mm:ss")
+        if isinstance(obj, str):
+            obj = parse_btfl_timestamp(obj)
+        # arrow.Arrow and the like wrap a datetime
+        return format_btfl_timestamp(getattr(obj, "datetime", obj))
 
 
 BTFLTimestamp = TimestampAdapter(PaddedString(DATE_TIME_LENGTH, "utf8"))
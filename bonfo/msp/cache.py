@@ -0,0 +1,110 @@
+"""Memoization of decoded payloads for responses that rarely change."""
+import copy
+import dataclasses
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Collection, Dict, Hashable, Optional, Tuple
+
+from .codes import MSP
+from .fields.base import CompactFields, LazyFields
+from .utils import parse_payload
+
+logger = logging.getLogger(__name__)
+
+# values a shallow copy can share with the cached result
+IMMUTABLE_TYPES = (int, float, str, bytes, Enum, type(None))
+
+
+def _shareable(result: Any) -> bool:
+    """Whether handing out the result on a hit is cheaper than parsing again.
+
+    Compact results are read only and shared, lazy results haven't decoded anything yet and flat
+    results only hold immutable values, the last two are shallow copied. Results holding lists or
+    structs would need a deep copy, which costs as much as parsing.
+    """
+    if result is None or isinstance(result, (CompactFields, LazyFields)):
+        return True
+    return dataclasses.is_dataclass(result) and all(
+        isinstance(getattr(result, f.name), IMMUTABLE_TYPES) for f in dataclasses.fields(result)
+    )
+
+
+@dataclass
+class CodeCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class PayloadCacheStats(CodeCacheStats):
+    evictions: int = 0
+    codes: Dict[int, CodeCacheStats] = field(default_factory=dict)
+
+    def record(self, code: int, hit: bool) -> None:
+        code_stats = self.codes.setdefault(code, CodeCacheStats())
+        if hit:
+            self.hits += 1
+            code_stats.hits += 1
+        else:
+            self.misses += 1
+            code_stats.misses += 1
+
+
+class PayloadCache:
+    """Bounded LRU of decoded payloads, keyed by code, msp version and the raw payload bytes.
+
+    Polling something like StatusEx at idle or FeatureConfig returns the same bytes frame after
+    frame, a cache hit skips decoding them again. Compact results are read only and returned
+    as is. Lazy results and flat ones, like StatusEx or FeatureConfig, are returned as shallow
+    copies so changing one doesn't change the cache. Regular results holding lists or structs,
+    like RawIMU or PidCoefficients, aren't cached, parse those with compact=True to share them.
+
+    Args:
+        maxsize (int, optional): Number of decoded payloads to keep. Defaults to 128.
+        codes (Collection[MSP], optional): Only cache these codes, caches every code if None.
+    """
+
+    def __init__(self, maxsize: int = 128, codes: Optional[Collection[MSP]] = None) -> None:
+        self.maxsize = maxsize
+        self.codes = None if codes is None else frozenset(codes)
+        self.stats = PayloadCacheStats()
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.stats = PayloadCacheStats()
+
+    def parse(self, code: MSP, payload: bytes, lazy: bool = False, compact: bool = False, msp=None, **context) -> Any:
+        """Parse the payload like parse_payload, returning the memoized result when the bytes were seen before."""
+        if self.codes is not None and code not in self.codes:
+            return parse_payload(code, payload, lazy=lazy, compact=compact, msp=msp, **context)
+
+        key = (int(code), msp, bytes(payload), lazy, compact)
+        try:
+            result = self._entries[key]
+        except KeyError:
+            result = parse_payload(code, payload, lazy=lazy, compact=compact, msp=msp, **context)
+            if not _shareable(result):
+                return result
+            self.stats.record(code, hit=False)
+            self._entries[key] = result
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+        else:
+            self.stats.record(code, hit=True)
+            self._entries.move_to_end(key)
+
+        if result is None or isinstance(result, CompactFields):
+            return result
+        return copy.copy(result)
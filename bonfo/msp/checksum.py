@@ -0,0 +1,46 @@
+"""Checksum helpers for MSP frames."""
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import xor
+from typing import Dict
+
+# Below this many bytes a plain byte by byte reduce is quicker than the big int setup
+WORDWISE_MIN_LENGTH = 64
+
+
+def xor_checksum(data) -> int:
+    """MSP v1 checksum, the xor of every byte in the data length, code and payload section of a frame.
+
+    Longer data is read as one integer and folded in half until a single byte is left,
+    xor-ing a whole word per operation instead of a byte at a time.
+    """
+    width = len(data)
+    if width < WORDWISE_MIN_LENGTH:
+        return reduce(xor, data, 0)
+    value = int.from_bytes(data, "little")
+    while width > 1:
+        half = (width + 1) >> 1
+        bits = half << 3
+        value = (value >> bits) ^ (value & ((1 << bits) - 1))
+        width = half
+    return value
+
+
+@dataclass
+class ChecksumStats:
+    """Counts of received frames and checksum failures, overall and per code."""
+
+    frames: int = 0
+    failures: int = 0
+    dropped: int = 0
+    code_failures: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failures / self.frames if self.frames else 0.0
+
+    def record(self, code: int, ok: bool) -> None:
+        self.frames += 1
+        if not ok:
+            self.failures += 1
+            self.code_failures[code] = self.code_failures.get(code, 0) + 1
@@ -1,11 +1,10 @@
 from construct import FuncPath
 
-from bonfo.msp.fields.base import MSPFields
-
 
 def zero_none_len(data):
     # TODO: please fix this, the rebuild shouldn't be passing the data class here.
-    if isinstance(data, MSPFields):
+    # Duck typed MSPFields check, keeps the fields modules out of message struct imports
+    if hasattr(data, "get_struct"):
         return len(data.get_struct().build(data))
     if data is None:
         return 0
@@ -1,5 +1,54 @@
-from .boxes import *  # noqa
-from .config import *  # noqa
-from .pids import *  # noqa
-from .sensors import *  # noqa
-from .statuses import *  # noqa
+"""Dataclass fields for MSP messages.
+
+Fields modules are imported on first use, star imports still load all of them.
+"""
+import importlib
+from typing import Any, Dict
+
+_EXPORTS: Dict[str, str] = {
+    # boxes
+    "BoxNames": "boxes",
+    "BoxIds": "boxes",
+    "Boxes": "boxes",
+    # config
+    "RxConfig": "config",
+    "RcTuning": "config",
+    "SelectSetting": "config",
+    "EepromWrite": "config",
+    "CopyProfile": "config",
+    "Features": "config",
+    "FeatureConfig": "config",
+    # pids
+    "PidAdvanced": "pids",
+    "PidCoefficients": "pids",
+    # sensors
+    "Attitude": "sensors",
+    # statuses
+    "ApiVersion": "statuses",
+    "FcVariant": "statuses",
+    "FcVersion": "statuses",
+    "BuildInfo": "statuses",
+    "TargetCapabilitiesFlags": "statuses",
+    "ConfigurationProblemsFlags": "statuses",
+    "BoardInfo": "statuses",
+    "Uid": "statuses",
+    "AccTrim": "statuses",
+    "Name": "statuses",
+    "Status": "statuses",
+    "ActiveSensorsFlags": "statuses",
+    "ArmingDisableFlags": "statuses",
+    "ConfigStateFlags": "statuses",
+    "StatusEx": "statuses",
+    "GyroDetectionFlags": "statuses",
+    "SensorAlignment": "statuses",
+    "RawIMU": "statuses",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+    return getattr(module, name)
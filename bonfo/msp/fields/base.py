@@ -1,12 +1,16 @@
+import dataclasses
 import functools
 import logging
 from enum import Enum
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple, Type
 
+from construct import Construct, IfThenElse, ListContainer, Renamed, Select, Struct, Subconstruct, Union
 from construct_typed import DataclassMixin, DataclassStruct
 
 from bonfo.msp.codes import MSP
 
+from .registry import build_fields_mapping, registered_fields  # noqa
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +30,10 @@ class MSPFields(DataclassMixin):
     def __init_subclass__(cls, get_code: MSP = None, set_code: MSP = None) -> None:
         cls.get_code = get_code
         cls.set_code = set_code
+        for code in (get_code, set_code):
+            if code is not None:
+                # the first class defined for a code wins, generated lazy subclasses share their parent's codes
+                registered_fields.setdefault(code, cls)
 
     @classmethod
     @functools.cache
@@ -45,6 +53,90 @@ class MSPFields(DataclassMixin):
     def build(self):
         return self.get_struct().build(self)
 
+    @classmethod
+    def parse(cls, payload: bytes, lazy: bool = False, compact: bool = False, **context) -> Any:
+        """Parse a message payload into an instance of these fields.
+
+        Args:
+            payload (bytes): Message data, without the MSP framing.
+            lazy (bool, optional): Keep the raw payload and only decode fields on access. Defaults to False.
+            compact (bool, optional): Return a slotted, read only, CompactFields result. Defaults to False.
+
+        Returns:
+            MSPFields | CompactFields: The parsed fields, a lazy subclass of them or their compact form.
+        """
+        if lazy and compact:
+            raise ValueError("lazy and compact results are mutually exclusive")
+        if lazy:
+            return cls.get_lazy_type()(payload, **context)
+        if compact:
+            # parse with the inner Struct, skipping the dataclass instance entirely
+            container = cls.get_struct().subcon.parse(payload, **context)
+            compact_type = cls.get_compact_type()
+            return compact_type(*(container[name] for name in compact_type._fields))
+        return cls.get_struct().parse(payload, **context)
+
+    def to_compact(self) -> "CompactFields":
+        compact_type = self.get_compact_type()
+        return compact_type(*(getattr(self, name) for name in compact_type._fields))
+
+    @classmethod
+    @functools.cache
+    def get_field_offsets(cls) -> Dict[str, Tuple[int, Construct]]:
+        """Offsets of the fields that make up the fixed size start of the payload.
+
+        The prefix ends at the first field whose size depends on the context or the msp version.
+
+        Returns:
+            Dict[str, Tuple[int, Construct]]: field name to payload offset and the construct used to parse it
+        """
+        offsets = dict()
+        offset = 0
+        for subcon in cls.get_struct().subcon.subcons:
+            inner = subcon
+            while isinstance(inner, Renamed):
+                inner = inner.subcon
+            if isinstance(inner, IfThenElse):
+                break
+            try:
+                size = subcon.sizeof()
+            except Exception:
+                break
+            offsets[subcon.name] = (offset, subcon)
+            offset += size
+        return offsets
+
+    @classmethod
+    @functools.cache
+    def get_lazy_type(cls) -> Type["LazyFields"]:
+        """Returns a lazily decoding subclass of these fields, see LazyFields."""
+        return type(
+            f"Lazy{cls.__name__}",
+            (LazyFields, cls),
+            dict(__module__=cls.__module__, get_struct=classmethod(lambda _: cls.get_struct())),
+            get_code=cls.get_code,
+            set_code=cls.set_code,
+        )
+
+    @classmethod
+    @functools.cache
+    def get_compact_type(cls) -> Type["CompactFields"]:
+        """Returns a slotted, read only, result class for these fields, see CompactFields."""
+        fields = dataclasses.fields(cls)  # type:ignore
+        names = tuple(field.name for field in fields)
+        namespace: Dict[str, Any] = dict(
+            __slots__=names,
+            __module__=cls.__module__,
+            _fields=names,
+            _fields_type=cls,
+            get_code=cls.get_code,
+            set_code=cls.set_code,
+        )
+        if any(_parses_to_mapping(field.metadata.get("subcon")) for field in fields):
+            # dicts stay mutable and can't be hashed
+            namespace["__hash__"] = None
+        return type(f"Compact{cls.__name__}", (CompactFields,), namespace)
+
     @classmethod
     @functools.cache
     def get_direction(cls) -> Optional[Direction]:
@@ -57,13 +149,129 @@ class MSPFields(DataclassMixin):
         return None
 
 
-@functools.cache
-def build_fields_mapping() -> Dict[MSP, Optional[DataclassStruct[Any]]]:
-    fields_mappings = dict()
-    for fields in MSPFields.__subclasses__():
-        struct = fields.get_struct()
-        if fields.get_code is not None:
-            fields_mappings[fields.get_code] = struct
-        if fields.set_code is not None:
-            fields_mappings[fields.set_code] = struct
-    return fields_mappings
+class LazyFields:
+    """Mixin for MSPFields results that hold on to the raw payload and decode fields on first access.
+
+    Fields in the fixed size start of the payload are decoded individually, anything else
+    decodes the whole payload once. Decoded values are stored on the instance like a
+    regular dataclass, so later access costs nothing extra.
+    """
+
+    def __init__(self, payload: bytes, **context) -> None:
+        self.__dict__["_lazy_payload"] = bytes(payload)
+        self.__dict__["_lazy_context"] = context
+
+    @property
+    def payload(self) -> bytes:
+        return self._lazy_payload
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in self.__dataclass_fields__:  # type:ignore
+            raise AttributeError(name)
+        offsets = self.get_field_offsets()  # type:ignore
+        if name in offsets:
+            offset, subcon = offsets[name]
+            value = subcon.parse(self._lazy_payload[offset:], **self._lazy_context)
+            self.__dict__[name] = value
+            return value
+        return getattr(self.decode(), name)
+
+    def decode(self) -> "MSPFields":
+        """Decode the full payload and store every field on this instance.
+
+        Returns:
+            MSPFields: A regular, eagerly parsed, instance of the fields.
+        """
+        decoded = self.get_struct().parse(self._lazy_payload, **self._lazy_context)  # type:ignore
+        for field in dataclasses.fields(decoded):
+            self.__dict__.setdefault(field.name, getattr(decoded, field.name))
+        return decoded
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, self.get_struct().dc_type):  # type:ignore
+            return NotImplemented
+        return all(getattr(self, f.name) == getattr(other, f.name) for f in dataclasses.fields(self))  # type:ignore
+
+    __hash__ = None  # type:ignore
+
+
+def _compact_from(fields_type: Type[MSPFields], values: Tuple[Any, ...]) -> "CompactFields":
+    return fields_type.get_compact_type()(*values)
+
+
+def _parses_to_mapping(subcon: Optional[Construct]) -> bool:
+    """Whether a field's values are dicts, or hold them."""
+    if isinstance(subcon, (Struct, Union)):
+        return True
+    if isinstance(subcon, Select):
+        return any(_parses_to_mapping(option) for option in subcon.subcons)
+    if isinstance(subcon, Subconstruct):
+        return _parses_to_mapping(subcon.subcon)
+    return False
+
+
+def _freeze(value: Any) -> Any:
+    """Lists as tuples, all the way down."""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Tuples back into the ListContainers parsing gives."""
+    if isinstance(value, tuple):
+        return ListContainer(_thaw(item) for item in value)
+    return value
+
+
+class CompactFields:
+    """Slotted, read only, MSPFields result without a per instance __dict__.
+
+    Meant for holding large numbers of samples, like Attitude or RawIMU telemetry.
+    Compares equal to the regular dataclass with the same values, use to_fields() to get one back.
+    Lists are held as tuples, so arrays like RawIMU.gyroscope can't be changed in place either and the
+    result hashes. Fields holding structs aren't hashable.
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _fields_type: Type[MSPFields]
+
+    def __init__(self, *values: Any) -> None:
+        if len(values) != len(self._fields):
+            raise TypeError(f"{type(self).__name__} takes {len(self._fields)} values, got {len(values)}")
+        for name, value in zip(self._fields, values):
+            object.__setattr__(self, name, _freeze(value))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise dataclasses.FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def astuple(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def to_fields(self) -> MSPFields:
+        values = {name: _thaw(value) for name, value in zip(self._fields, self.astuple())}
+        return self._fields_type(**values)  # type:ignore
+
+    def build(self) -> bytes:
+        return self._fields_type.get_struct().build(self.to_fields())  # type:ignore
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, CompactFields) and other._fields_type is self._fields_type:
+            return self.astuple() == other.astuple()
+        if isinstance(other, self._fields_type):
+            return self.astuple() == tuple(_freeze(getattr(other, name)) for name in self._fields)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self._fields_type, self.astuple()))
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({values})"
+
+    def __reduce__(self):
+        return (_compact_from, (self._fields_type, self.astuple()))
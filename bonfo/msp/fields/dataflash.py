@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+from construct import Flag, GreedyBytes, Int8ub, Int16ul, Int32ul
+from construct_typed import FlagsEnumBase, TFlagsEnum, csfield
+
+from ..codes import MSP
+from .base import MSPFields
+from .utils import BIT
+
+__all__ = ["DataflashRead", "DataflashReadRequest", "DataflashSummary", "DataflashSummaryFlags"]
+
+
+class DataflashSummaryFlags(FlagsEnumBase):
+    READY = BIT(0)
+    SUPPORTED = BIT(1)
+
+
+@dataclass
+class DataflashSummary(MSPFields, get_code=MSP.DATAFLASH_SUMMARY):
+    flags: DataflashSummaryFlags = csfield(TFlagsEnum(Int8ub, DataflashSummaryFlags))
+    sectors: int = csfield(Int32ul)
+    total_size: int = csfield(Int32ul, "flash size in bytes")
+    used_size: int = csfield(Int32ul, "bytes of logs written")
+
+    @property
+    def ready(self) -> bool:
+        return DataflashSummaryFlags.READY in self.flags
+
+    @property
+    def supported(self) -> bool:
+        return DataflashSummaryFlags.SUPPORTED in self.flags
+
+
+# The reply is defined first so frames with its code are parsed as replies
+@dataclass
+class DataflashRead(MSPFields, get_code=MSP.DATAFLASH_READ):
+    address: int = csfield(Int32ul)
+    size: int = csfield(Int16ul, "bytes of data, fewer than requested at the end of the flash")
+    compression: int = csfield(Int8ub, "0 unless compression was allowed")
+    data: bytes = csfield(GreedyBytes)
+
+
+@dataclass
+class DataflashReadRequest(MSPFields, set_code=MSP.DATAFLASH_READ):
+    address: int = csfield(Int32ul)
+    size: int = csfield(Int16ul)
+    allow_compression: bool = csfield(Flag)
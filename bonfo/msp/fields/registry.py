@@ -0,0 +1,137 @@
+"""Registry of the modules that define MSPFields for each MSP code.
+
+Fields modules are imported the first time one of their codes is parsed or built,
+so importing bonfo doesn't pay for every message definition up front.
+"""
+import importlib
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Optional, Type
+
+from bonfo.msp.codes import MSP
+
+if TYPE_CHECKING:
+    from construct_typed import DataclassStruct
+
+    from .base import MSPFields
+
+BOXES = "bonfo.msp.fields.boxes"
+CONFIG = "bonfo.msp.fields.config"
+DATAFLASH = "bonfo.msp.fields.dataflash"
+PIDS = "bonfo.msp.fields.pids"
+SENSORS = "bonfo.msp.fields.sensors"
+STATUSES = "bonfo.msp.fields.statuses"
+
+FIELDS_MODULES: Dict[MSP, str] = {
+    MSP.BOXNAMES: BOXES,
+    MSP.BOXIDS: BOXES,
+    MSP.SELECT_SETTING: CONFIG,
+    MSP.COPY_PROFILE: CONFIG,
+    MSP.EEPROM_WRITE: CONFIG,
+    MSP.RX_CONFIG: CONFIG,
+    MSP.SET_RX_CONFIG: CONFIG,
+    MSP.RC_TUNING: CONFIG,
+    MSP.SET_RC_TUNING: CONFIG,
+    MSP.FEATURE_CONFIG: CONFIG,
+    MSP.SET_FEATURE_CONFIG: CONFIG,
+    MSP.DATAFLASH_SUMMARY: DATAFLASH,
+    MSP.DATAFLASH_READ: DATAFLASH,
+    MSP.PID: PIDS,
+    MSP.PID_ADVANCED: PIDS,
+    MSP.SET_PID_ADVANCED: PIDS,
+    MSP.ATTITUDE: SENSORS,
+    MSP.API_VERSION: STATUSES,
+    MSP.FC_VARIANT: STATUSES,
+    MSP.FC_VERSION: STATUSES,
+    MSP.BUILD_INFO: STATUSES,
+    MSP.BOARD_INFO: STATUSES,
+    MSP.SET_BOARD_INFO: STATUSES,
+    MSP.UID: STATUSES,
+    MSP.NAME: STATUSES,
+    MSP.SET_NAME: STATUSES,
+    MSP.ACC_TRIM: STATUSES,
+    MSP.STATUS: STATUSES,
+    MSP.STATUS_EX: STATUSES,
+    MSP.RAW_IMU: STATUSES,
+    MSP.SENSOR_ALIGNMENT: STATUSES,
+    MSP.SET_SENSOR_ALIGNMENT: STATUSES,
+}
+
+# Filled in by MSPFields.__init_subclass__ as fields modules are imported
+registered_fields: Dict[int, Type["MSPFields"]] = dict()
+
+
+def get_fields(code: int) -> Optional[Type["MSPFields"]]:
+    """Returns the MSPFields class for the code, importing its module if needed."""
+    fields = registered_fields.get(code)
+    if fields is None and code in FIELDS_MODULES:
+        importlib.import_module(FIELDS_MODULES[code])  # type:ignore
+        fields = registered_fields.get(code)
+    return fields
+
+
+class FieldsMapping(Mapping[MSP, Optional["DataclassStruct[Any]"]]):
+    """Read only mapping of MSP code to fields struct, loading fields modules on first lookup."""
+
+    def __init__(self, modules: Dict[MSP, str]) -> None:
+        self.modules = modules
+
+    def __getitem__(self, code: int) -> Optional["DataclassStruct[Any]"]:
+        fields = get_fields(code)
+        if fields is None:
+            raise KeyError(code)
+        return fields.get_struct()
+
+    def __iter__(self) -> Iterator[MSP]:
+        return iter(self.modules)
+
+    def __len__(self) -> int:
+        return len(self.modules)
+
+    def __contains__(self, code: object) -> bool:
+        return code in self.modules
+
+
+class FrameDispatch:
+    """Dispatch table from a raw frame code to the struct that parses its payload.
+
+    MSP v1 codes index into a flat 256 entry list, larger MSP v2 codes use a sparse dict.
+    Entries are resolved through the fields registry on first use, after that a lookup is a list index.
+    """
+
+    _unresolved = object()
+
+    def __init__(self, modules: Dict[MSP, str]) -> None:
+        self.table: List[Any] = [None] * 256
+        self.extended: Dict[int, Any] = dict()
+        for code in modules:
+            self._store(code, self._unresolved)
+
+    def _store(self, code: int, struct: Any) -> None:
+        if code < 256:
+            self.table[code] = struct
+        else:
+            self.extended[code] = struct
+
+    def _resolve(self, code: int) -> Optional["DataclassStruct[Any]"]:
+        fields = get_fields(code)
+        struct = None if fields is None else fields.get_struct()
+        self._store(code, struct)
+        return struct
+
+    def __getitem__(self, code: int) -> Optional["DataclassStruct[Any]"]:
+        struct = self.table[code] if code < 256 else self.extended.get(code)
+        if struct is self._unresolved:
+            return self._resolve(code)
+        return struct
+
+    def get(self, code: int, default: Any = None) -> Any:
+        struct = self[code]
+        return default if struct is None else struct
+
+
+fields_mapping = FieldsMapping(FIELDS_MODULES)
+
+frame_dispatch = FrameDispatch(FIELDS_MODULES)
+
+
+def build_fields_mapping() -> FieldsMapping:
+    return fields_mapping
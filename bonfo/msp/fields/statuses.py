@@ -2,10 +2,10 @@
 
 
 from dataclasses import dataclass
+from datetime import datetime
 from functools import cached_property
 from typing import Optional, Union
 
-from arrow import Arrow
 from construct import (
     Array,
     FixedSized,
@@ -82,7 +82,7 @@ class FcVersion(MSPFields, get_code=MSP.FC_VERSION):
 
 @dataclass
 class BuildInfo(MSPFields, get_code=MSP.BUILD_INFO):
-    date_time: Union[str, Arrow] = csfield(BTFLTimestamp)
+    date_time: Union[str, datetime] = csfield(BTFLTimestamp)
     git_hash: str = csfield(GitHash)
 
 
@@ -1,6 +1,3 @@
-from functools import reduce
-from operator import xor
-
 from construct import (
     Byte,
     Checksum,
@@ -10,7 +7,6 @@ from construct import (
     FixedSized,
     Hex,
     Int8ub,
-    Mapping,
     RawCopy,
     Rebuild,
     Struct,
@@ -19,12 +15,11 @@ from construct import (
 
 from bonfo.msp.structs import FrameStruct
 
-from .adapters import MessageType
-from .codes import frame_map
+from .checksum import xor_checksum
 from .expr import zero_none_len_
 
-# INFO: Make sure all fields are loaded before processing messages
-from .fields import *  # noqa
+# Frame ids are kept as raw integers, payload structs are found through the integer keyed
+# frame dispatch table. Convert to the MSP enum only for display.
 
 # fmt: off
 # MSP v1 message struct
@@ -46,12 +41,12 @@ Message = Struct(
     # "_is_out" / Computed(this.message_type == "OUT"),
     "packet" / RawCopy(Struct(
         "data_length" / Rebuild(Byte, zero_none_len_(this.fields)),
-        "frame_id" / Mapping(MessageType, frame_map),
+        "frame_id" / Byte,
         "fields" / FixedSized(this.data_length, FrameStruct(this.frame_id)),  # type:ignore
     )),
     "crc" / Hex(Checksum(
         Byte,
-        lambda data: reduce(xor, data, 0),
+        xor_checksum,
         this.packet.data
     ))
 )
@@ -82,7 +77,7 @@ Preamble = Struct(
     #     ), "V1"),
     "message_type" / Default(MessageTypeEnum, "IN"),
     "data_length" / Int8ub,
-    "frame_id" / Mapping(MessageType, frame_map),
+    "frame_id" / Byte,
 )
 
 Data = Struct(
@@ -90,10 +85,10 @@ Data = Struct(
     / RawCopy(
         Struct(
             "data_length" / Int8ub,
-            "frame_id" / Mapping(MessageType, frame_map),
+            "frame_id" / Byte,
             "fields" / FixedSized(this.data_length, FrameStruct(this.frame_id)),  # type:ignore
         )
     ),
     # "crc" / Byte
-    "crc" / Hex(Checksum(Byte, lambda data: reduce(xor, data, 0), this.packet.data)),
+    "crc" / Hex(Checksum(Byte, xor_checksum, this.packet.data)),
 )
@@ -1,9 +1,12 @@
 import logging
+from typing import TYPE_CHECKING
 
-from construct import Checksum, ChecksumError, IfThenElse, Optional, Switch
+from construct import Checksum, ChecksumError, Construct, IfThenElse, Optional, Pass, Switch
 
 from bonfo.msp.codes import MSP
-from bonfo.msp.versions import MSPVersions
+
+if TYPE_CHECKING:
+    from bonfo.msp.versions import MSPVersions
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +14,7 @@ logger = logging.getLogger(__name__)
 class MSPCutoff(IfThenElse):  # type:ignore
     """MSPCutoff returns an optional struct if the context msp version is less than specified."""
 
-    def __init__(self, thensubcon, version_added: MSPVersions, elsesubcon=None) -> None:
+    def __init__(self, thensubcon, version_added: "MSPVersions", elsesubcon=None) -> None:
         self.version_added = version_added
         if elsesubcon is None:
             elsesubcon = Optional(thensubcon)
@@ -21,7 +24,7 @@ class MSPCutoff(IfThenElse):  # type:ignore
 
     def version_checker(self, context):
         # Get msp version from params context
-        msp: MSPVersions = context._params.get("msp", None)
+        msp: "MSPVersions" = context._params.get("msp", None)
         if msp is not None:
             return msp >= self.version_added.value
         return True
@@ -38,12 +41,25 @@ class LenientChecksum(Checksum):
             return self.checksumfield._parsereport(stream, context, path)
 
 
+class FieldsSwitch(Switch):  # type:ignore
+    """Switch over the frame dispatch table that doesn't touch every case when created.
+
+    Construct's Switch walks all cases up front, which would import every fields module.
+    Cases are looked up by the raw integer frame code.
+    """
+
+    def __init__(self, keyfunc, cases, default=None) -> None:
+        Construct.__init__(self)
+        self.keyfunc = keyfunc
+        self.cases = cases
+        self.default = Pass if default is None else default
+
+
 def FrameStruct(frame_id: MSP):
     """FrameStruct wraps a optional switch so as to not cause errors when no data is passed."""
-    # load all fields to make sure sub classes are populated
-    from .fields.base import build_fields_mapping
+    from .fields.registry import frame_dispatch
 
-    return Optional(Switch(frame_id, build_fields_mapping()))  # type:ignore
+    return Optional(FieldsSwitch(frame_id, frame_dispatch))  # type:ignore
 
 
 # def SpecifiedString
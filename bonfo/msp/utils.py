@@ -1,16 +1,102 @@
 import logging
 
-from construct import Debugger
+from construct import ConstructError, Debugger
 
+from .checksum import xor_checksum
 from .codes import MSP
+from .fields.base import MSPFields
+from .fields.registry import frame_dispatch
 from .message import Message
 
 logger = logging.getLogger(__name__)
 
+MESSAGE_TYPES = {
+    "IN": ord(">"),
+    "OUT": ord("<"),
+    "ERR": ord("!"),
+}
+
+# $ + M + message type + data length + code ... crc
+FRAME_OVERHEAD = 6
+MAX_PAYLOAD_LENGTH = 255
+
+
+def build_payload(code: MSP, fields=None, **context) -> bytes:
+    """Serialize the fields of a message exactly once.
+
+    Args:
+        code (MSP): MSP code the payload is sent with, used to find the struct when fields isn't an MSPFields.
+        fields (MSPFields | dict | bytes, optional): data to serialize, raw bytes are passed through untouched.
+
+    Returns:
+        bytes: The message payload, without any framing.
+    """
+    if fields is None:
+        return b""
+    if isinstance(fields, (bytes, bytearray, memoryview)):
+        return bytes(fields)
+    if isinstance(fields, MSPFields):
+        return fields.get_struct().build(fields, **context)
+    struct = frame_dispatch[code]
+    if struct is None:
+        raise ValueError(f"No fields registered for {msp_name(code)}")
+    return struct.build(fields, **context)
+
+
+def pack_message(message_type: str, code: MSP, payload: bytes = b"") -> bytes:
+    """Frame an already serialized payload into a complete MSP v1 message.
+
+    The frame is written into a single preallocated buffer, the data length and checksum
+    are filled in around the payload without any further struct building.
+    """
+    size = len(payload)
+    if size > MAX_PAYLOAD_LENGTH:
+        raise ValueError(f"Payload of {size} bytes is too large for an MSP v1 frame")
+    buff = bytearray(size + FRAME_OVERHEAD)
+    buff[0] = ord("$")
+    buff[1] = ord("M")
+    buff[2] = MESSAGE_TYPES[message_type]
+    buff[3] = size
+    buff[4] = int(code)
+    buff[5:-1] = payload
+    buff[-1] = xor_checksum(memoryview(buff)[3:-1])
+    return bytes(buff)
+
+
+def parse_payload(code: MSP, payload: bytes, lazy: bool = False, compact: bool = False, **context):
+    """Parse a message payload with the fields registered for the code.
+
+    Args:
+        code (MSP): MSP code of the received frame.
+        payload (bytes): Message data, without the MSP framing.
+        lazy (bool, optional): Return a LazyFields result that decodes on attribute access. Defaults to False.
+        compact (bool, optional): Return a slotted CompactFields result. Defaults to False.
+
+    Returns:
+        MSPFields | CompactFields | None: Parsed fields, or None if there was no payload or no fields for the code.
+    """
+    struct = frame_dispatch[code]
+    if struct is None or not payload:
+        return None
+    try:
+        return struct.dc_type.parse(payload, lazy=lazy, compact=compact, **context)
+    except ConstructError as e:
+        logger.exception("Error parsing payload for %s", code, exc_info=e)
+        return None
+
+
+def msp_name(code: int) -> str:
+    """Display name of a frame code."""
+    try:
+        return MSP(code).name
+    except ValueError:
+        return str(code)
+
 
 def message_builder(message_type: str, code: MSP, fields=None, debug=False, **context):
-    Msg = Debugger(Message) if debug else Message
-    return Msg.build(  # type: ignore
+    if not debug:
+        return pack_message(message_type, code, build_payload(code, fields, **context))
+    return Debugger(Message).build(  # type: ignore
         dict(message_type=message_type, packet=dict(value=dict(frame_id=code, fields=fields)), **context)
     )
 
@@ -0,0 +1,155 @@
+"""Betaflight CLI mode sessions, streaming command output and indexing settings as it arrives."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .board import Board
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["CliParser", "CliSession", "CliSettings", "cli_session"]
+
+PROMPT = "# "
+ENCODING = "ascii"
+READ_SIZE = 4096
+# seconds without output before a command is given up on
+IDLE_TIMEOUT = 5.0
+# comment lines start like the prompt, wait this long for more of the line before calling it the prompt
+PROMPT_GRACE = 0.02
+
+
+@dataclass
+class CliSettings:
+    """Settings indexed from CLI output like `diff all` or `dump`.
+
+    Profiles are numbered from 1 like everywhere else in bonfo, the CLI counts them from 0.
+    """
+
+    settings: Dict[str, str] = field(default_factory=dict)
+    features: Dict[str, bool] = field(default_factory=dict)
+    pid_profiles: Dict[int, Dict[str, str]] = field(default_factory=dict)
+    rate_profiles: Dict[int, Dict[str, str]] = field(default_factory=dict)
+    # other commands like serial, aux or resource, in the order they were printed
+    commands: List[str] = field(default_factory=list)
+    # leading comments, the firmware and board identity
+    header: List[str] = field(default_factory=list)
+
+
+class CliParser:
+    """Builds CliSettings one line at a time, so output can be indexed while it is still streaming."""
+
+    def __init__(self) -> None:
+        self.result = CliSettings()
+        self._section = self.result.settings
+        self._started = False
+
+    def feed(self, line: str) -> None:
+        line = line.strip()
+        if not line:
+            return
+        if line.startswith("#"):
+            if not self._started:
+                self.result.header.append(line.lstrip("# "))
+            return
+        self._started = True
+        command, _, rest = line.partition(" ")
+        if command == "set":
+            name, _, value = rest.partition("=")
+            self._section[name.strip()] = value.strip()
+        elif command == "feature":
+            name = rest.strip()
+            enabled = not name.startswith("-")
+            self.result.features[name.lstrip("-")] = enabled
+        elif command in ("profile", "rateprofile") and rest.strip().isdigit():
+            profiles = self.result.pid_profiles if command == "profile" else self.result.rate_profiles
+            self._section = profiles.setdefault(int(rest) + 1, dict())
+        elif command in ("batch", "save", "defaults"):
+            return
+        else:
+            self.result.commands.append(line)
+
+
+class CliSession:
+    """Commands sent to the board's CLI mode, output read until the prompt comes back.
+
+    Holds the board's message lock for its lifetime, MSP requests wait until the session ends.
+    """
+
+    def __init__(
+        self, board: "Board", idle_timeout: float = IDLE_TIMEOUT, prompt_grace: float = PROMPT_GRACE
+    ) -> None:
+        self.board = board
+        self.idle_timeout = idle_timeout
+        self.prompt_grace = prompt_grace
+        self._pending = ""
+
+    async def _read(self, timeout: float) -> str:
+        chunk = await asyncio.wait_for(self.board.reader.read(READ_SIZE), timeout)
+        if not chunk:
+            raise ConnectionError("board closed the connection")
+        return chunk.decode(ENCODING, errors="replace")
+
+    async def _lines(self) -> AsyncIterator[str]:
+        """Complete output lines until the prompt, as they arrive."""
+        while True:
+            if self._pending == PROMPT:
+                try:
+                    self._pending += await self._read(self.prompt_grace)
+                except asyncio.TimeoutError:
+                    # nothing followed, this is the prompt
+                    self._pending = ""
+                    return
+            else:
+                self._pending += await self._read(self.idle_timeout)
+            *lines, self._pending = self._pending.replace("\r", "").split("\n")
+            for line in lines:
+                yield line
+
+    async def open(self) -> List[str]:
+        """Enter CLI mode, returns the banner."""
+        self.board.writer.write(b"#")
+        return [line async for line in self._lines() if line]
+
+    async def stream(self, command: str) -> AsyncIterator[str]:
+        """Send a command and yield its output lines as they arrive, without the echoed command."""
+        self.board.writer.write(command.encode(ENCODING) + b"\r")
+        echoed = False
+        async for line in self._lines():
+            if not echoed and line.strip().endswith(command):
+                echoed = True
+                continue
+            yield line
+
+    async def run(self, command: str) -> List[str]:
+        return [line async for line in self.stream(command)]
+
+    async def capture(self, command: str = "diff all", lines: Optional[List[str]] = None) -> CliSettings:
+        """Index the output of a command like `diff all` or `dump`, keeping its raw lines in lines."""
+        parser = CliParser()
+        async for line in self.stream(command):
+            if lines is not None:
+                lines.append(line)
+            parser.feed(line)
+        return parser.result
+
+    def exit(self) -> None:
+        """Leave CLI mode, the board reboots."""
+        self.board.writer.write(b"exit\r")
+
+
+@asynccontextmanager
+async def cli_session(board: "Board", **options) -> AsyncIterator[CliSession]:
+    """Run the body in CLI mode, exiting it afterwards, which reboots the board."""
+    async with board.message_lock:
+        session = CliSession(board, **options)
+        await session.open()
+        try:
+            yield session
+        finally:
+            session.exit()
@@ -1,14 +1,19 @@
 """Profile package for Bonfo."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import TYPE_CHECKING, AsyncIterator, Optional, Tuple
+from itertools import zip_longest
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Type
 
-from .msp.fields.config import SelectPID, SelectRate
+from .msp.fields.base import MSPFields
+from .msp.fields.config import RcTuning, SelectPID, SelectRate
+from .msp.fields.pids import PidAdvanced, PidCoefficients
 from .msp.fields.statuses import StatusEx
+from .scheduler import ProfileScheduler, compatible
 
 if TYPE_CHECKING:
     from .board import Board
@@ -16,7 +21,30 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
-__all__ = ["Profile"]
+__all__ = ["Profile", "ProfileMatrix"]
+
+PID_PROFILE_COUNT = 3
+RATE_PROFILE_COUNT = 6
+
+# Fields that are stored per PID or rate profile on the board
+PID_PROFILE_FIELDS: Tuple[Type[MSPFields], ...] = (PidCoefficients, PidAdvanced)
+RATE_PROFILE_FIELDS: Tuple[Type[MSPFields], ...] = (RcTuning,)
+
+
+def profile_order(selected: int, count: int) -> List[int]:
+    """Order to visit every profile in, starting with the selected one so it doesn't need switching to."""
+    return [selected] + [profile for profile in range(1, count + 1) if profile != selected]
+
+
+@dataclass
+class ProfileMatrix:
+    """Profile specific fields read from every PID and rate profile.
+
+    Results are keyed by profile number and then by the fields class, e.g. `matrix.pid[2][PidAdvanced]`.
+    """
+
+    pid: Dict[int, Dict[Type[MSPFields], Any]] = field(default_factory=dict)
+    rate: Dict[int, Dict[Type[MSPFields], Any]] = field(default_factory=dict)
 
 
 @dataclass
@@ -46,6 +74,11 @@ class Profile:
     # hold previous profiles for reversion purposes
     _revert_to_profiles: Tuple[int, int] = field(default_factory=lambda: (1, 1), repr=False)
 
+    # serializes profile scoped work from concurrent tasks, see ProfileScheduler
+    _scheduler: ProfileScheduler = field(default_factory=ProfileScheduler, init=False, repr=False, compare=False)
+    # contexts granted together take turns checking and switching the selection
+    _switch_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False, repr=False, compare=False)
+
     class SyncedState(Enum):
         """Local synced/saved status for selected profiles."""
 
@@ -69,7 +102,7 @@ class Profile:
     def pid(self, pid: Optional[int]) -> None:
         if pid is None:
             return
-        assert pid in range(1, 4), "PID out of range"
+        assert pid in range(1, PID_PROFILE_COUNT + 1), "PID out of range"
         self._profile_tracker = (pid, self._profile_tracker[1])
         self._state = self.SyncedState.AWAITING_APPLY
 
@@ -83,7 +116,7 @@ class Profile:
     def rate(self, rate: Optional[int]) -> None:
         if rate is None:
             return
-        assert rate in range(1, 7), "Rate out of range"
+        assert rate in range(1, RATE_PROFILE_COUNT + 1), "Rate out of range"
         self._profile_tracker = (self._profile_tracker[0], rate)
         self._state = self.SyncedState.AWAITING_APPLY
 
@@ -96,31 +129,67 @@ class Profile:
     async def __call__(
         self, pid: Optional[int] = None, rate: Optional[int] = None, revert_on_exit=False
     ) -> AsyncIterator["Profile"]:
-        self._state = self.SyncedState.FETCHING
+        """Run the body of the context with the pid and rate profiles selected on the board.
 
+        Concurrent contexts are scheduled so the board stays on one selection while any of them run,
+        contexts wanting the same profiles share a single switch. With revert_on_exit the previous
+        profiles are restored once no other profile work is running or waiting. Contexts nested in
+        one another, or read_all inside one, run under the outer context and switch the board in place.
+        """
         # wait here till the board is ready
         await self.board.ready.wait()
 
-        logger.debug("Asked to set profiles to: %s", (pid, rate))
-        logger.debug("Got current profiles from Board: %s", self._profile_tracker)
+        await self._scheduler.acquire((pid, rate), (self._pid, self._rate))
+        try:
+            async with self._switch_lock:
+                # already switched by another context in the same group
+                synced = self._state == self.SyncedState.CLEAN and compatible((self._pid, self._rate), (pid, rate))
+
+                logger.debug("Asked to set profiles to: %s", (pid, rate))
+                logger.debug("Got current profiles from Board: %s", self._profile_tracker)
+
+                self._revert_to_profiles = revert_to = (self.pid, self.rate)
+                logger.debug("Setting _revert_to_profiles to: %s", self._revert_to_profiles)
+
+                if not synced:
+                    self._state = self.SyncedState.FETCHING
+                    (self.pid, self.rate) = (pid, rate)  # type:ignore
 
-        self._revert_to_profiles = (self.pid, self.rate)
-        logger.debug("Setting _revert_to_profiles to: %s", self._revert_to_profiles)
+                await self.apply_changes()
 
-        (self.pid, self.rate) = (pid, rate)  # type:ignore
+            logger.debug("returning profile context")
 
-        await self.apply_changes()
+            yield self
 
-        logger.debug("returning profile context")
+            if revert_on_exit:
+                self._scheduler.request_revert(revert_to)
+            revert_to = self._scheduler.take_revert()  # type:ignore
+            if revert_to is not None:
+                logger.debug("reverting profiles")
+                async with self._switch_lock:
+                    (self.pid, self.rate) = revert_to
+                    await self.apply_changes()
+        finally:
+            self._scheduler.release((self._pid, self._rate))
 
-        yield self
-        if revert_on_exit:
-            logger.debug("reverting profiles")
-            (self.pid, self.rate) = self._revert_to_profiles
-            await self.apply_changes()
+    @asynccontextmanager
+    async def restore_on_exit(self) -> AsyncIterator["Profile"]:
+        """Select the currently selected profiles again once the body is done switching between others."""
+        original = (self._pid, self._rate)
+        try:
+            yield self
+        finally:
+            if (self._pid, self._rate) != original:
+                async with self(pid=original[0], rate=original[1]):
+                    pass
 
     async def _set_profiles_from_board(self) -> Tuple[int, int]:
-        status = await (self.board > StatusEx)
+        # Only the selected profiles are needed, leave the rest of the payload undecoded
+        status = await self.board.get(StatusEx, lazy=True)
+        return self._sync_from_status(status)
+
+    def _sync_from_status(self, status: Optional[StatusEx]) -> Tuple[int, int]:
+        """Update the selected profiles from a StatusEx read from the board."""
         if status is None:
             return self._profile_tracker
         self._state = self.SyncedState.CLEAN
@@ -128,11 +197,13 @@ class Profile:
         return self._profile_tracker
 
     async def _send_pid_to_board(self, pid) -> bool:
+        """Select a PID profile on the board, raises MessageError if the board refuses it."""
         logger.debug("PID profile to: %s", pid)
         await (self.board < SelectPID(pid))
         return True
 
     async def _send_rate_to_board(self, rate) -> bool:
+        """Select a rate profile on the board, raises MessageError if the board refuses it."""
         logger.debug("Rate profile to: %s", rate)
         await (self.board < SelectRate(rate))
         return True
@@ -157,3 +228,70 @@ class Profile:
         if asked_pid != found_pid or asked_rate != found_rate:
             return False
         return True
+
+    async def read_all(
+        self,
+        pid_fields: Sequence[Type[MSPFields]] = PID_PROFILE_FIELDS,
+        rate_fields: Sequence[Type[MSPFields]] = RATE_PROFILE_FIELDS,
+        lazy: bool = False,
+    ) -> ProfileMatrix:
+        """Read the profile specific fields of every PID and rate profile.
+
+        Each profile is selected exactly once, starting with the currently selected ones and ending
+        on the original selection. The reads for a step are pipelined in a single exchange, PID and
+        rate profiles are walked side by side so they share those exchanges.
+
+        Args:
+            pid_fields (Sequence[Type[MSPFields]], optional): Fields to read per PID profile.
+            rate_fields (Sequence[Type[MSPFields]], optional): Fields to read per rate profile.
+            lazy (bool, optional): Keep the results undecoded until accessed. Defaults to False.
+
+        Returns:
+            ProfileMatrix: The results of every profile.
+        """
+        await self.board.ready.wait()
+        await self._scheduler.acquire((None, None), (self._pid, self._rate), exclusive=True)
+        try:
+            return await self._read_all(pid_fields, rate_fields, lazy)
+        finally:
+            self._scheduler.release((self._pid, self._rate))
+
+    async def _read_all(
+        self,
+        pid_fields: Sequence[Type[MSPFields]],
+        rate_fields: Sequence[Type[MSPFields]],
+        lazy: bool,
+    ) -> ProfileMatrix:
+        if self._state != self.SyncedState.CLEAN:
+            await self._set_profiles_from_board()
+        original = (selected_pid, selected_rate) = (self._pid, self._rate)
+        matrix = ProfileMatrix()
+
+        steps = zip_longest(
+            profile_order(selected_pid, PID_PROFILE_COUNT),
+            profile_order(selected_rate, RATE_PROFILE_COUNT),
+        )
+        try:
+            for pid, rate in steps:
+                # a refused switch raises, the reads would otherwise come from the wrong profile
+                if pid is not None and pid != selected_pid:
+                    await self._send_pid_to_board(pid)
+                    selected_pid = pid
+                if rate is not None and rate != selected_rate:
+                    await self._send_rate_to_board(rate)
+                    selected_rate = rate
+                requested = (list(pid_fields) if pid is not None else []) + (
+                    list(rate_fields) if rate is not None else []
+                )
+                results = await self.board.get_many(*requested, lazy=lazy)
+                if pid is not None:
+                    matrix.pid[pid] = dict(zip(pid_fields, results[: len(pid_fields)]))
+                if rate is not None:
+                    matrix.rate[rate] = dict(zip(rate_fields, results[len(requested) - len(rate_fields) :]))
+        finally:
+            logger.debug("Restoring profiles to: %s", original)
+            if selected_pid != original[0]:
+                await self._send_pid_to_board(original[0])
+            if selected_rate != original[1]:
+                await self._send_rate_to_board(original[1])
+        return matrix
@@ -0,0 +1,187 @@
+"""Scheduling of profile scoped work so tasks on different profiles don't interleave."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["ProfileScheduler"]
+
+# (pid, rate), None for either means any profile will do
+Target = Tuple[Optional[int], Optional[int]]
+Selection = Tuple[int, int]
+
+# Times a waiting group can be passed over for cheaper groups before it goes next regardless of cost
+MAX_BYPASSES = 3
+
+
+def compatible(selection: Optional[Selection], target: Target) -> bool:
+    """Can work for the target run while the board has the selection active."""
+    if selection is None:
+        return False
+    return all(wanted is None or wanted == selected for wanted, selected in zip(target, selection))
+
+
+def switch_cost(selection: Selection, target: Target) -> int:
+    """Number of SelectSetting messages needed to get from the selection to the target."""
+    return sum(wanted is not None and wanted != selected for wanted, selected in zip(target, selection))
+
+
+def merge(target: Target, other: Target) -> Optional[Target]:
+    """Target satisfying both, None if they ask for different profiles."""
+    merged = []
+    for wanted, also_wanted in zip(target, other):
+        if wanted is not None and also_wanted is not None and wanted != also_wanted:
+            return None
+        merged.append(also_wanted if wanted is None else wanted)
+    return (merged[0], merged[1])
+
+
+def resolve(selection: Selection, target: Target) -> Selection:
+    """Selection the board ends up with when switched to the target."""
+    return (
+        selection[0] if target[0] is None else target[0],
+        selection[1] if target[1] is None else target[1],
+    )
+
+
+@dataclass(eq=False)
+class _Waiter:
+    target: Target
+    exclusive: bool
+    granted: asyncio.Future
+    task: Optional[asyncio.Task] = field(default=None)
+    bypassed: int = field(default=0)
+
+
+class ProfileScheduler:
+    """Grants profile scoped work access to the board one profile selection at a time.
+
+    Work asks for a (pid, rate) target and waits until the board can be switched to it. Every
+    waiting request compatible with the granted selection runs together, so the board is only
+    switched once per group, work that doesn't care about a profile is grouped with work that
+    does. When a group finishes the next group is the one needing the fewest
+    profile switches, oldest first on a tie. New work only joins a running group when nothing
+    else is waiting, so a busy profile can't starve the others.
+
+    A task already holding a grant doesn't wait on itself, its nested work runs under the grant it
+    holds and switches the board in place.
+    """
+
+    def __init__(self) -> None:
+        self.selection: Optional[Selection] = None
+        self.holders = 0
+        self.exclusive = False
+        self.waiting: List[_Waiter] = []
+        self._revert_to: Optional[Selection] = None
+        # grants held by each task, to let their nested work through
+        self._grants: Dict[asyncio.Task, int] = dict()
+
+    @property
+    def idle(self) -> bool:
+        return not self.holders and not self.waiting
+
+    async def acquire(self, target: Target, current: Selection, exclusive: bool = False) -> Selection:
+        """Wait until work for the target may run.
+
+        Args:
+            target (Target): (pid, rate) the work needs selected, None for either when any will do.
+            current (Selection): Profiles currently selected on the board.
+            exclusive (bool, optional): Run alone, for work that switches profiles itself. Defaults to False.
+
+        Returns:
+            Selection: The (pid, rate) selection the work runs under.
+        """
+        task = asyncio.current_task()
+        if task in self._grants:
+            # nested work, waiting would be waiting on the task's own grant
+            return self._grant(resolve(current, target), self.exclusive, task)
+        if self.idle:
+            return self._grant(resolve(current, target), exclusive, task)
+        if not exclusive and not self.exclusive and not self.waiting and compatible(self.selection, target):
+            return self._grant(self.selection, False, task)  # type:ignore
+
+        waiter = _Waiter(target, exclusive, asyncio.get_running_loop().create_future(), task)
+        self.waiting.append(waiter)
+        try:
+            return await waiter.granted
+        except asyncio.CancelledError:
+            if waiter in self.waiting:
+                self.waiting.remove(waiter)
+            elif waiter.granted.done() and not waiter.granted.cancelled():
+                self.release(resolve(current, target))
+            raise
+
+    def release(self, current: Selection) -> None:
+        """Finish a piece of work, granting the next group once the running one is done.
+
+        Args:
+            current (Selection): Profiles selected on the board now.
+        """
+        self.holders -= 1
+        task = asyncio.current_task()
+        if task in self._grants:
+            self._grants[task] -= 1
+            if not self._grants[task]:
+                del self._grants[task]
+        if self.holders:
+            return
+        self.selection = None
+        self.exclusive = False
+        # waiters cancelled before they could remove themselves
+        self.waiting = [waiter for waiter in self.waiting if not waiter.granted.done()]
+        if self.waiting:
+            self._grant_next(current)
+        else:
+            # a revert asked for by work that didn't finish cleanly is dropped once idle
+            self._revert_to = None
+
+    def request_revert(self, selection: Selection) -> None:
+        """Ask for the selection to be restored once no more work is pending, the first request wins."""
+        if self._revert_to is None:
+            self._revert_to = selection
+
+    def take_revert(self) -> Optional[Selection]:
+        """The selection to restore, if the caller is the last work running and nothing is waiting."""
+        if self.holders > 1 or self.waiting or self._revert_to is None:
+            return None
+        revert_to, self._revert_to = self._revert_to, None
+        # nothing joins the group while the board is switched back
+        self.selection = None
+        return revert_to
+
+    def _grant(self, selection: Selection, exclusive: bool, task: Optional[asyncio.Task]) -> Selection:
+        self.selection = selection
+        self.exclusive = exclusive
+        self.holders += 1
+        if task is not None:
+            self._grants[task] = self._grants.get(task, 0) + 1
+        return selection
+
+    def _grant_next(self, current: Selection) -> None:
+        overdue = [waiter for waiter in self.waiting if waiter.bypassed >= MAX_BYPASSES]
+        # min keeps the first, so the oldest waiter wins ties
+        first = overdue[0] if overdue else min(self.waiting, key=lambda waiter: switch_cost(current, waiter.target))
+        target = first.target
+        if not first.exclusive:
+            # fill in the profiles the first doesn't care about from the work that does, in queue order
+            for waiter in self.waiting:
+                merged = None if waiter.exclusive else merge(target, waiter.target)
+                target = target if merged is None else merged
+        selection = resolve(current, target)
+        logger.debug("Granting profiles %s to %s", selection, first.target)
+
+        group = [first] if first.exclusive else [
+            waiter for waiter in self.waiting if not waiter.exclusive and compatible(selection, waiter.target)
+        ]
+        for waiter in self.waiting:
+            if waiter not in group:
+                waiter.bypassed += 1
+        self.waiting = [waiter for waiter in self.waiting if waiter not in group]
+        for waiter in group:
+            self._grant(selection, first.exclusive, waiter.task)
+            waiter.granted.set_result(selection)
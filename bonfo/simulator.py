@@ -0,0 +1,158 @@
+"""Local stand-in for a flight controller, answering MSP v1 requests over TCP.
+
+Boards connect to it with a pyserial `socket://` URL, so everything from framing to
+parsing runs exactly as it does against a real board.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+from typing import Dict, Optional, Set
+
+from .msp.checksum import xor_checksum
+from .msp.codes import MSP
+from .msp.fields.registry import get_fields
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["SimulatedBoard", "SIMULATED_PAYLOADS"]
+
+REQUEST_HEADER = b"$M<"
+# largest dataflash read that fits an MSP v1 reply after its address, size and compression header
+FLASH_READ_LIMIT = 248
+# serial 8N1 sends a start and stop bit with every byte
+BITS_PER_BYTE = 10
+
+SIMULATED_PAYLOADS: Dict[int, bytes] = {
+    MSP.API_VERSION: bytes([0, 1, 43]),
+    MSP.FC_VARIANT: b"BTFL",
+    MSP.FC_VERSION: bytes([4, 3, 0]),
+    MSP.NAME: b"simulator".ljust(16, b"\x00"),
+    MSP.UID: bytes(range(12)),
+    MSP.STATUS_EX: b"}\x00\x00\x00!\x00\x00\x00\x00\x00\x00\x05\x00\x03\x00\x00\x1a\x04\x01\x01\x00\x00",
+    MSP.ATTITUDE: b"\x00\x10\x00\x20\x00\x30",
+    MSP.RAW_IMU: bytes(18),
+    MSP.BOXIDS: bytes(8),
+    MSP.FEATURE_CONFIG: b"\x00\x44\x00\x00",
+    MSP.RC_TUNING: b"d\x00FFFA2\x00F\x05\x00dd\x00\x00d\xce\x07\xce\x07\xce\x07\x00",
+    MSP.PID: b"\x16D\x1f\x1aD\x1f\x1dL\x0457K(\x00\x00",
+}
+
+
+def reply_frame(code: int, payload: bytes = b"", error: bool = False) -> bytes:
+    header = bytes([len(payload), code])
+    return (b"$M!" if error else b"$M>") + header + payload + bytes([xor_checksum(header + payload)])
+
+
+class SimulatedBoard:
+    """Answers MSP requests from a table of payloads, on a local TCP port.
+
+    Gets reply with the stored payload for their code, sets store their payload as the reply
+    to the matching get, anything else gets an error reply like an unsupported message.
+
+    Args:
+        payloads (Dict[int, bytes], optional): replies by MSP code. Defaults to SIMULATED_PAYLOADS.
+        baudrate (int, optional): delay replies by the time the request and reply take on a serial
+            link this fast. Defaults to None, no delay.
+        latency (float): extra seconds the board takes to handle a request.
+        flash (bytes, optional): blackbox logs to serve DATAFLASH_SUMMARY and DATAFLASH_READ from.
+        flash_read_limit (int): most bytes returned per dataflash read, longer reads are cut short.
+    """
+
+    def __init__(
+        self,
+        payloads: Optional[Dict[int, bytes]] = None,
+        baudrate: Optional[int] = None,
+        latency: float = 0.0,
+        flash: Optional[bytes] = None,
+        flash_read_limit: int = FLASH_READ_LIMIT,
+    ) -> None:
+        self.payloads = dict(SIMULATED_PAYLOADS if payloads is None else payloads)
+        self.baudrate = baudrate
+        self.latency = latency
+        self.flash = flash
+        self.flash_read_limit = flash_read_limit
+        self.requests = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        """pyserial URL to pass to Board as its device."""
+        assert self.server is not None, "simulator not started"
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"socket://{host}:{port}"
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._client, "127.0.0.1", 0)
+        return self.url
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            # boards don't close their end, hang up on them so their handlers finish
+            for client in self._clients:
+                client.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self.server.wait_closed()
+
+    async def __aenter__(self) -> "SimulatedBoard":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def respond(self, code: int, payload: bytes) -> bytes:
+        """Reply frame for a request."""
+        self.requests += 1
+        if self.flash is not None and code in (MSP.DATAFLASH_SUMMARY, MSP.DATAFLASH_READ):
+            return self.respond_flash(code, payload)
+        if code in self.payloads:
+            return reply_frame(code, self.payloads[code])
+        fields = get_fields(code)
+        if fields is not None and fields.set_code == code:
+            if fields.get_code is not None:
+                self.payloads[fields.get_code] = payload
+            return reply_frame(code)
+        return reply_frame(code, error=True)
+
+    def respond_flash(self, code: int, payload: bytes) -> bytes:
+        assert self.flash is not None
+        if code == MSP.DATAFLASH_SUMMARY:
+            # ready and supported, a single sector twice the size of the logs
+            return reply_frame(code, struct.pack("<BIII", 3, 1, 2 * len(self.flash), len(self.flash)))
+        address, size = struct.unpack_from("<IH", payload)
+        data = self.flash[address : address + min(size, self.flash_read_limit)]
+        return reply_frame(code, struct.pack("<IHB", address, len(data), 0) + data)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)  # type:ignore
+        self._clients.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(5)
+                if header[:3] != REQUEST_HEADER:
+                    logger.warning("Simulator dropping unexpected bytes: %s", header)
+                    continue
+                size, code = header[3], header[4]
+                payload = await reader.readexactly(size)
+                await reader.readexactly(1)
+                reply = self.respond(code, payload)
+                delay = self.latency
+                if self.baudrate:
+                    delay += (len(header) + size + 1 + len(reply)) * BITS_PER_BYTE / self.baudrate
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._handlers.discard(task)  # type:ignore
+            self._clients.discard(writer)
+            writer.close()
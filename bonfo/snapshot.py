@@ -0,0 +1,386 @@
+"""Configuration snapshots of every readable message and profile on a board."""
+from __future__ import annotations
+
+import json
+import logging
+import struct
+import time
+from dataclasses import dataclass, field, fields as dataclass_fields
+from datetime import datetime, timedelta, timezone
+from os import PathLike
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
+
+from semver import VersionInfo
+
+from .msp.codes import MSP
+from .msp.fields.base import MSPFields
+from .msp.fields.registry import build_fields_mapping, get_fields
+from .msp.fields.statuses import CombinedBoardInfo
+from .msp.utils import FRAME_OVERHEAD, msp_name, parse_payload
+from .profile import PID_PROFILE_COUNT, PID_PROFILE_FIELDS, RATE_PROFILE_COUNT, RATE_PROFILE_FIELDS
+
+if TYPE_CHECKING:
+    from .board import Board
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["Snapshot", "SnapshotProgress", "SnapshotRecord", "RecordDiff", "diff_snapshots", "take_snapshot"]
+
+SNAPSHOT_VERSION = 1
+
+# Binary snapshots: magic, format version, msp version tag, created in microseconds since the epoch,
+# board metadata json length and the record count, followed by the metadata and the records.
+BINARY_MAGIC = b"BFSN"
+BINARY_HEADER = struct.Struct("<4sBBBBqHI")
+# code, pid profile and rate profile (0 when not per profile) and the payload length, followed by the payload
+BINARY_RECORD = struct.Struct("<HBBH")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Live sensor readings and blackbox logs aren't configuration
+SKIPPED_CODES = frozenset([MSP.ATTITUDE, MSP.RAW_IMU, MSP.DATAFLASH_SUMMARY, MSP.DATAFLASH_READ])
+
+# Requests in flight at once, keeps the board's receive buffer from overflowing
+DEFAULT_WINDOW = 8
+
+
+def snapshot_fields() -> List[Type[MSPFields]]:
+    """Every readable fields class, less the per profile fields that are read from each profile."""
+    profile_fields = set(PID_PROFILE_FIELDS + RATE_PROFILE_FIELDS)
+    readable = []
+    for code, struct in build_fields_mapping().items():
+        if struct is None or code in SKIPPED_CODES:
+            continue
+        fields = struct.dc_type
+        if fields.get_code == code and fields not in profile_fields:
+            readable.append(fields)
+    return readable
+
+
+@dataclass
+class SnapshotRecord:
+    """Raw payload of one response, with the profile it was read from for per profile fields."""
+
+    code: int
+    payload: bytes
+    pid_profile: Optional[int] = None
+    rate_profile: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple[int, Optional[int], Optional[int]]:
+        return (self.code, self.pid_profile, self.rate_profile)
+
+    def decode(self, msp: Optional[VersionInfo] = None, lazy: bool = True) -> Any:
+        """Decode the payload with its fields, lazily by default so only accessed fields are parsed."""
+        return parse_payload(self.code, self.payload, lazy=lazy, msp=msp)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            code=self.code,
+            name=msp_name(self.code),
+            pid_profile=self.pid_profile,
+            rate_profile=self.rate_profile,
+            payload=self.payload.hex(),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SnapshotRecord":
+        return cls(
+            code=data["code"],
+            payload=bytes.fromhex(data["payload"]),
+            pid_profile=data.get("pid_profile"),
+            rate_profile=data.get("rate_profile"),
+        )
+
+
+@dataclass
+class SnapshotProgress:
+    """Running totals of a snapshot in progress."""
+
+    total: int
+    done: int = 0
+    bytes: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second over the link, requests and responses."""
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed else 0.0
+
+
+def board_metadata(info: CombinedBoardInfo) -> Dict[str, Any]:
+    """Identifying board info stored alongside the snapshot records."""
+    metadata: Dict[str, Any] = dict()
+    if info.name is not None:
+        metadata["name"] = info.name.name
+    if info.variant is not None:
+        metadata["variant"] = info.variant.variant
+    if info.version is not None:
+        metadata["version"] = f"{info.version.major}.{info.version.minor}.{info.version.patch}"
+    if info.api is not None:
+        metadata["api"] = str(info.api.semver)
+    if info.build is not None:
+        metadata["git_hash"] = info.build.git_hash
+    if info.board is not None:
+        metadata["target"] = info.board.target_name
+    if info.uid is not None:
+        metadata["uid"] = "".join(f"{part:08x}" for part in info.uid.uid)
+    return metadata
+
+
+@dataclass
+class Snapshot:
+    """Raw payloads of a board's configuration, decoded on demand.
+
+    Payloads are stored as read from the board so a snapshot can be written back exactly,
+    or decoded with newer fields definitions later.
+    """
+
+    records: List[SnapshotRecord] = field(default_factory=list)
+    board: Dict[str, Any] = field(default_factory=dict)
+    created: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = SNAPSHOT_VERSION
+
+    def find(self, code: int, pid: Optional[int] = None, rate: Optional[int] = None) -> Optional[SnapshotRecord]:
+        for record in self.records:
+            if record.code == code and record.pid_profile == pid and record.rate_profile == rate:
+                return record
+        return None
+
+    @property
+    def msp_version(self) -> Optional[VersionInfo]:
+        api = self.board.get("api")
+        return None if api is None else VersionInfo.parse(api)
+
+    def get(
+        self, fields: Type[MSPFields], pid: Optional[int] = None, rate: Optional[int] = None, lazy: bool = True
+    ) -> Any:
+        """Decode the stored payload of the fields, from the given profile for per profile fields."""
+        record = self.find(fields.get_code, pid, rate)  # type:ignore
+        if record is None:
+            return None
+        return record.decode(self.msp_version, lazy=lazy)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            version=self.version,
+            created=self.created.isoformat(),
+            board=self.board,
+            records=[record.to_dict() for record in self.records],
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Snapshot":
+        version = data.get("version")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        return cls(
+            records=[SnapshotRecord.from_dict(record) for record in data["records"]],
+            board=data.get("board", dict()),
+            created=datetime.fromisoformat(data["created"]),
+            version=version,
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize to the binary snapshot format, raw payloads tagged by code and the MSP version."""
+        board = json.dumps(self.board, separators=(",", ":")).encode("utf8")
+        msp = self.msp_version or VersionInfo(0)
+        created = (self.created - EPOCH) // timedelta(microseconds=1)
+        parts = [
+            BINARY_HEADER.pack(
+                BINARY_MAGIC, self.version, msp.major, msp.minor, msp.patch, created, len(board), len(self.records)
+            ),
+            board,
+        ]
+        pack_record = BINARY_RECORD.pack
+        for record in self.records:
+            parts.append(
+                pack_record(record.code, record.pid_profile or 0, record.rate_profile or 0, len(record.payload))
+            )
+            parts.append(record.payload)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Snapshot":
+        """Load a binary snapshot, payloads are only decoded when accessed.
+
+        Raises:
+            ValueError: not a binary snapshot, an unsupported version, or lengths that don't match the data.
+        """
+        view = memoryview(data)
+        size = len(view)
+        if size < BINARY_HEADER.size or bytes(view[: len(BINARY_MAGIC)]) != BINARY_MAGIC:
+            raise ValueError("Not a binary snapshot")
+        magic, version, *msp, created, board_length, count = BINARY_HEADER.unpack_from(view)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        offset = BINARY_HEADER.size
+        if offset + board_length > size:
+            raise ValueError(f"Truncated snapshot, {board_length} bytes of board metadata but {size - offset} left")
+        board = json.loads(bytes(view[offset : offset + board_length]))
+        offset += board_length
+        if any(msp):
+            board.setdefault("api", str(VersionInfo(*msp)))
+
+        records = []
+        unpack_record = BINARY_RECORD.unpack_from
+        record_size = BINARY_RECORD.size
+        for index in range(count):
+            if offset + record_size > size:
+                raise ValueError(f"Truncated snapshot, record {index + 1} of {count} is missing")
+            code, pid, rate, length = unpack_record(view, offset)
+            offset += record_size
+            if offset + length > size:
+                raise ValueError(
+                    f"Truncated snapshot, record {index + 1} of {count} has {length} bytes of payload"
+                    f" but {size - offset} left"
+                )
+            payload = bytes(view[offset : offset + length])
+            offset += length
+            records.append(SnapshotRecord(code, payload, pid_profile=pid or None, rate_profile=rate or None))
+        if offset != size:
+            raise ValueError(f"Corrupt snapshot, {size - offset} bytes after the last of {count} records")
+        return cls(
+            records=records, board=board, created=EPOCH + timedelta(microseconds=created), version=version
+        )
+
+    def save(self, path: Union[str, PathLike], binary: bool = False) -> None:
+        if binary:
+            with open(path, "wb") as file:
+                file.write(self.to_bytes())
+            return
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    @classmethod
+    def load(cls, path: Union[str, PathLike]) -> "Snapshot":
+        """Load a snapshot file in either format."""
+        with open(path, "rb") as file:
+            data = file.read()
+        if data.startswith(BINARY_MAGIC):
+            return cls.from_bytes(data)
+        return cls.from_dict(json.loads(data))
+
+
+@dataclass
+class RecordDiff:
+    """A record that differs between two snapshots, changed holds the (before, after) of each changed field."""
+
+    key: Tuple[int, Optional[int], Optional[int]]
+    before: Optional[SnapshotRecord]
+    after: Optional[SnapshotRecord]
+    changed: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+
+    @property
+    def fields(self) -> Optional[Type[MSPFields]]:
+        return get_fields(self.key[0])
+
+
+def _field_changes(before: Any, after: Any) -> Dict[str, Tuple[Any, Any]]:
+    if before is None or after is None:
+        return dict()
+    changed = dict()
+    for f in dataclass_fields(before):
+        old, new = getattr(before, f.name), getattr(after, f.name)
+        if old != new:
+            changed[f.name] = (old, new)
+    return changed
+
+
+def diff_snapshots(before: Snapshot, after: Snapshot) -> List[RecordDiff]:
+    """Records that differ between two snapshots.
+
+    Payloads are compared as raw bytes first, only records whose bytes differ are decoded
+    to find the fields that changed.
+    """
+    before_records = {record.key: record for record in before.records}
+    after_records = {record.key: record for record in after.records}
+    diffs = []
+    for key in list(before_records) + [key for key in after_records if key not in before_records]:
+        old, new = before_records.get(key), after_records.get(key)
+        if old is not None and new is not None and old.payload == new.payload:
+            continue
+        changed = dict()
+        if old is not None and new is not None:
+            changed = _field_changes(
+                old.decode(before.msp_version, lazy=False), new.decode(after.msp_version, lazy=False)
+            )
+        diffs.append(RecordDiff(key, old, new, changed))
+    return diffs
+
+
+def _record(
+    snapshot: Snapshot, progress: SnapshotProgress, fields: Type[MSPFields], result: Any, **profiles
+) -> None:
+    progress.done += 1
+    # the request frame is sent either way
+    progress.bytes += FRAME_OVERHEAD
+    if result is None:
+        logger.warning("No response for %s", fields.__name__)
+        return
+    payload = result.payload
+    progress.bytes += len(payload) + FRAME_OVERHEAD
+    snapshot.records.append(SnapshotRecord(fields.get_code, payload, **profiles))  # type:ignore
+
+
+async def take_snapshot(
+    board: "Board",
+    fields: Optional[Sequence[Type[MSPFields]]] = None,
+    pid_fields: Sequence[Type[MSPFields]] = PID_PROFILE_FIELDS,
+    rate_fields: Sequence[Type[MSPFields]] = RATE_PROFILE_FIELDS,
+    window: int = DEFAULT_WINDOW,
+    progress: Optional[Callable[[SnapshotProgress], Any]] = None,
+) -> Snapshot:
+    """Read every readable message and every profile from the board.
+
+    Requests are pipelined a window at a time and responses are kept undecoded,
+    so the snapshot takes about as long as its bytes take to cross the link.
+
+    Args:
+        board (Board): A ready board.
+        fields (Sequence[Type[MSPFields]], optional): Fields to read once, every readable fields if None.
+        pid_fields (Sequence[Type[MSPFields]], optional): Fields to read from every PID profile.
+        rate_fields (Sequence[Type[MSPFields]], optional): Fields to read from every rate profile.
+        window (int, optional): Requests in flight at once. Defaults to DEFAULT_WINDOW.
+        progress (Callable[[SnapshotProgress], Any], optional): Called after every window of responses.
+
+    Returns:
+        Snapshot: The raw payloads and board metadata.
+    """
+    await board.ready.wait()
+    if fields is None:
+        fields = snapshot_fields()
+    report = SnapshotProgress(
+        total=len(fields) + PID_PROFILE_COUNT * len(pid_fields) + RATE_PROFILE_COUNT * len(rate_fields)
+    )
+    snapshot = Snapshot(board=board_metadata(board.info))
+
+    for start in _windows(len(fields), window):
+        requested = fields[start : start + window]
+        results = await board.get_many(*requested, lazy=True)
+        for requested_fields, result in zip(requested, results):
+            _record(snapshot, report, requested_fields, result)
+        if progress is not None:
+            progress(report)
+
+    matrix = await board.profile.read_all(pid_fields, rate_fields, lazy=True)  # type:ignore
+    for pid, results in matrix.pid.items():
+        for requested_fields, result in results.items():
+            _record(snapshot, report, requested_fields, result, pid_profile=pid)
+    for rate, results in matrix.rate.items():
+        for requested_fields, result in results.items():
+            _record(snapshot, report, requested_fields, result, rate_profile=rate)
+    if progress is not None:
+        progress(report)
+
+    logger.info("Snapshot of %s records, %s bytes in %.2fs", len(snapshot.records), report.bytes, report.elapsed)
+    return snapshot
+
+
+def _windows(count: int, window: int) -> Iterable[int]:
+    return range(0, count, max(window, 1))
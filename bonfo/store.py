@@ -0,0 +1,207 @@
+"""Local content addressed store for snapshots and CLI state."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from os import PathLike
+from typing import Any, Dict, List, Optional, Union
+
+from .snapshot import Snapshot, SnapshotRecord
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["SnapshotStore", "StoredSnapshot"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    code INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT,
+    version TEXT,
+    git_hash TEXT,
+    created TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    format_version INTEGER NOT NULL,
+    board TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manifests (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL REFERENCES objects(hash),
+    pid_profile INTEGER,
+    rate_profile INTEGER,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_uid ON snapshots (uid, created_ts);
+CREATE INDEX IF NOT EXISTS snapshots_version ON snapshots (version, created_ts);
+CREATE INDEX IF NOT EXISTS snapshots_created ON snapshots (created_ts);
+CREATE INDEX IF NOT EXISTS manifests_hash ON manifests (hash);
+"""
+
+
+def object_hash(code: int, payload: bytes) -> str:
+    """Address of a payload, the same bytes for a different code are a different object."""
+    return hashlib.sha256(code.to_bytes(2, "little") + payload).hexdigest()
+
+
+@dataclass
+class StoredSnapshot:
+    """Index entry of a stored snapshot."""
+
+    id: int
+    uid: Optional[str]
+    version: Optional[str]
+    git_hash: Optional[str]
+    created: datetime
+
+
+class SnapshotStore:
+    """Snapshots stored as manifests of content addressed payloads in a sqlite database.
+
+    Every distinct payload is stored once, a snapshot of a board whose settings haven't
+    changed only adds a manifest row per record. Snapshots are indexed by board UID,
+    firmware version and time. Also holds small pickled values, like the CLI's selected port.
+
+    Args:
+        path (PathLike): sqlite database file, created if missing.
+    """
+
+    def __init__(self, path: Union[str, PathLike]) -> None:
+        self.path = str(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "SnapshotStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def put(self, snapshot: Snapshot) -> int:
+        """Store a snapshot, returns its id."""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO objects (hash, code, payload) VALUES (?, ?, ?)",
+                [(object_hash(r.code, r.payload), r.code, r.payload) for r in snapshot.records],
+            )
+            cursor = self.db.execute(
+                "INSERT INTO snapshots (uid, version, git_hash, created, created_ts, format_version, board)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    snapshot.board.get("uid"),
+                    snapshot.board.get("version"),
+                    snapshot.board.get("git_hash"),
+                    snapshot.created.isoformat(),
+                    snapshot.created.timestamp(),
+                    snapshot.version,
+                    json.dumps(snapshot.board),
+                ),
+            )
+            snapshot_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT INTO manifests (snapshot_id, position, hash, pid_profile, rate_profile) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (snapshot_id, position, object_hash(r.code, r.payload), r.pid_profile, r.rate_profile)
+                    for position, r in enumerate(snapshot.records)
+                ],
+            )
+        return snapshot_id  # type:ignore
+
+    def get(self, snapshot_id: int) -> Snapshot:
+        row = self.db.execute(
+            "SELECT created, format_version, board FROM snapshots WHERE id = ?", (snapshot_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(snapshot_id)
+        created, format_version, board = row
+        records = [
+            SnapshotRecord(code, payload, pid_profile=pid_profile, rate_profile=rate_profile)
+            for code, payload, pid_profile, rate_profile in self.db.execute(
+                "SELECT objects.code, objects.payload, manifests.pid_profile, manifests.rate_profile"
+                " FROM manifests JOIN objects ON objects.hash = manifests.hash"
+                " WHERE manifests.snapshot_id = ? ORDER BY manifests.position",
+                (snapshot_id,),
+            )
+        ]
+        return Snapshot(
+            records=records,
+            board=json.loads(board),
+            created=datetime.fromisoformat(created),
+            version=format_version,
+        )
+
+    def find(
+        self,
+        uid: Optional[str] = None,
+        version: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> List[StoredSnapshot]:
+        """Stored snapshots matching every given filter, newest first."""
+        conditions, params = [], []  # type: List[str], List[Any]
+        if uid is not None:
+            conditions.append("uid = ?")
+            params.append(uid)
+        if version is not None:
+            conditions.append("version = ?")
+            params.append(version)
+        if since is not None:
+            conditions.append("created_ts >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            conditions.append("created_ts < ?")
+            params.append(until.timestamp())
+        query = "SELECT id, uid, version, git_hash, created FROM snapshots"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_ts DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [
+            StoredSnapshot(id, uid, version, git_hash, datetime.fromisoformat(created))
+            for id, uid, version, git_hash, created in self.db.execute(query, params)
+        ]
+
+    def latest(self, uid: str) -> Optional[Snapshot]:
+        found = self.find(uid=uid, limit=1)
+        return self.get(found[0].id) if found else None
+
+    def delete(self, snapshot_id: int) -> None:
+        """Remove a snapshot and any payloads no other snapshot refers to."""
+        with self.db:
+            self.db.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+            self.db.execute("DELETE FROM objects WHERE hash NOT IN (SELECT hash FROM manifests)")
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of snapshots, distinct payloads and their stored size."""
+        snapshots = self.db.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        objects, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM objects").fetchone()
+        return dict(snapshots=snapshots, objects=objects, bytes=size)
+
+    def get_state(self, key: str, default: Any = None) -> Any:
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set_state(self, key: str, value: Any) -> None:
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, pickle.dumps(value)))
@@ -0,0 +1,330 @@
+"""Fixed memory telemetry history for long sessions, raw samples plus downsampled tiers for plotting."""
+from __future__ import annotations
+
+import dataclasses
+import enum
+import math
+import time
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple, Type
+
+from .msp.fields.base import CompactFields, LazyFields, MSPFields
+from .msp.fields.sensors import Attitude
+from .msp.fields.statuses import RawIMU, StatusEx
+
+if TYPE_CHECKING:
+    from .board import Board
+
+
+__all__ = ["Series", "TelemetryStore", "flatten", "TELEMETRY_FIELDS"]
+
+TELEMETRY_FIELDS: Tuple[Type[MSPFields], ...] = (Attitude, RawIMU, StatusEx)
+# raw samples kept per message
+RAW_SIZE = 20_000
+# seconds per point of each downsampled tier
+RESOLUTIONS: Tuple[float, ...] = (0.1, 1.0, 10.0)
+# points kept per tier, 10 second points cover about 11 hours
+TIER_SIZE = 4096
+STATS = ("min", "max", "mean")
+NAN = float("nan")
+
+
+def fields_type(value: Any) -> Type[MSPFields]:
+    """The MSPFields class of a regular, lazy or compact result."""
+    if isinstance(value, CompactFields):
+        return value._fields_type
+    if isinstance(value, LazyFields):
+        return value.get_struct().dc_type  # type:ignore
+    return type(value)
+
+
+def _field_names(value: Any) -> Iterable[str]:
+    if isinstance(value, CompactFields):
+        return value._fields
+    if dataclasses.is_dataclass(value):
+        return (field.name for field in dataclasses.fields(value))
+    return ()
+
+
+def _flatten(value: Any, name: str, columns: Dict[str, float]) -> None:
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if isinstance(value, (bool, int, float)):
+        columns[name] = float(value)
+    elif value is None or isinstance(value, (str, bytes, bytearray)):
+        return
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            _flatten(item, f"{name}[{index}]", columns)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if not key.startswith("_"):
+                _flatten(item, f"{name}.{key}" if name else key, columns)
+    else:
+        for key in _field_names(value):
+            _flatten(getattr(value, key), f"{name}.{key}" if name else key, columns)
+
+
+def flatten(value: Any) -> Dict[str, float]:
+    """Numeric values of a fields result by column name.
+
+    Lists get a column per item, `RawIMU.accelerometer` becomes `accelerometer[0]` to `accelerometer[2]`,
+    nested structs are joined with a dot. Flags and enums become their integer value, text is left out.
+    """
+    columns: Dict[str, float] = dict()
+    _flatten(value, "", columns)
+    return columns
+
+
+def _column(size: int) -> array:
+    return array("d", [NAN]) * size
+
+
+class Ring:
+    """Preallocated columns of doubles holding the newest size rows, each row overwrites the oldest."""
+
+    def __init__(self, names: Iterable[Hashable], size: int) -> None:
+        self.size = size
+        self.time = _column(size)
+        self.columns = {name: _column(size) for name in names}
+        # rows ever appended
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in (self.time, *self.columns.values()))
+
+    def append(self, t: float, values: Mapping[Hashable, float]) -> None:
+        index = self.count % self.size
+        self.time[index] = t
+        for name, column in self.columns.items():
+            column[index] = values.get(name, NAN)
+        self.count += 1
+
+    def _position(self, row: int) -> int:
+        """Index in the columns of the row-th oldest row."""
+        return (self.count - len(self) + row) % self.size
+
+    def covers(self, start: Optional[float]) -> bool:
+        """Whether nothing at or after start has been overwritten yet."""
+        if self.count <= self.size:
+            return True
+        return start is not None and self.time[self._position(0)] <= start
+
+    def row(self, t: Optional[float], default: int) -> int:
+        """First row at or after t, a binary search as rows are appended in time order."""
+        if t is None:
+            return default
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.time[self._position(middle)] < t:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def read(self, column: array, start: int, stop: int) -> array:
+        """Rows start to stop of a column, oldest first, copied out of the ring."""
+        if start >= stop:
+            return array("d")
+        first, last = self._position(start), self._position(stop - 1) + 1
+        if first < last:
+            return column[first:last]
+        return column[first:] + column[:last]
+
+
+class Tier:
+    """Min, max and mean of every column over buckets of resolution seconds.
+
+    Buckets are written once a sample from a later bucket arrives, the one still filling isn't read.
+    """
+
+    def __init__(self, names: Iterable[str], resolution: float, size: int) -> None:
+        self.names = tuple(names)
+        self.resolution = resolution
+        self.ring = Ring(((stat, name) for name in self.names for stat in STATS), size)
+        self._bucket: Optional[int] = None
+        # min, max, sum and count of every column in the current bucket
+        self._pending: Dict[str, List[float]] = dict()
+
+    def add(self, t: float, values: Mapping[str, float]) -> None:
+        bucket = math.floor(t / self.resolution)
+        if bucket != self._bucket:
+            self.flush()
+            self._bucket = bucket
+        for name, value in values.items():
+            if value != value:
+                # NaN, nothing was received
+                continue
+            pending = self._pending.get(name)
+            if pending is None:
+                self._pending[name] = [value, value, value, 1]
+            else:
+                pending[0] = min(pending[0], value)
+                pending[1] = max(pending[1], value)
+                pending[2] += value
+                pending[3] += 1
+
+    def flush(self) -> None:
+        if self._bucket is None:
+            return
+        row: Dict[Hashable, float] = dict()
+        for name, (low, high, total, count) in self._pending.items():
+            row["min", name] = low
+            row["max", name] = high
+            row["mean", name] = total / count
+        self.ring.append(self._bucket * self.resolution, row)
+        self._pending = dict()
+
+
+@dataclass
+class Series:
+    """Columns of one message over a time range, oldest first.
+
+    Raw samples have the same values in minimum, maximum and mean, tier points hold the statistics of
+    their bucket and are timed at its start. Columns are `array('d')` buffers.
+    """
+
+    time: array
+    mean: Dict[str, array]
+    minimum: Dict[str, array]
+    maximum: Dict[str, array]
+    # seconds per point, None for raw samples
+    resolution: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def to_numpy(self, stat: str = "mean") -> Tuple[Any, Dict[str, Any]]:
+        """Times and columns of one statistic as NumPy arrays sharing memory with this series.
+
+        Needs numpy, which bonfo doesn't depend on.
+        """
+        import numpy
+
+        columns = dict(min=self.minimum, max=self.maximum, mean=self.mean)[stat]
+        return numpy.frombuffer(self.time), {name: numpy.frombuffer(column) for name, column in columns.items()}
+
+
+class History:
+    """Raw ring and downsampled tiers of one message's columns."""
+
+    def __init__(self, names: Iterable[str], size: int, resolutions: Iterable[float], tier_size: int) -> None:
+        self.names = tuple(names)
+        self.raw = Ring(self.names, size)
+        self.tiers = [Tier(self.names, resolution, tier_size) for resolution in sorted(resolutions)]
+
+    @property
+    def nbytes(self) -> int:
+        return self.raw.nbytes + sum(tier.ring.nbytes for tier in self.tiers)
+
+    def append(self, t: float, values: Mapping[str, float]) -> None:
+        self.raw.append(t, values)
+        for tier in self.tiers:
+            tier.add(t, values)
+
+    def read(self, start: Optional[float] = None, stop: Optional[float] = None, points: Optional[int] = None) -> Series:
+        """The finest resolution that still covers start and has at most points rows between start and stop.
+
+        Only the rows in range are read, with points set to the plot's width that is O(pixels).
+        Falls back to the coarsest tier when none fit.
+        """
+        sources: List[Tuple[Ring, Optional[Tier]]] = [(self.raw, None)]
+        sources += [(tier.ring, tier) for tier in self.tiers]
+        ring, tier = sources[-1]
+        first, last = ring.row(start, 0), ring.row(stop, len(ring))
+        for candidate, candidate_tier in sources:
+            if not candidate.covers(start):
+                continue
+            candidate_first, candidate_last = candidate.row(start, 0), candidate.row(stop, len(candidate))
+            if points is None or candidate_last - candidate_first <= points:
+                ring, tier, first, last = candidate, candidate_tier, candidate_first, candidate_last
+                break
+
+        times = ring.read(ring.time, first, last)
+        if tier is None:
+            columns = {name: ring.read(ring.columns[name], first, last) for name in self.names}
+            return Series(times, columns, columns, columns)
+        minimum, maximum, mean = (
+            {name: ring.read(ring.columns[stat, name], first, last) for name in self.names} for stat in STATS
+        )
+        return Series(times, mean, minimum, maximum, resolution=tier.resolution)
+
+
+class TelemetryStore:
+    """Constant memory history of telemetry messages over sessions of any length.
+
+    Every message keeps a fixed size ring of raw samples, one preallocated column of doubles per
+    flattened field, see flatten. Each sample also goes into tiers of min/max/mean points at coarser
+    resolutions, also fixed size rings, so long ranges are read from a handful of points per pixel
+    instead of every sample. Columns are laid out on the first sample of each message.
+
+    Args:
+        fields (Iterable[MSPFields], optional): messages to keep. Defaults to TELEMETRY_FIELDS, None keeps all.
+        size (int): raw samples kept per message.
+        resolutions (Iterable[float]): seconds per point of each tier.
+        tier_size (int): points kept per tier.
+        clock (Callable[[], float]): timestamps samples. Defaults to time.monotonic.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[Iterable[Type[MSPFields]]] = TELEMETRY_FIELDS,
+        size: int = RAW_SIZE,
+        resolutions: Iterable[float] = RESOLUTIONS,
+        tier_size: int = TIER_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.fields = None if fields is None else frozenset(fields)
+        self.size = size
+        self.resolutions = tuple(resolutions)
+        self.tier_size = tier_size
+        self.clock = clock
+        self.histories: Dict[Type[MSPFields], History] = dict()
+        self._unsubscribe: Optional[Callable[[], None]] = None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by every column, it stops growing once each message has been seen."""
+        return sum(history.nbytes for history in self.histories.values())
+
+    def append(self, value: Any, t: Optional[float] = None) -> None:
+        """Record a fields result, at t or the clock's current time."""
+        fields = fields_type(value)
+        if self.fields is not None and fields not in self.fields:
+            return
+        values = flatten(value)
+        history = self.histories.get(fields)
+        if history is None:
+            history = self.histories[fields] = History(values, self.size, self.resolutions, self.tier_size)
+        history.append(self.clock() if t is None else t, values)
+
+    __call__ = append
+
+    def read(
+        self,
+        fields: Type[MSPFields],
+        start: Optional[float] = None,
+        stop: Optional[float] = None,
+        points: Optional[int] = None,
+    ) -> Series:
+        """Columns of a message between start and stop, at the finest resolution with at most points rows."""
+        if fields not in self.histories:
+            raise KeyError(f"No telemetry recorded for {fields.__name__}")
+        return self.histories[fields].read(start, stop, points)
+
+    def attach(self, board: "Board") -> "TelemetryStore":
+        """Record every message the board receives, until detached."""
+        self.detach()
+        self._unsubscribe = board.subscribe(self.append)
+        return self
+
+    def detach(self) -> None:
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
@@ -0,0 +1,146 @@
+"""Batched set messages with a single EEPROM save and rollback on failure."""
+from __future__ import annotations
+
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .exceptions import TransactionError
+from .msp.fields.base import MSPFields
+from .msp.fields.config import EepromWrite
+from .msp.utils import build_payload
+
+if TYPE_CHECKING:
+    from .board import Board
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = ["Transaction"]
+
+# (pid, rate) profiles a staged set is sent under, None for either when it doesn't matter
+ProfileStep = Tuple[Optional[int], Optional[int]]
+
+
+def acked(fields: MSPFields, preamble: Any) -> bool:
+    """Did the board answer the set message without an error."""
+    return preamble is not None and preamble.frame_id == fields.set_code and preamble.message_type != "ERR"
+
+
+@dataclass
+class StagedSet:
+    fields: MSPFields
+    # value on the board before the set, restored on rollback
+    previous: Optional[MSPFields] = None
+
+
+@dataclass
+class Transaction:
+    """Set messages staged to be sent together and saved with one EepromWrite.
+
+    On commit each profile's sets are sent in one pipelined exchange after reading the values
+    they replace. If a set isn't acknowledged, or doesn't read back as sent when verifying,
+    every set already sent is rolled back to its previous value and nothing is saved.
+
+    Use through Board.transaction().
+    """
+
+    board: "Board"
+    # read every set back and compare before saving
+    verify: bool = False
+    staged: Dict[ProfileStep, List[StagedSet]] = field(default_factory=dict)
+
+    def set(
+        self, fields: MSPFields, pid: Optional[int] = None, rate: Optional[int] = None, previous: Any = None
+    ) -> None:
+        """Stage a set message.
+
+        Args:
+            fields (MSPFields): Fields instance with the values to set.
+            pid (int, optional): PID profile to set the fields in, for per profile fields.
+            rate (int, optional): Rate profile to set the fields in, for per profile fields.
+            previous (MSPFields, optional): Current value on the board if already known, saves reading it again.
+        """
+        assert fields.set_code is not None
+        self.staged.setdefault((pid, rate), []).append(StagedSet(fields, previous))
+
+    def __len__(self) -> int:
+        return sum(len(staged) for staged in self.staged.values())
+
+    async def commit(self) -> None:
+        """Send every staged set and save them, rolling back on failure."""
+        if not self.staged:
+            return
+        sent: List[Tuple[ProfileStep, List[StagedSet]]] = []
+        async with self.board.profile.restore_on_exit():  # type:ignore
+            try:
+                for step, staged in self.staged.items():
+                    async with self._selected(step):
+                        await self._read_previous(staged)
+                        sent.append((step, staged))
+                        await self._send(staged)
+                acks = await self.board.set_many(EepromWrite())
+                if not acked(EepromWrite(), acks[0]):
+                    raise TransactionError("EepromWrite wasn't acknowledged")
+            except TransactionError as e:
+                e.rolled_back = await self._rollback(sent)
+                raise
+            except Exception as e:
+                rolled_back = await self._rollback(sent)
+                raise TransactionError(f"Transaction failed: {e}", rolled_back=rolled_back) from e
+        self.staged.clear()
+
+    @asynccontextmanager
+    async def _selected(self, step: ProfileStep) -> AsyncIterator[None]:
+        if step == (None, None):
+            yield
+            return
+        async with self.board.profile(pid=step[0], rate=step[1]):  # type:ignore
+            yield
+
+    async def _read_previous(self, staged: List[StagedSet]) -> None:
+        unknown = [item for item in staged if item.previous is None and type(item.fields).get_code is not None]
+        if not unknown:
+            return
+        previous = await self.board.get_many(*[type(item.fields) for item in unknown])
+        for item, value in zip(unknown, previous):
+            item.previous = value
+
+    async def _send(self, staged: List[StagedSet]) -> None:
+        acks = await self.board.set_many(*[item.fields for item in staged])
+        failed = [item.fields for item, ack in zip(staged, acks) if not acked(item.fields, ack)]
+        if failed:
+            raise TransactionError(f"{len(failed)} set messages weren't acknowledged", failed)
+        if not self.verify:
+            return
+
+        readable = [item.fields for item in staged if type(item.fields).get_code is not None]
+        read_back = await self.board.get_many(*[type(fields) for fields in readable])
+        msp = self.board.msp_version
+        failed = [
+            fields
+            for fields, value in zip(readable, read_back)
+            if value is None
+            or build_payload(fields.set_code, value, msp=msp) != build_payload(fields.set_code, fields, msp=msp)
+        ]
+        if failed:
+            raise TransactionError(f"{len(failed)} set messages didn't read back as sent", failed)
+
+    async def _rollback(self, sent: List[Tuple[ProfileStep, List[StagedSet]]]) -> bool:
+        """Set the previous values of everything sent, returns True if all of them were restored."""
+        restored = True
+        for step, staged in reversed(sent):
+            previous = [item.previous for item in staged if item.previous is not None]
+            if len(previous) < len(staged):
+                logger.warning("Unable to roll back sets with no previous value")
+                restored = False
+            if not previous:
+                continue
+            async with self._selected(step):
+                acks = await self.board.set_many(*previous)
+            for fields, ack in zip(previous, acks):
+                if not acked(fields, ack):
+                    logger.error("Rollback of %s wasn't acknowledged", type(fields).__name__)
+                    restored = False
+        return restored
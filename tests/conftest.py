@@ -21,8 +21,9 @@ def init_board_mocks(module_mocker):
 @pytest.fixture(scope="function")
 def mock_open_serial_connection(module_mocker, mocker):
     read = mocker.AsyncMock()
-    reader = mocker.Mock(read=read)
-    write = mocker.AsyncMock()
+    readexactly = mocker.AsyncMock()
+    reader = mocker.Mock(read=read, readexactly=readexactly)
+    write = mocker.Mock()
     writer = mocker.Mock(write=write)
     open_serial = module_mocker.patch("bonfo.board.open_serial_connection")
     open_serial.side_effect = [(reader, writer)]
@@ -58,6 +59,7 @@ def mock_board(mocker: MockerFixture) -> MockFixture:
     board.send_receive = mocker.AsyncMock()
     board.get = mocker.AsyncMock()
     board.set = mocker.AsyncMock()
+    board.get_many = mocker.AsyncMock()
 
     board.__gt__ = board.get
     board.__lt__ = board.set
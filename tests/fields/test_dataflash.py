@@ -0,0 +1,21 @@
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.base import Direction
+from bonfo.msp.fields.dataflash import DataflashRead, DataflashReadRequest, DataflashSummary
+from bonfo.msp.fields.registry import get_fields
+
+
+def test_dataflash_summary():
+    assert DataflashSummary.get_direction() == Direction.OUT
+    summary = DataflashSummary.parse(b"\x03\x01\x00\x00\x00\x00\x00\x00\x01\x10\x27\x00\x00")
+    assert summary.ready and summary.supported
+    assert (summary.total_size, summary.used_size) == (16 * 1024 * 1024, 10000)
+
+
+def test_dataflash_read():
+    # replies are parsed as DataflashRead, requests are built with DataflashReadRequest
+    assert get_fields(MSP.DATAFLASH_READ) is DataflashRead
+    assert DataflashReadRequest.get_direction() == Direction.IN
+    request = DataflashReadRequest(address=65536, size=240, allow_compression=False)
+    assert request.build() == b"\x00\x00\x01\x00\xf0\x00\x00"
+    read = DataflashRead.parse(b"\x10\x00\x00\x00\x03\x00\x00abc")
+    assert (read.address, read.size, read.compression, read.data) == (16, 3, 0, b"abc")
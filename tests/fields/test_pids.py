@@ -34,6 +34,16 @@ def test_pid_coefficients_parse():
     )
 
 
+def test_pid_coefficients_compact():
+    data_bytes = minus_preamble(messages.pid)
+    compact = PidCoefficients.parse(data_bytes, compact=True)
+    assert compact == PidCoefficients.get_struct().parse(data_bytes)
+    assert compact.build() == data_bytes
+    # the coefficients are dicts, which don't hash
+    with pytest.raises(TypeError):
+        hash(compact)
+
+
 def test_pid_parse_and_build_non_destructive():
     """Pid advanced generated struct should be non-destructive to bytestring."""
     data_bytes = minus_preamble(messages.pid)
@@ -0,0 +1,61 @@
+import importlib
+
+from bonfo.msp import fields
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.base import MSPFields
+from bonfo.msp.fields.registry import FIELDS_MODULES, FrameDispatch, build_fields_mapping, get_fields
+
+
+def all_fields():
+    for module in set(FIELDS_MODULES.values()):
+        importlib.import_module(module)
+    return MSPFields.__subclasses__()
+
+
+def test_registry_matches_fields_modules():
+    """Every code defined by an MSPFields class is registered to the module that defines it."""
+    found = dict()
+    for cls in all_fields():
+        for code in (cls.get_code, cls.set_code):
+            if code is not None:
+                found[code] = cls.__module__
+    assert found == FIELDS_MODULES
+
+
+def test_fields_exports_match_modules():
+    for name, module in fields._EXPORTS.items():
+        assert name in importlib.import_module(f"bonfo.msp.fields.{module}").__all__
+
+
+def test_get_fields():
+    from bonfo.msp.fields.statuses import StatusEx
+
+    assert get_fields(MSP.STATUS_EX) is StatusEx
+    assert get_fields(MSP.DEBUG) is None
+
+
+def test_fields_mapping():
+    mapping = build_fields_mapping()
+    assert MSP.STATUS_EX in mapping
+    assert MSP.DEBUG not in mapping
+    assert mapping.get(MSP.DEBUG) is None
+    assert mapping[MSP.PID] is get_fields(MSP.PID).get_struct()
+    assert len(mapping) == len(FIELDS_MODULES)
+
+
+def test_frame_dispatch():
+    dispatch = FrameDispatch(FIELDS_MODULES)
+    assert len(dispatch.table) == 256
+    assert dispatch.table[MSP.PID] is FrameDispatch._unresolved
+    assert dispatch[int(MSP.PID)] is get_fields(MSP.PID).get_struct()
+    # resolved entries are stored in the table
+    assert dispatch.table[MSP.PID] is get_fields(MSP.PID).get_struct()
+    assert dispatch[MSP.DEBUG] is None
+    assert dispatch.get(MSP.DEBUG, "default") == "default"
+
+
+def test_frame_dispatch_extended_codes():
+    dispatch = FrameDispatch({0x3003: "bonfo.msp.fields.statuses"})
+    assert dispatch.extended == {0x3003: FrameDispatch._unresolved}
+    assert dispatch[0x3003] is None
+    assert dispatch[0x3004] is None
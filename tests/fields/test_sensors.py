@@ -1,6 +1,10 @@
+import pickle
+from dataclasses import FrozenInstanceError
+
+import pytest
 from construct_typed import DataclassStruct
 
-from bonfo.msp.fields.base import Direction
+from bonfo.msp.fields.base import CompactFields, Direction
 from bonfo.msp.fields.sensors import Attitude
 from tests import messages
 from tests.utils import minus_preamble
@@ -25,3 +29,30 @@ def test_status_response():
     # Building the manual definition is the same as the parsed target data
     built_bytes = struct.build(build_data)
     assert target_bytes == built_bytes
+
+
+def test_attitude_compact():
+    target_bytes = minus_preamble(messages.attitude_response)
+    compact = Attitude.parse(target_bytes, compact=True)
+    assert isinstance(compact, CompactFields)
+    assert not hasattr(compact, "__dict__")
+    assert compact.roll == 24578
+    assert compact.get_code == Attitude.get_code
+    assert compact == Attitude(roll=24578, pitch=43775, yaw=3584)
+    assert Attitude(roll=24578, pitch=43775, yaw=3584) == compact
+    assert compact == Attitude.get_struct().parse(target_bytes).to_compact()
+    assert compact != Attitude(roll=1, pitch=43775, yaw=3584)
+    assert compact.build() == target_bytes
+    assert repr(compact) == "CompactAttitude(roll=24578, pitch=43775, yaw=3584)"
+    with pytest.raises(FrozenInstanceError):
+        compact.roll = 1
+
+
+def test_attitude_compact_pickle():
+    compact = Attitude(roll=1, pitch=2, yaw=3).to_compact()
+    assert pickle.loads(pickle.dumps(compact)) == compact
+
+
+def test_compact_lazy_exclusive():
+    with pytest.raises(ValueError):
+        Attitude.parse(b"\x00\x01\x00\x02\x00\x03", lazy=True, compact=True)
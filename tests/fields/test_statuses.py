@@ -1,4 +1,8 @@
+import dataclasses
+import sys
+
 import arrow
+import pytest
 from construct_typed import DataclassStruct
 
 from bonfo.msp.fields.base import Direction
@@ -9,6 +13,7 @@ from bonfo.msp.fields.statuses import (
     ConfigurationProblemsFlags,
     FcVariant,
     FcVersion,
+    RawIMU,
     SensorAlignment,
     Status,
     StatusEx,
@@ -106,3 +111,68 @@ def test_sensor_alignment():
     parsed = struct.parse(target_bytes)
     print(parsed)
     # target = SensorAlignment()
+
+
+def test_status_ex_lazy():
+    target_bytes = minus_preamble(messages.status_ex_response)
+    lazy = StatusEx.parse(target_bytes, lazy=True)
+    assert isinstance(lazy, StatusEx)
+    assert lazy.get_code == StatusEx.get_code
+    assert lazy.payload == target_bytes
+    # fixed size prefix fields are decoded one at a time
+    assert lazy.rate_profile == 1
+    assert "rate_profile" in vars(lazy)
+    assert "cycle_time" not in vars(lazy)
+    assert lazy == StatusEx.get_struct().parse(target_bytes)
+    assert StatusEx.get_struct().parse(target_bytes) == lazy
+
+
+def test_status_ex_field_offsets():
+    offsets = StatusEx.get_field_offsets()
+    assert list(offsets) == [
+        "cycle_time",
+        "i2c_error",
+        "active_sensors",
+        "mode",
+        "pid_profile",
+        "cpuload",
+        "profile_count",
+        "rate_profile",
+        "additional_mode_bytes",
+    ]
+    assert offsets["pid_profile"][0] == 10
+    assert offsets["rate_profile"][0] == 14
+
+
+def test_board_info_lazy():
+    target_bytes = minus_preamble(messages.board_info)
+    lazy = BoardInfo.parse(target_bytes, lazy=True)
+    # past the fixed size prefix, the full payload is decoded
+    assert lazy.board_name == "CLRACINGF4"
+    assert lazy.sample_rate == 16415
+    assert lazy.build() == target_bytes
+    # cutoff fields end the fixed size prefix
+    assert "configuration_state" not in SensorAlignment.get_field_offsets()
+
+
+def test_raw_imu_compact_memory():
+    standard = RawIMU(accelerometer=[1, 2, 3], gyroscope=[4, 5, 6], magnetometer=[7, 8, 9])
+    compact = RawIMU.parse(standard.build(), compact=True)
+    assert compact == standard
+    assert compact.gyroscope[1] == 5
+    assert sys.getsizeof(compact) < sys.getsizeof(standard) + sys.getsizeof(vars(standard))
+
+
+def test_raw_imu_compact_is_hashable_and_read_only():
+    standard = RawIMU(accelerometer=[1, 2, 3], gyroscope=[4, 5, 6], magnetometer=[7, 8, 9])
+    compact = standard.to_compact()
+    # lists are held as tuples
+    assert compact.accelerometer == (1, 2, 3)
+    assert hash(compact) == hash(RawIMU.parse(standard.build(), compact=True))
+    assert len({compact, standard.to_compact()}) == 1
+    with pytest.raises(TypeError):
+        compact.gyroscope[0] = 0  # type:ignore
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        compact.gyroscope = [0, 0, 0]
+    assert compact.to_fields() == standard
+    assert compact.build() == standard.build()
@@ -1,8 +1,10 @@
+from datetime import datetime, timezone
+
 import arrow
 import pytest
 from construct import ValidationError
 
-from bonfo.msp.adapters import BTFLTimestamp, GitHash, SelectPIDProfile, SelectRateProfile
+from bonfo.msp.adapters import BTFLTimestamp, GitHash, SelectPIDProfile, SelectRateProfile, parse_btfl_timestamp
 
 
 def test_select_pid_profile_selector_byte():
@@ -41,3 +43,19 @@ def test_githash_adapter():
 
 def test_select_rate_profile_selector_byte_parse():
     assert SelectRateProfile.parse(b"\x85") == 6
+
+
+def test_betaflight_timestamp_adapter_stdlib():
+    parsed = BTFLTimestamp.parse(b"Nov  9 202120:27:49")
+    assert parsed == datetime(2021, 11, 9, 20, 27, 49, tzinfo=timezone.utc)
+    assert BTFLTimestamp.build(parsed) == b"Nov 9 202120:27:49\x00"
+    assert BTFLTimestamp.build("Nov  9 202120:27:49") == b"Nov 9 202120:27:49\x00"
+    with pytest.raises(ValueError):
+        BTFLTimestamp.parse(b"Foo  9 202120:27:49")
+
+
+def test_betaflight_timestamp_memoized():
+    parse_btfl_timestamp.cache_clear()
+    parse_btfl_timestamp("Jan  9 202212:13:14")
+    parse_btfl_timestamp("Jan  9 202212:13:14")
+    assert parse_btfl_timestamp.cache_info().hits == 1
@@ -0,0 +1,72 @@
+import json
+
+from pytest_mock import MockerFixture
+
+from bonfo.bench import BenchResult, bench_report, percentile, run_bench
+from bonfo.board import Board
+from bonfo.msp.fields.config import FeatureConfig
+from bonfo.msp.fields.statuses import ApiVersion
+from bonfo.simulator import SimulatedBoard
+
+
+def test_percentile():
+    samples = [5, 1, 4, 2, 3]
+    assert percentile(samples, 50) == 3
+    assert percentile(samples, 95) == 5
+    assert percentile(samples, 0) == 1
+    assert percentile([], 50) == 0.0
+
+
+async def test_run_bench():
+    async with SimulatedBoard(latency=0.001) as simulator:
+        url = simulator.url
+        async with Board(simulator.url, initial_data=False).connect() as board:
+            results = await run_bench(board, [ApiVersion, FeatureConfig], requests=10, concurrency=3, batch=4)
+            report = bench_report(board, results, requests=10)
+
+    assert [(result.message, result.mode) for result in results] == [
+        ("ApiVersion", "single"),
+        ("ApiVersion", "concurrent"),
+        ("ApiVersion", "batch"),
+        ("FeatureConfig", "single"),
+        ("FeatureConfig", "concurrent"),
+        ("FeatureConfig", "batch"),
+    ]
+    for result in results:
+        assert isinstance(result, BenchResult)
+        assert result.requests == 10
+        assert result.failures == 0
+        assert 1 <= result.p50 <= result.p95 <= result.p99
+        assert result.requests_per_second > 0
+    single, concurrent, batch = results[:3]
+    # queued behind the other tasks
+    assert concurrent.p50 > single.p50
+    # warm up, then 10 requests per mode and message
+    assert simulator.requests == 1 + 2 * (5 + 30)
+
+    assert report["device"] == url
+    assert report["settings"] == dict(requests=10)
+    assert json.loads(json.dumps(report))["results"][0]["message"] == "ApiVersion"
+
+
+async def test_run_bench_counts_corrupt_frames(mocker: MockerFixture):
+    async with SimulatedBoard() as simulator:
+        respond = simulator.respond
+
+        def corrupting(code, payload):
+            frame = respond(code, payload)
+            # every fourth reply has a bad checksum, the rest of the link is fine
+            if simulator.requests % 4 == 0:
+                frame = frame[:-1] + bytes([frame[-1] ^ 0xFF])
+            return frame
+
+        mocker.patch.object(simulator, "respond", side_effect=corrupting)
+        async with Board(simulator.url, initial_data=False).connect() as board:
+            results = await run_bench(board, [ApiVersion], requests=12, concurrency=3, batch=4, warmup=0)
+
+    assert [result.mode for result in results] == ["single", "concurrent", "batch"]
+    single, concurrent, batch = results
+    assert single.failures == 3
+    assert concurrent.failures > 0
+    # a corrupt reply fails its whole batch
+    assert batch.failures == 12
@@ -1,10 +1,17 @@
 import asyncio
 import logging
 
+import pytest
+from construct import ChecksumError
 from pytest_mock import MockerFixture
 from serial_asyncio import serial
 
 from bonfo.board import Board
+from bonfo.board_cache import BoardCache
+from bonfo.exceptions import MessageError
+from bonfo.msp.cache import PayloadCache
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.config import EepromWrite
 from bonfo.msp.fields.statuses import (
     ApiVersion,
     BoardInfo,
@@ -13,8 +20,10 @@ from bonfo.msp.fields.statuses import (
     FcVariant,
     FcVersion,
     Name,
+    StatusEx,
     Uid,
 )
+from tests import messages
 
 logger = logging.getLogger(__name__)
 
@@ -74,7 +83,7 @@ async def test_board_get_board_info(mock_open_serial_connection, mock_profile, m
     board = Board("/dev/tty", initial_data=False, profile=mock_profile)
     # does not run on init
     mock_board_get.assert_not_awaited()
-    board.connected.set()
+    await board.ready.wait()
     # TODO: test for returned mocked info
     await board.get_board_info()
     mock_board_get.assert_has_awaits(
@@ -89,3 +98,228 @@ async def test_board_get_board_info(mock_open_serial_connection, mock_profile, m
         ]
     )
     cbi.assert_called_with("name", "api", "version", "build_info", "board_info", "variant", "uid")
+
+
+async def test_board_receive_msg(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [messages.status_ex_response[:5], messages.status_ex_response[5:]]
+    pre, data = await board.receive_msg()
+    assert pre.frame_id == MSP.STATUS_EX
+    assert isinstance(data, StatusEx)
+    assert data.rate_profile == 1
+
+
+async def test_board_receive_msg_split_frame(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader = asyncio.StreamReader()
+    frame = messages.status_ex_response
+    # the preamble and the payload both arrive in two reads
+    board.reader.feed_data(frame[:3])
+    loop = asyncio.get_running_loop()
+    loop.call_soon(board.reader.feed_data, frame[3:12])
+    loop.call_later(0.01, board.reader.feed_data, frame[12:])
+    pre, data = await board.receive_msg()
+    assert isinstance(data, StatusEx)
+    assert board.checksum_stats.failures == 0
+
+
+async def test_board_receive_msg_timeout(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile, read_timeout=0.01)
+    await board.ready.wait()
+    board.reader = asyncio.StreamReader()
+    board.reader.feed_data(messages.status_ex_response[:8])
+    with pytest.raises(asyncio.TimeoutError):
+        await board.receive_msg()
+    # a frame that never finished isn't counted as corrupt
+    assert board.checksum_stats.frames == 0
+
+
+async def test_board_receive_msg_lazy(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [messages.status_ex_response[:5], messages.status_ex_response[5:]]
+    pre, data = await board.receive_msg(lazy=True)
+    assert isinstance(data, StatusEx)
+    assert data.payload == messages.status_ex_response[5:-1]
+    assert data.pid_profile == 1
+
+
+async def test_board_subscribe(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [messages.status_ex_response[:5], messages.status_ex_response[5:]] * 3
+    received = []
+
+    def broken(data):
+        raise RuntimeError("sink failed")
+
+    unsubscribe = board.subscribe(received.append)
+    board.subscribe(broken)
+    _, first = await board.receive_msg()
+    _, second = await board.receive_msg(lazy=True)
+    # a failing sink doesn't stop the message or the other sinks
+    assert received == [first, second]
+    unsubscribe()
+    await board.receive_msg()
+    assert len(received) == 2
+
+
+async def test_board_receive_msg_no_payload(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [b"$M>\x00\xd2", b"\xd2"]
+    pre, data = await board.receive_msg()
+    assert pre.frame_id == MSP.SELECT_SETTING
+    assert data is None
+
+
+async def test_board_receive_msg_payload_cache(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile, payload_cache=PayloadCache())
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [messages.status_ex_response[:5], messages.status_ex_response[5:]] * 2
+    _, first = await board.receive_msg()
+    _, second = await board.receive_msg()
+    assert first == second
+    assert board.payload_cache.stats.hits == 1
+
+
+async def test_board_receive_msg_bad_checksum(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [
+        messages.status_ex_response[:5],
+        messages.status_ex_response[5:-1] + b"\x00",
+    ]
+    with pytest.raises(ChecksumError):
+        await board.receive_msg()
+    assert board.checksum_stats.failures == 1
+    assert board.checksum_stats.code_failures == {MSP.STATUS_EX: 1}
+
+
+async def test_board_receive_msg_drop_corrupt(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile, drop_corrupt=True)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [
+        # crc of an empty payload is checked too
+        b"$M>\x00\xd2",
+        b"\x00",
+        messages.status_ex_response[:5],
+        messages.status_ex_response[5:],
+    ]
+    pre, data = await board.receive_msg()
+    assert pre.frame_id == MSP.SELECT_SETTING
+    assert data is None
+    pre, data = await board.receive_msg()
+    assert isinstance(data, StatusEx)
+    assert board.checksum_stats.frames == 2
+    assert board.checksum_stats.dropped == 1
+    assert board.checksum_stats.code_failures == {MSP.SELECT_SETTING: 1}
+
+
+async def test_board_get_many(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [
+        messages.status_ex_response[:5],
+        messages.status_ex_response[5:],
+        messages.api_version[:5],
+        messages.api_version[5:],
+    ]
+    status, api = await board.get_many(StatusEx, ApiVersion)
+    # all requests are written before the first response is read
+    assert board.writer.write.call_args_list[0].args[0] == b"$M<\x00\x96\x96"
+    assert board.writer.write.call_args_list[1].args[0] == b"$M<\x00\x01\x01"
+    assert isinstance(status, StatusEx)
+    assert api == ApiVersion(msp_protocol=0, api_major=1, api_minor=21)
+
+
+async def test_board_get_many_mismatch_resyncs(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [
+        # a stale reply from an earlier exchange
+        messages.api_version[:5],
+        messages.api_version[5:],
+        messages.api_version[:5],
+        messages.api_version[5:],
+    ]
+    # the two requested replies are left on the link until the resync
+    board.reader.read.side_effect = [messages.status_ex_response, messages.api_version, asyncio.TimeoutError()]
+    with pytest.raises(MessageError, match="reply to STATUS_EX"):
+        await board.get_many(StatusEx, ApiVersion)
+    assert board.desynced
+    # the unread replies are dropped before the next exchange
+    assert await board.get_many(ApiVersion) == [ApiVersion(msp_protocol=0, api_major=1, api_minor=21)]
+    assert not board.desynced
+
+
+async def test_board_set_many(mock_open_serial_connection, mock_profile, mock_board_get):
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile)
+    await board.ready.wait()
+    board.reader.readexactly.side_effect = [
+        b"$M>\x00\x0b",
+        b"\x0b",
+        b"$M!\x00\xfa",
+        b"\xfa",
+    ]
+    name_ack, eeprom_ack = await board.set_many(Name(name="bob"), EepromWrite())
+    assert board.writer.write.call_count == 2
+    assert name_ack.frame_id == MSP.SET_NAME
+    assert eeprom_ack.frame_id == MSP.EEPROM_WRITE
+    assert eeprom_ack.message_type == "ERR"
+
+
+async def test_board_get_board_info_cache_miss(
+    mock_open_serial_connection, mock_profile, mock_board_get, mocker: MockerFixture, tmp_path
+):
+    cache = BoardCache(tmp_path / "boards")
+    uid = Uid(uid=[1, 2, 3])
+    build = BuildInfo(date_time="Jan 1 202200:00:00", git_hash="abcdefg")
+    status = "status"
+    get_many = mocker.patch(
+        "bonfo.board.Board.get_many",
+        side_effect=[[uid, build, Name("first"), status], ["api", "version", "board_info", "variant"]],
+    )
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile, cache=cache)
+    await board.ready.wait()
+    info = await board.get_board_info()
+    # the first exchange's reads are reused, the rest is read in a second one
+    assert get_many.await_args_list == [
+        mocker.call(Uid, BuildInfo, Name, StatusEx),
+        mocker.call(ApiVersion, FcVersion, BoardInfo, FcVariant),
+    ]
+    mock_profile._sync_from_status.assert_called_once_with(status)
+    mock_board_get.assert_not_awaited()
+    assert info == CombinedBoardInfo(Name("first"), "api", "version", build, "board_info", "variant", uid)
+    assert cache.load(uid, build).name is None
+
+
+async def test_board_get_board_info_cache_hit(
+    mock_open_serial_connection, mock_profile, mock_board_get, mocker: MockerFixture, tmp_path
+):
+    cache = BoardCache(tmp_path / "boards")
+    uid = Uid(uid=[1, 2, 3])
+    build = BuildInfo(date_time="Jan 1 202200:00:00", git_hash="abcdefg")
+    cache.store(CombinedBoardInfo(Name("old"), "api", "version", build, "board_info", "variant", uid))
+    mocker.patch("bonfo.board.Board.get_many", side_effect=[[uid, build, Name("renamed"), "status"]])
+    board = Board("/dev/tty", initial_data=False, profile=mock_profile, cache=cache)
+    await board.ready.wait()
+    info = await board.get_board_info()
+    mock_board_get.assert_not_awaited()
+    assert info.name == Name("renamed")
+    assert (info.api, info.board, info.uid) == ("api", "board_info", uid)
+
+    # reflashed firmware misses the cache
+    assert cache.load(uid, BuildInfo(date_time="Jan 2 202200:00:00", git_hash="abcdefg")) is None
+
+
+async def test_board_cache_skips_profile_check(
+    mock_open_serial_connection, mock_profile, mocker: MockerFixture, tmp_path
+):
+    get_board_info = mocker.patch("bonfo.board.Board.get_board_info")
+    board = Board("/dev/tty", profile=mock_profile, cache=BoardCache(tmp_path / "boards"))
+    await board.ready.wait()
+    get_board_info.assert_awaited_once()
+    mock_profile._check_connection.assert_not_awaited()
@@ -0,0 +1,90 @@
+from bonfo.msp import cache as cache_module
+from bonfo.msp.cache import PayloadCache
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.config import FeatureConfig, Features
+from bonfo.msp.fields.sensors import Attitude
+from bonfo.msp.fields.statuses import RawIMU
+from bonfo.msp.versions import MSPVersions
+
+feature_payload = FeatureConfig(features=Features.RX_SERIAL).build()
+
+
+def test_payload_cache_hits(mocker):
+    parse = mocker.spy(FeatureConfig.get_struct(), "parse")
+    cache = PayloadCache()
+    first = cache.parse(MSP.FEATURE_CONFIG, feature_payload)
+    second = cache.parse(MSP.FEATURE_CONFIG, feature_payload)
+    assert first == second == FeatureConfig(features=Features.RX_SERIAL)
+    parse.assert_called_once()
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 0.5
+    assert cache.stats.codes[MSP.FEATURE_CONFIG].hits == 1
+
+
+def test_payload_cache_returns_copies():
+    cache = PayloadCache()
+    first = cache.parse(MSP.FEATURE_CONFIG, feature_payload)
+    first.features = Features.GPS
+    assert cache.parse(MSP.FEATURE_CONFIG, feature_payload).features == Features.RX_SERIAL
+
+
+def test_payload_cache_copies_nested_fields():
+    cache = PayloadCache()
+    payload = bytes(range(18))
+    for lazy in (False, True):
+        first = cache.parse(MSP.RAW_IMU, payload, lazy=lazy)
+        first.accelerometer[0] = 999
+        assert cache.parse(MSP.RAW_IMU, payload, lazy=lazy) == RawIMU.parse(payload)
+
+
+def test_payload_cache_shares_nested_fields_only_when_compact(mocker):
+    parse = mocker.spy(cache_module, "parse_payload")
+    cache = PayloadCache()
+    payload = bytes(range(15))
+    # a deep copy costs as much as parsing, regular nested results aren't kept
+    assert cache.parse(MSP.PID, payload) == cache.parse(MSP.PID, payload)
+    assert len(cache) == 0
+    assert cache.stats.misses == cache.stats.hits == 0
+    first = cache.parse(MSP.PID, payload, compact=True)
+    assert cache.parse(MSP.PID, payload, compact=True) is first
+    assert cache.stats.hits == 1
+    assert parse.call_count == 3
+
+
+def test_payload_cache_compact_shared():
+    cache = PayloadCache()
+    payload = Attitude(roll=1, pitch=2, yaw=3).build()
+    first = cache.parse(MSP.ATTITUDE, payload, compact=True)
+    assert cache.parse(MSP.ATTITUDE, payload, compact=True) is first
+    # a different result kind is a different entry
+    assert cache.parse(MSP.ATTITUDE, payload) is not first
+    assert cache.stats.misses == 2
+
+
+def test_payload_cache_key_includes_msp_version():
+    cache = PayloadCache()
+    cache.parse(MSP.FEATURE_CONFIG, feature_payload, msp=MSPVersions.V1_43.value)
+    cache.parse(MSP.FEATURE_CONFIG, feature_payload, msp=MSPVersions.V1_44.value)
+    assert cache.stats.misses == 2
+    assert len(cache) == 2
+
+
+def test_payload_cache_bounded():
+    cache = PayloadCache(maxsize=2)
+    for roll in range(3):
+        cache.parse(MSP.ATTITUDE, Attitude(roll=roll, pitch=0, yaw=0).build())
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    # the oldest entry was evicted
+    cache.parse(MSP.ATTITUDE, Attitude(roll=0, pitch=0, yaw=0).build())
+    assert cache.stats.hits == 0
+
+
+def test_payload_cache_codes():
+    cache = PayloadCache(codes=[MSP.FEATURE_CONFIG])
+    payload = Attitude(roll=1, pitch=2, yaw=3).build()
+    cache.parse(MSP.ATTITUDE, payload)
+    cache.parse(MSP.ATTITUDE, payload)
+    assert len(cache) == 0
+    assert cache.stats.hits == cache.stats.misses == 0
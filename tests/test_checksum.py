@@ -0,0 +1,30 @@
+import os
+from functools import reduce
+from operator import xor
+
+import pytest
+
+from bonfo.msp.checksum import ChecksumStats, xor_checksum
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 7, 63, 64, 65, 255, 1024])
+def test_xor_checksum_matches_bytewise(length):
+    data = os.urandom(length)
+    assert xor_checksum(data) == reduce(xor, data, 0)
+
+
+def test_xor_checksum_memoryview():
+    data = bytes(range(200))
+    assert xor_checksum(memoryview(data)[3:]) == reduce(xor, data[3:], 0)
+
+
+def test_checksum_stats():
+    stats = ChecksumStats()
+    stats.record(150, True)
+    stats.record(150, False)
+    stats.record(108, False)
+    stats.record(108, False)
+    assert stats.frames == 4
+    assert stats.failures == 3
+    assert stats.failure_rate == 0.75
+    assert stats.code_failures == {150: 1, 108: 2}
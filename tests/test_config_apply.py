@@ -0,0 +1,134 @@
+import functools
+
+import pytest
+from construct import Container
+from pytest_mock import MockerFixture
+
+from bonfo.board import Board
+from bonfo.config.apply import apply_config, coerce_value, fields_type, plan_config
+from bonfo.config.root import BoardConf
+from bonfo.msp.fields.config import EepromWrite, FeatureConfig, Features, RcTuning, SelectPID, SelectRate
+from bonfo.msp.fields.pids import PidAdvanced
+from bonfo.msp.fields.statuses import Name
+from bonfo.profile import Profile
+
+CONF = """
+settings:
+  FeatureConfig:
+    features: [AIRMODE, OSD]
+  Name:
+    name: bob
+rate_profiles:
+  3:
+    RcTuning:
+      roll_rate: 0.7
+"""
+
+
+def test_fields_type():
+    assert fields_type("FeatureConfig") is FeatureConfig
+    with pytest.raises(ValueError):
+        fields_type("Nope")
+    with pytest.raises(ValueError):
+        # read only
+        fields_type("ApiVersion")
+
+
+def test_coerce_value():
+    assert coerce_value(Features.OSD, ["AIRMODE", "OSD"]) == Features.AIRMODE | Features.OSD
+    assert coerce_value(Features.OSD, "AIRMODE") == Features.AIRMODE
+    assert coerce_value(Features.OSD, 0) == Features(0)
+    assert coerce_value(1, 2) == 2
+
+
+@pytest.fixture
+def board(mock_board, mocker: MockerFixture):
+    """Mock board with a real profile manager that tracks profile switches."""
+    selected = dict(pid=1, rate=1)
+    board_values = {
+        FeatureConfig: FeatureConfig(features=Features.OSD),
+        Name: Name(name="bob"),
+        RcTuning: RcTuning.parse(bytes(23)),
+        PidAdvanced: PidAdvanced.parse(bytes(64)),
+    }
+
+    async def set_fields(fields):
+        if fields.set_code == SelectPID(1).set_code:
+            selected["pid"] = fields.profile.get("pid_profile", selected["pid"])
+            selected["rate"] = fields.profile.get("rate_profile", selected["rate"])
+        elif not isinstance(fields, EepromWrite):
+            board_values[type(fields)] = fields
+
+    async def set_many(*fields):
+        for requested in fields:
+            await set_fields(requested)
+        return [Container(frame_id=requested.set_code, message_type="IN") for requested in fields]
+
+    async def get_fields(fields, lazy=False):
+        return Container(pid_profile=selected["pid"], rate_profile=selected["rate"])
+
+    async def get_many(*fields, lazy=False):
+        return [board_values[requested] for requested in fields]
+
+    mock_board.set.side_effect = set_fields
+    mock_board.get.side_effect = get_fields
+    mock_board.get_many.side_effect = get_many
+    mock_board.set_many = mocker.AsyncMock(side_effect=set_many)
+    mock_board.transaction = functools.partial(Board.transaction, mock_board)
+    mock_board.msp_version = None
+    mock_board.profile = Profile(board=mock_board)
+    mock_board.board_values = board_values
+    mock_board.selected = selected
+    return mock_board
+
+
+async def test_plan_config(board):
+    plan = await plan_config(board, BoardConf.from_yaml(CONF))
+    assert plan.unchanged == 1
+    assert [(change.fields, change.changed, change.rate) for change in plan.changes] == [
+        (FeatureConfig, ["features"], None),
+        (RcTuning, ["roll_rate"], 3),
+    ]
+    assert list(plan.steps()) == [(None, None), (None, 3)]
+    # nothing written and back on the original profiles
+    assert board.board_values[FeatureConfig] == FeatureConfig(features=Features.OSD)
+    assert (board.selected["pid"], board.selected["rate"]) == (1, 1)
+
+
+async def test_apply_config_check(board):
+    result = await apply_config(board, BoardConf.from_yaml(CONF), check=True)
+    assert len(result.plan.changes) == 2
+    assert result.applied == []
+    board.set_many.assert_not_awaited()
+
+
+async def test_apply_config(board, mocker: MockerFixture):
+    result = await apply_config(board, BoardConf.from_yaml(CONF))
+    assert [change.fields for change in result.applied] == [FeatureConfig, RcTuning]
+    assert board.board_values[FeatureConfig] == FeatureConfig(features=Features.AIRMODE | Features.OSD)
+    assert board.board_values[RcTuning].roll_rate == 0.7
+    # only the changed messages, one switch there and one back, and a single save
+    assert board.set.await_args_list == [mocker.call(SelectRate(3)), mocker.call(SelectRate(1))]
+    assert board.set_many.await_args_list == [
+        mocker.call(FeatureConfig(features=Features.AIRMODE | Features.OSD)),
+        mocker.call(board.board_values[RcTuning]),
+        mocker.call(EepromWrite()),
+    ]
+    assert (board.selected["pid"], board.selected["rate"]) == (1, 1)
+
+
+async def test_apply_config_unchanged(board):
+    conf = BoardConf(settings=dict(Name=dict(name="bob")), pid_profiles={})
+    result = await apply_config(board, conf)
+    assert not result.plan
+    board.set.assert_not_awaited()
+    board.set_many.assert_not_awaited()
+
+
+async def test_apply_config_wrong_scope(board):
+    with pytest.raises(ValueError):
+        await plan_config(board, BoardConf(settings=dict(RcTuning=dict(roll_rate=1))))
+    with pytest.raises(ValueError):
+        await plan_config(board, BoardConf(pid_profiles={1: dict(RcTuning=dict(roll_rate=1))}))
+    with pytest.raises(ValueError):
+        await plan_config(board, BoardConf(pid_profiles={1: dict(PidAdvanced=dict(nope=1))}))
@@ -0,0 +1,111 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from pytest_mock import MockerFixture
+
+from bonfo.daemon import BoardDaemon, DaemonClient, daemon_client, fields_by_name
+from bonfo.exceptions import DaemonError
+from bonfo.msp.fields.config import FeatureConfig, Features, RcTuning
+from bonfo.msp.fields.statuses import ApiVersion, CombinedBoardInfo, FcVersion, Name
+
+
+@pytest.fixture
+def daemon_board(mock_board, mocker: MockerFixture):
+    mock_board.device = "/dev/tty-mock"
+    mock_board.info = CombinedBoardInfo(Name("bob"), ApiVersion(0, 1, 43), FcVersion(4, 3, 0), None, None, None, None)
+    profile = mocker.Mock(pid=1, rate=2)
+
+    @asynccontextmanager
+    async def select(pid=None, rate=None, revert_on_exit=False):
+        profile.selected = (pid, rate, revert_on_exit)
+        if pid is not None and not revert_on_exit:
+            profile.pid = pid
+        if rate is not None and not revert_on_exit:
+            profile.rate = rate
+        yield profile
+
+    profile.side_effect = select
+    mock_board.profile = profile
+    return mock_board
+
+
+@asynccontextmanager
+async def serving(board, path):
+    daemon = BoardDaemon(board, path)
+    task = asyncio.create_task(daemon.serve())
+    while not path.exists():
+        await asyncio.sleep(0.001)
+    try:
+        yield daemon
+    finally:
+        daemon.stop()
+        await task
+
+
+def test_fields_by_name():
+    assert fields_by_name("FeatureConfig") is FeatureConfig
+    assert fields_by_name("RcTuning") is RcTuning
+    # set only
+    assert fields_by_name("EepromWrite") is None
+    assert fields_by_name("Nope") is None
+
+
+async def test_daemon_handle(daemon_board):
+    daemon = BoardDaemon(daemon_board, "unused")
+    assert await daemon.handle(b'{"command": "profile"}') == dict(ok=True, result=dict(pid=1, rate=2))
+    assert await daemon.handle(b'{"command": "info"}') == dict(
+        ok=True, result=dict(name="bob", api="0.1.43", version="4.3.0")
+    )
+    assert await daemon.handle(b'{"command": "set_profile", "rate": 4}') == dict(ok=True, result=dict(pid=1, rate=4))
+    response = await daemon.handle(b'{"command": "nope"}')
+    assert response["ok"] is False
+    assert "Unknown command" in response["error"]
+    assert (await daemon.handle(b"not json"))["ok"] is False
+    assert daemon.requests == 5
+
+
+async def test_daemon_get(daemon_board):
+    daemon_board.get.return_value = FeatureConfig(features=Features.OSD | Features.AIRMODE)
+    daemon = BoardDaemon(daemon_board, "unused")
+    response = await daemon.handle(b'{"command": "get", "fields": "FeatureConfig", "pid": 2}')
+    assert response == dict(ok=True, result=dict(features=["OSD", "AIRMODE"]))
+    daemon_board.get.assert_awaited_once_with(FeatureConfig)
+    # reads from another profile put the previous one back
+    assert daemon_board.profile.selected == (2, None, True)
+
+
+async def test_daemon_client(daemon_board, tmp_path):
+    path = tmp_path / "daemon.sock"
+    assert daemon_client(path) is None
+    async with serving(daemon_board, path):
+        client = await asyncio.to_thread(daemon_client, path)
+        assert client is not None
+        with client:
+            # many requests share one connection
+            assert await asyncio.to_thread(client.request, "profile") == dict(pid=1, rate=2)
+            assert (await asyncio.to_thread(client.request, "status"))["requests"] == 2
+            with pytest.raises(DaemonError):
+                await asyncio.to_thread(client.request, "get", fields="Nope")
+            await asyncio.to_thread(client.request, "shutdown")
+    # socket removed on shutdown
+    assert not path.exists()
+    with pytest.raises(DaemonError):
+        DaemonClient(path).request("profile")
+
+
+async def test_cli_refuses_port_held_by_daemon(daemon_board, tmp_path, mocker: MockerFixture):
+    from click import ClickException
+
+    from bonfo.cli import BonfoContext, daemon_device
+
+    path = tmp_path / "daemon.sock"
+    mocker.patch("bonfo.cli.daemon_socket", return_value=str(path))
+    assert daemon_device() is None
+    ctx = BonfoContext(use_daemon=False)
+    ctx._port = mocker.Mock(device="/dev/tty-mock")
+    async with serving(daemon_board, path):
+        assert await asyncio.to_thread(daemon_device) == "/dev/tty-mock"
+        # commands opening the port themselves would fight the daemon over it
+        with pytest.raises(ClickException, match="daemon is running on /dev/tty-mock"):
+            await asyncio.to_thread(lambda: ctx.board)
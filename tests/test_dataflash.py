@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from bonfo.board import Board
+from bonfo.dataflash import DataflashProgress, download_dataflash, read_summary
+from bonfo.exceptions import DataflashError
+from bonfo.msp.fields.dataflash import DataflashSummary, DataflashSummaryFlags
+from bonfo.msp.fields.statuses import ApiVersion
+from bonfo.simulator import SimulatedBoard
+
+FLASH = os.urandom(5000)
+
+
+async def download(simulator, path, **options):
+    results = dict()
+    # connect() logs errors instead of raising, check results once it's done
+    async with Board(simulator.url, initial_data=False).connect() as board:
+        results["report"] = await download_dataflash(board, path, **options)
+    return results.get("report")
+
+
+async def test_download(tmp_path):
+    reports = []
+    async with SimulatedBoard(flash=FLASH) as simulator:
+        report = await download(simulator, tmp_path / "logs.bbl", window=4, read_size=200, progress=reports.append)
+    assert (tmp_path / "logs.bbl").read_bytes() == FLASH
+    assert (report.done, report.total, report.resumed_from) == (5000, 5000, 0)
+    assert report.throughput > 0
+    assert report.link_bytes == 5000 + 25 * 26
+    assert report.link_utilization is not None
+    assert len(reports) == 25
+
+
+async def test_download_short_reads_and_resume(tmp_path):
+    path = tmp_path / "logs.bbl"
+    path.write_bytes(FLASH[:1234])
+    # the board returns at most 100 bytes per read, the rest of each read is asked for again
+    async with SimulatedBoard(flash=FLASH, flash_read_limit=100) as simulator:
+        report = await download(simulator, path, read_size=240)
+    assert path.read_bytes() == FLASH
+    assert report.resumed_from == 1234
+    assert report.done == 5000
+
+
+async def test_download_restart(tmp_path):
+    path = tmp_path / "logs.bbl"
+    path.write_bytes(b"\xff" * 6000)
+    async with SimulatedBoard(flash=FLASH) as simulator:
+        # more on disk than on the board, the flash was erased since
+        assert await download(simulator, path) is None
+        await download(simulator, path, resume=False)
+    assert path.read_bytes() == FLASH
+
+
+async def test_download_failure_drops_reads_in_flight(tmp_path):
+    async with SimulatedBoard(flash=FLASH, flash_read_limit=0) as simulator:
+        # connect() logs errors instead of raising, check results once it's done
+        async with Board(simulator.url, initial_data=False).connect() as board:
+            with pytest.raises(DataflashError, match="No data at 0"):
+                await download_dataflash(board, tmp_path / "logs.bbl", window=4)
+            # the three other empty replies don't end up as the answer to the next request
+            api = await board.get(ApiVersion)
+    assert api == ApiVersion(0, 1, 43)
+    assert not board.desynced
+
+
+async def test_read_summary_errors(mock_board):
+    mock_board.get.return_value = None
+    with pytest.raises(DataflashError, match="no dataflash"):
+        await read_summary(mock_board)
+    mock_board.get.return_value = DataflashSummary(
+        flags=DataflashSummaryFlags.SUPPORTED, sectors=1, total_size=10, used_size=0
+    )
+    with pytest.raises(DataflashError, match="busy"):
+        await read_summary(mock_board)
+
+
+def test_progress_link_utilization():
+    report = DataflashProgress(total=100, done=50, link_bytes=1152, baudrate=115200, started=0)
+    assert report.link_utilization is not None and report.link_utilization < 1
+    assert DataflashProgress(total=100).link_utilization is None
@@ -0,0 +1,66 @@
+import asyncio
+import socket
+import threading
+import time
+
+from pytest_mock import MockerFixture
+from serial_asyncio import serial
+
+from bonfo.discovery import discover, probe
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.statuses import ApiVersion
+from bonfo.simulator import SIMULATED_PAYLOADS, SimulatedBoard
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"socket://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def test_probe():
+    async with SimulatedBoard() as simulator:
+        found = await probe(simulator.url)
+    assert found is not None
+    assert found.api == ApiVersion(0, 1, 43)
+    assert found.uid_hex == SIMULATED_PAYLOADS[MSP.UID].hex()
+    assert await probe(closed_port_url()) is None
+
+
+async def test_probe_opens_port_off_the_loop(mocker: MockerFixture):
+    released = threading.Event()
+    serial_for_url = serial.serial_for_url
+
+    def slow_open(*args, **kwargs):
+        # only opens once the event loop has carried on without it
+        assert released.wait(1)
+        return serial_for_url(*args, **kwargs)
+
+    mocker.patch("bonfo.discovery.serial.serial_for_url", side_effect=slow_open)
+    async with SimulatedBoard() as simulator:
+        probing = asyncio.create_task(probe(simulator.url, timeout=2))
+        await asyncio.sleep(0.05)
+        released.set()
+        found = await probing
+    assert found is not None
+    assert found.api == ApiVersion(0, 1, 43)
+
+
+async def test_discover_in_parallel(mocker: MockerFixture):
+    # pyserial's socket:// ports sleep for 0.3s on close, serial ports don't
+    mocker.patch("serial.urlhandler.protocol_socket.time.sleep")
+    silent = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+    silent_url = "socket://127.0.0.1:{}".format(silent.sockets[0].getsockname()[1])
+    # no UID support
+    payloads = {MSP.API_VERSION: b"\x00\x01\x2a"}
+    async with SimulatedBoard() as first, SimulatedBoard(payloads=payloads, latency=0.05) as second:
+        started = time.perf_counter()
+        found = await discover([second.url, silent_url, closed_port_url(), first.url], timeout=0.3)
+        elapsed = time.perf_counter() - started
+        urls = first.url, second.url
+    silent.close()
+    assert [board.device for board in found] == sorted(urls)
+    assert {board.device: board.api.api_minor for board in found} == {urls[0]: 43, urls[1]: 42}
+    assert [board.uid for board in found if board.device == urls[1]] == [None]
+    # every port is probed at once, the silent one only costs a single timeout
+    assert elapsed < 0.6
@@ -0,0 +1,121 @@
+import mmap
+import threading
+import zipfile
+
+import pytest
+
+from bonfo.export import TelemetryWriter, npy_bytes, npy_column, read_arrow, read_chunks
+from bonfo.msp.fields.sensors import Attitude
+from bonfo.msp.fields.statuses import RawIMU
+from bonfo.telemetry import NAN
+
+
+def imu(value: int) -> RawIMU:
+    return RawIMU.parse(value.to_bytes(2, "big") * 9)
+
+
+def test_npy_round_trip():
+    from array import array
+
+    column = array("d", [1.5, NAN, -3.0])
+    data = npy_bytes(column)
+    # the data starts on a 64 byte boundary like numpy writes it
+    assert (len(data) - 24) % 64 == 0
+    assert npy_column(memoryview(data)).tolist()[::2] == [1.5, -3.0]
+
+
+def test_writer_chunks(tmp_path):
+    with TelemetryWriter(tmp_path, chunk_size=4) as writer:
+        for sample in range(10):
+            writer.append(imu(sample), t=float(sample))
+        writer.append(Attitude(roll=1, pitch=2, yaw=3), t=0.0)
+        # full chunks are written as they fill, the rest waits for close
+        writer.wait()
+        assert writer.streams[RawIMU].chunks.written == 2
+
+    chunks = list(read_chunks(tmp_path, RawIMU))
+    assert [len(chunk["time"]) for chunk in chunks] == [4, 4, 2]
+    assert list(chunks[0]) == ["time"] + [
+        f"{name}[{index}]" for name in ("accelerometer", "gyroscope", "magnetometer") for index in range(3)
+    ]
+    assert [value for chunk in chunks for value in chunk["accelerometer[0]"]] == list(map(float, range(10)))
+    assert [value for chunk in chunks for value in chunk["time"]] == list(map(float, range(10)))
+    assert next(read_chunks(tmp_path, "Attitude"))["yaw"].tolist() == [3.0]
+    with zipfile.ZipFile(tmp_path / "RawIMU" / "00000.npz") as archive:
+        assert archive.getinfo("time.npy").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_writer_uncompressed_chunks_are_mapped(tmp_path):
+    with TelemetryWriter(tmp_path, compress=False) as writer:
+        for sample in range(3):
+            writer.append(imu(sample), t=float(sample))
+    (chunk,) = read_chunks(tmp_path, RawIMU)
+    assert isinstance(chunk["gyroscope[1]"].obj, mmap.mmap)
+    assert chunk["gyroscope[1]"].tolist() == [0.0, 1.0, 2.0]
+
+
+def test_writer_resumes_numbering(tmp_path):
+    for run in range(2):
+        with TelemetryWriter(tmp_path) as writer:
+            writer.append(Attitude(roll=run, pitch=0, yaw=0))
+    assert [chunk["roll"].tolist() for chunk in read_chunks(tmp_path, Attitude)] == [[0.0], [1.0]]
+
+
+def test_writer_writes_chunks_in_a_thread(tmp_path, mocker):
+    threads = []
+    write = mocker.patch("bonfo.export.NpzChunks.write")
+    write.side_effect = lambda columns: threads.append(threading.current_thread())
+    with TelemetryWriter(tmp_path, chunk_size=2) as writer:
+        for sample in range(5):
+            writer.append(imu(sample), t=float(sample))
+    assert write.call_count == 3
+    assert threading.current_thread() not in threads
+
+    write.side_effect = OSError("disk full")
+    writer = TelemetryWriter(tmp_path, chunk_size=1)
+    writer.append(imu(1))
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
+
+
+def test_writer_filters_and_attaches(tmp_path, mocker):
+    board = mocker.Mock()
+    writer = TelemetryWriter(tmp_path, fields=(Attitude,)).attach(board)
+    board.subscribe.assert_called_once_with(writer.append)
+    writer.append(imu(1))
+    writer.close()
+    board.subscribe.return_value.assert_called_once_with()
+    assert list(writer.streams) == []
+    with pytest.raises(ValueError):
+        TelemetryWriter(tmp_path, format="csv")
+
+
+def test_npz_loads_with_numpy(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    with TelemetryWriter(tmp_path) as writer:
+        writer.append(imu(7), t=1.0)
+    loaded = numpy.load(tmp_path / "RawIMU" / "00000.npz")
+    assert loaded["magnetometer[2]"].tolist() == [7.0]
+
+
+def test_arrow_export(tmp_path):
+    pytest.importorskip("pyarrow")
+    with TelemetryWriter(tmp_path, format="arrow", chunk_size=2, compress=False) as writer:
+        for sample in range(5):
+            writer.append(imu(sample), t=float(sample))
+    table = read_arrow(tmp_path, RawIMU)
+    assert table.num_rows == 5
+    assert table.column("accelerometer[1]").to_pylist() == list(map(float, range(5)))
+
+
+def test_arrow_export_keeps_earlier_sessions(tmp_path):
+    pytest.importorskip("pyarrow")
+    for run in range(3):
+        with TelemetryWriter(tmp_path, format="arrow") as writer:
+            writer.append(Attitude(roll=run, pitch=0, yaw=0), t=float(run))
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "Attitude.1.arrow",
+        "Attitude.2.arrow",
+        "Attitude.arrow",
+    ]
+    assert read_arrow(tmp_path, Attitude).column("roll").to_pylist() == [0.0, 1.0, 2.0]
@@ -0,0 +1,71 @@
+"""What importing the package loads, run `make importtime` for a breakdown of how long it takes."""
+import subprocess
+import sys
+
+import pytest
+
+# Entry points kept light, by deferring the modules below
+ENTRY_MODULES = ["bonfo", "bonfo.msp", "bonfo.cli"]
+
+# Modules that should only be imported once they're used
+DEFERRED_MODULES = ["arrow", "semver", "serial_asyncio", "bonfo.board", "bonfo.msp.fields.statuses"]
+
+# Loaded by the commands that use them, so help and completion don't wait on them
+CLI_DEFERRED_MODULES = ["asyncio", "loca", "rich.progress", "serial.tools.list_ports", "sqlite3", "bonfo.store"]
+
+# Ceiling on the time bonfo's own modules take to import, in microseconds. It's about 20ms, the
+# ceiling is generous so slow machines pass, while work added at module level still fails it
+IMPORT_BUDGET_US = 100_000
+
+
+def run_python(code, *options):
+    return subprocess.run([sys.executable, *options, "-c", code], capture_output=True, text=True, check=True)
+
+
+def bonfo_import_time(module):
+    """Sum of the self times `-X importtime` reports for bonfo's modules, dependencies not included."""
+    result = run_python(f"import {module}", "-X", "importtime")
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        if name == "bonfo" or name.startswith("bonfo."):
+            total += int(self_us)
+    return total
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_import_defers_heavy_modules(module):
+    result = run_python(f"import sys, {module}; print(' '.join(sys.modules))")
+    loaded = result.stdout.split()
+    assert [name for name in DEFERRED_MODULES if name in loaded] == []
+
+
+def test_fields_load_on_first_use():
+    result = run_python(
+        "import sys\n"
+        "from bonfo.msp.message import Message\n"
+        "assert 'bonfo.msp.fields.pids' not in sys.modules\n"
+        "Message.parse(b'$M>\\x00\\xd2\\xd2')\n"
+        "assert 'bonfo.msp.fields.config' in sys.modules\n"
+        "assert 'bonfo.msp.fields.pids' not in sys.modules\n"
+    )
+    assert result.returncode == 0
+
+
+def test_cli_defers_command_modules():
+    result = run_python(
+        "import logging, sys, bonfo.cli\n"
+        "print(' '.join(sys.modules))\n"
+        # logging is configured from the --log-level option, not on import
+        "assert not logging.getLogger().handlers\n"
+    )
+    loaded = result.stdout.split()
+    assert [name for name in CLI_DEFERRED_MODULES if name in loaded] == []
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_import_time_budget(module):
+    assert 0 < bonfo_import_time(module) < IMPORT_BUDGET_US
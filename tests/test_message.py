@@ -1,8 +1,11 @@
+import pytest
+
 from bonfo.msp.codes import MSP
-from bonfo.msp.fields.config import SelectPID, SelectRate
+from bonfo.msp.fields.config import FeatureConfig, Features, SelectPID, SelectRate
+from bonfo.msp.fields.statuses import Name
 from bonfo.msp.message import Message
 from bonfo.msp.structs import FrameStruct
-from bonfo.msp.utils import msg_packet, out_message_builder
+from bonfo.msp.utils import build_payload, msg_packet, msp_name, out_message_builder, pack_message
 
 
 def test_select_setting_ack():
@@ -21,3 +24,43 @@ def test_out_message_builder():
 def test_frame_struct():
     result = FrameStruct(MSP.SELECT_SETTING).build(SelectRate(2))
     assert result == b"\x81"
+
+
+def test_out_message_builder_no_fields():
+    assert out_message_builder(MSP.STATUS_EX) == b"$M<\x00\x96\x96"
+
+
+def test_out_message_builder_matches_message_struct():
+    for code, fields in (
+        (MSP.SELECT_SETTING, SelectRate(5)),
+        (MSP.SET_NAME, Name(name="bonfo")),
+        (MSP.SET_FEATURE_CONFIG, FeatureConfig(features=Features.RX_SERIAL | Features.GPS)),
+    ):
+        expected = Message.build(dict(message_type="OUT", packet=dict(value=dict(frame_id=code, fields=fields))))
+        assert out_message_builder(code, fields=fields) == expected
+
+
+def test_out_message_builder_builds_payload_once(mocker):
+    fields = Name(name="bonfo")
+    build = mocker.spy(Name.get_struct(), "build")
+    out_message_builder(MSP.SET_NAME, fields=fields)
+    build.assert_called_once()
+
+
+def test_pack_message():
+    assert pack_message("IN", MSP.SELECT_SETTING) == b"$M>\x00\xd2\xd2"
+    assert pack_message("OUT", MSP.SET_NAME, b"ab") == b"$M<\x02\x0bab\x0a"
+    with pytest.raises(ValueError):
+        pack_message("OUT", MSP.SET_NAME, bytes(256))
+
+
+def test_build_payload_passthrough():
+    assert build_payload(MSP.SET_NAME, b"\x01\x02") == b"\x01\x02"
+    assert build_payload(MSP.SET_NAME) == b""
+
+
+def test_frame_id_is_raw_int():
+    msg = msg_packet(Message.parse(b"$M>\x00\x96\x96"))
+    assert type(msg.frame_id) is int
+    assert msp_name(msg.frame_id) == "STATUS_EX"
+    assert msp_name(255) == "255"
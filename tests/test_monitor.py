@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+from pytest_mock import MockerFixture
+
+from bonfo.monitor import BITS_PER_BYTE, Monitor, RateWindow
+from bonfo.msp.fields.sensors import Attitude
+from bonfo.msp.fields.statuses import StatusEx
+from tests import messages
+
+
+def test_rate_window():
+    window = RateWindow(span=1.0)
+    assert window.rate() == 0.0
+    window.add(0.0, 10)
+    window.add(0.5, 10)
+    window.add(1.0, 10)
+    assert window.rate() == 20.0
+    # events older than the span fall out of the window
+    window.add(2.0, 40)
+    assert window.events[0] == (1.0, 10)
+    assert window.rate() == 40.0
+
+
+@pytest.fixture
+def polls():
+    """Rolls for the board to answer with, each put lets one poll cycle complete."""
+    return asyncio.Queue()
+
+
+@pytest.fixture
+def monitor_board(mock_board, polls):
+    mock_board.baudrate = 115200
+
+    async def get_many(*fields, lazy=False):
+        roll = await polls.get()
+        return [
+            Attitude.parse(roll.to_bytes(2, "big") + b"\x00\x02\x00\x03", lazy=lazy),
+            StatusEx.parse(messages.status_ex_response[5:-1], lazy=lazy),
+        ]
+
+    mock_board.get_many.side_effect = get_many
+    return mock_board
+
+
+async def cycled(monitor, cycles):
+    while monitor.cycles < cycles:
+        await asyncio.sleep(0)
+
+
+async def test_monitor_merges_frames_for_slow_renders(monitor_board, polls):
+    loop = asyncio.get_running_loop()
+    drawn = asyncio.Queue()
+    # frames stay on the terminal until released
+    release = threading.Semaphore(0)
+
+    def draw(frame):
+        loop.call_soon_threadsafe(drawn.put_nowait, frame)
+        assert release.acquire(timeout=5)
+
+    monitor = Monitor(monitor_board, fields=(Attitude, StatusEx))
+    running = asyncio.create_task(monitor.run(draw, fps=1000))
+    try:
+        polls.put_nowait(0)
+        first = await drawn.get()
+        # polling carries on while the first frame is drawn
+        for roll in range(1, 4):
+            polls.put_nowait(roll)
+        await cycled(monitor, 4)
+        release.release()
+        second = await drawn.get()
+        release.release()
+    finally:
+        running.cancel()
+        await asyncio.gather(running, return_exceptions=True)
+
+    monitor_board.get_many.assert_awaited_with(Attitude, StatusEx, lazy=True)
+    assert (first.cycles, second.cycles) == (1, 4)
+    # cycles 2 and 3 were merged into the second frame, which carries the newest values
+    assert (second.dropped, monitor.dropped) == (2, 2)
+    assert (first.values[Attitude].roll, second.values[Attitude].roll) == (0, 3)
+    assert monitor.rendered >= 1
+
+
+async def test_monitor_render_sleeps_out_the_rest_of_the_frame(monitor_board, mocker: MockerFixture):
+    now = 100.0
+    draw_times = [0.03, 0.25, 0.15]
+
+    def draw(frame):
+        nonlocal now
+        if not draw_times:
+            raise EOFError
+        now += draw_times.pop(0)
+
+    monitor = Monitor(monitor_board, fields=(Attitude,), clock=lambda: now)
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        # the next cycle is ready as soon as the pause is over
+        monitor._updated.set()
+
+    mocker.patch("bonfo.monitor.asyncio.sleep", side_effect=sleep)
+    monitor._updated.set()
+    with pytest.raises(EOFError):
+        await monitor.render(draw, fps=10)
+    # frames that took their whole interval to draw aren't held back further
+    assert sleeps == [pytest.approx(0.07), 0.0, 0.0]
+
+
+async def test_monitor_frame_statistics(monitor_board, polls):
+    for roll in range(2):
+        polls.put_nowait(roll)
+    monitor = Monitor(monitor_board, fields=(Attitude, StatusEx))
+    monitor._record(0.0, await monitor_board.get_many(lazy=True))
+    monitor._record(0.5, await monitor_board.get_many(lazy=True))
+    frame = monitor.frame()
+    assert frame.cycles == 2
+    assert frame.poll_hz == 2.0
+    status_bytes = 12 + len(messages.status_ex_response[5:-1])
+    assert frame.throughput == {Attitude: 2 * (12 + 6), StatusEx: 2 * status_bytes}
+    assert frame.utilization[StatusEx] == 2 * status_bytes * BITS_PER_BYTE / 115200
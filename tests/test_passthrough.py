@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from bonfo.passthrough import CliParser, CliSettings, cli_session
+
+BANNER = b"\r\nEntering CLI Mode, type 'exit' to return, or 'help'\r\n\r\n# "
+
+DIFF_ALL = [
+    b"diff all\r\n",
+    b"# version\r\n# Betaflight / STM32F7X2 (S7X2) 4.3.0 Jun  1 2022 / 00:00:00 (abcdefg) MSP API: 1.44\r\n\r\n",
+    b"# start the command batch\r\nbatch start\r\n\r\n# reset configuration to default settings\r\ndefaults nosave\r\n",
+    b"board_name MATEKF722\r\n\r\n# feature\r\nfeature -RX_PARALLEL_PWM\r\nfeature TELEMETRY\r\n\r\n",
+    b"# serial\r\nserial 0 64 115200 57600 0 115200\r\n\r\n# master\r\nset gyro_lpf1_static_hz = 0\r\nset motor_pwm_",
+    b"protocol = DSHOT600\r\n\r\nprofile 0\r\n\r\n# profile 0\r\nset p_pitch = 50\r\n\r\nprofile 1\r\n\r\n# ",
+    b"profile 1\r\nset p_pitch = 48\r\n\r\nrateprofile 0\r\n\r\n# rateprofile 0\r\nset roll_srate = 67\r\n\r\n",
+    b"# restore original profile selection\r\nprofile 0\r\nrateprofile 0\r\n\r\n# save configuration\r\nsave\r\n",
+    b"# ",
+]
+
+
+@pytest.fixture
+def cli_board(mock_board, mocker: MockerFixture):
+    mock_board.reader = asyncio.StreamReader()
+    mock_board.message_lock = asyncio.Lock()
+    replies = {b"#": [BANNER], b"diff all\r": DIFF_ALL, b"get name\r": [b"get name\r\nname = bob\r\n\r\n# "]}
+
+    async def reply(chunks):
+        for chunk in chunks:
+            mock_board.reader.feed_data(chunk)
+            await asyncio.sleep(0)
+
+    def write(data):
+        if data in replies:
+            asyncio.create_task(reply(replies[data]))
+
+    mock_board.writer.write.side_effect = write
+    return mock_board
+
+
+def test_parser():
+    parser = CliParser()
+    for line in b"".join(DIFF_ALL[1:]).decode().split("\r\n"):
+        parser.feed(line)
+    assert parser.result == CliSettings(
+        settings=dict(gyro_lpf1_static_hz="0", motor_pwm_protocol="DSHOT600"),
+        features=dict(RX_PARALLEL_PWM=False, TELEMETRY=True),
+        pid_profiles={1: dict(p_pitch="50"), 2: dict(p_pitch="48")},
+        rate_profiles={1: dict(roll_srate="67")},
+        commands=["board_name MATEKF722", "serial 0 64 115200 57600 0 115200"],
+        header=[
+            "version",
+            "Betaflight / STM32F7X2 (S7X2) 4.3.0 Jun  1 2022 / 00:00:00 (abcdefg) MSP API: 1.44",
+            "start the command batch",
+        ],
+    )
+
+
+async def test_cli_session_capture(cli_board):
+    lines = []
+    async with cli_session(cli_board) as session:
+        captured = await session.capture("diff all", lines=lines)
+        # the session is ready for the next command once the prompt is back
+        assert await session.run("get name") == ["name = bob", ""]
+        # MSP requests wait for the session to end
+        assert cli_board.message_lock.locked()
+    cli_board.writer.write.assert_called_with(b"exit\r")
+    assert lines[0] == "# version"
+    # a comment split right after its "# " isn't mistaken for the prompt
+    assert "# profile 1" in lines
+    assert lines[-1] == "save"
+    assert captured.pid_profiles == {1: dict(p_pitch="50"), 2: dict(p_pitch="48")}
+    assert captured.settings["motor_pwm_protocol"] == "DSHOT600"
+
+
+async def test_cli_session_idle_timeout(cli_board):
+    with pytest.raises(asyncio.TimeoutError):
+        async with cli_session(cli_board, idle_timeout=0.05) as session:
+            await session.run("status")
+    cli_board.writer.write.assert_called_with(b"exit\r")
@@ -1,8 +1,13 @@
+import asyncio
+
+import pytest
 from construct import Container
 from pytest_mock import MockerFixture
 
 from bonfo.board import Board
-from bonfo.msp.fields.config import SelectPID, SelectRate
+from bonfo.exceptions import MessageError
+from bonfo.msp.fields.config import RcTuning, SelectPID, SelectRate
+from bonfo.msp.fields.pids import PidAdvanced, PidCoefficients
 from bonfo.msp.fields.statuses import StatusEx
 from bonfo.profile import Profile
 
@@ -99,7 +104,7 @@ async def test_profile_manager_with_selections(mock_board: Board, mocker: Mocker
     assert profile.rate == 4
     profile.board.set.assert_any_await(SelectRate(4))
     profile.board.set.assert_any_await(SelectPID(2))
-    profile.board.get.assert_any_await(StatusEx)
+    profile.board.get.assert_any_await(StatusEx, lazy=True)
 
 
 async def test_profile_manager_with_revert_on_exit(mock_board, mocker: MockerFixture) -> None:
@@ -138,10 +143,10 @@ async def test_profile_manager_with_revert_on_exit(mock_board, mocker: MockerFix
     assert profile.rate == 1
     profile.board.set.assert_any_await(SelectPID(2))
     profile.board.set.assert_any_await(SelectRate(4))
-    profile.board.get.assert_any_await(StatusEx)
+    profile.board.get.assert_any_await(StatusEx, lazy=True)
     profile.board.set.assert_any_await(SelectPID(1))
     profile.board.set.assert_any_await(SelectRate(1))
-    profile.board.get.assert_any_await(StatusEx)
+    profile.board.get.assert_any_await(StatusEx, lazy=True)
 
 
 async def test_set_profiles_from_board(mock_board):
@@ -154,7 +159,7 @@ async def test_set_profiles_from_board(mock_board):
     assert profile.pid == 1
     assert profile.rate == 1
     result = await profile._set_profiles_from_board()
-    mock_board.get.assert_any_await(StatusEx)
+    mock_board.get.assert_any_await(StatusEx, lazy=True)
     assert profile._profile_tracker == (3, 6) == result
     assert profile._state == Profile.SyncedState.CLEAN
     assert profile.pid == 3
@@ -237,3 +242,123 @@ async def test_apply_changes_different_board_result(mock_board, mocker: MockerFi
     mock_send_pid.assert_awaited_once_with(2)
     mock_send_rate.assert_awaited_once_with(2)
     mock_set_profiles.assert_awaited_once_with()
+
+
+async def test_read_all(mock_board, mocker: MockerFixture):
+    """Every profile is selected once, starting from and ending on the current selection."""
+    profile = Profile(board=mock_board)
+    profile._state = Profile.SyncedState.CLEAN
+    profile._pid, profile._rate = (2, 3)
+    mock_board.get_many.side_effect = lambda *fields, lazy: [f"{field.__name__}" for field in fields]
+    matrix = await profile.read_all()
+
+    assert sorted(matrix.pid) == [1, 2, 3]
+    assert sorted(matrix.rate) == [1, 2, 3, 4, 5, 6]
+    assert matrix.pid[1] == {PidCoefficients: "PidCoefficients", PidAdvanced: "PidAdvanced"}
+    assert matrix.rate[6] == {RcTuning: "RcTuning"}
+    # pid and rate profiles share the pipelined reads
+    assert mock_board.get_many.await_count == 6
+    mock_board.get_many.assert_any_await(PidCoefficients, PidAdvanced, RcTuning, lazy=False)
+    mock_board.get_many.assert_any_await(RcTuning, lazy=False)
+    assert mock_board.set.await_args_list == [
+        mocker.call(SelectPID(1)),
+        mocker.call(SelectRate(1)),
+        mocker.call(SelectPID(3)),
+        mocker.call(SelectRate(2)),
+        mocker.call(SelectRate(4)),
+        mocker.call(SelectRate(5)),
+        mocker.call(SelectRate(6)),
+        # restore original selection
+        mocker.call(SelectPID(2)),
+        mocker.call(SelectRate(3)),
+    ]
+    # StatusEx isn't re-read between switches
+    mock_board.get.assert_not_awaited()
+    assert (profile.pid, profile.rate) == (2, 3)
+
+
+async def test_read_all_restores_on_error(mock_board, mocker: MockerFixture):
+    profile = Profile(board=mock_board)
+    profile._state = Profile.SyncedState.CLEAN
+    mock_board.get_many.side_effect = [["pid", "advanced", "rc"], Exception("lost connection")]
+    with pytest.raises(Exception):
+        await profile.read_all()
+    assert mock_board.set.await_args_list[-2:] == [mocker.call(SelectPID(1)), mocker.call(SelectRate(1))]
+
+
+async def test_read_all_fails_on_refused_switch(mock_board, mocker: MockerFixture):
+    profile = Profile(board=mock_board)
+    profile._state = Profile.SyncedState.CLEAN
+    mock_board.get_many.return_value = ["pid", "advanced", "rc"]
+    mock_board.set.side_effect = [None, MessageError("The board refused SELECT_SETTING"), None]
+    with pytest.raises(MessageError):
+        await profile.read_all()
+    # only the first profile was read, then the PID profile it switched from was restored
+    mock_board.get_many.assert_awaited_once()
+    assert mock_board.set.await_args_list[-1] == mocker.call(SelectPID(1))
+
+
+async def test_read_all_syncs_unfetched_profiles(mock_board):
+    profile = Profile(board=mock_board)
+    mock_board.get.side_effect = [Container(pid_profile=1, rate_profile=1)]
+    mock_board.get_many.side_effect = lambda *fields, lazy: [None] * len(fields)
+    await profile.read_all(pid_fields=[PidAdvanced], rate_fields=[])
+    mock_board.get.assert_awaited_once_with(StatusEx, lazy=True)
+    assert mock_board.get_many.await_count == 6
+
+
+async def test_profile_manager_concurrent_contexts(mock_board, mocker: MockerFixture) -> None:
+    """Concurrent contexts don't interleave and share profile switches."""
+    profile = Profile(board=mock_board)
+    selected = {"pid": 1}
+
+    async def select(fields):
+        selected["pid"] = fields.profile["pid_profile"]
+        await asyncio.sleep(0)
+
+    async def status(fields, lazy=False):
+        return Container(pid_profile=selected["pid"], rate_profile=1)
+
+    mock_board.set.side_effect = select
+    mock_board.get.side_effect = status
+    seen = []
+
+    async def work(pid):
+        async with profile(pid=pid) as pro:
+            await asyncio.sleep(0)
+            seen.append((pid, pro.pid, selected["pid"]))
+
+    await asyncio.gather(work(2), work(3), work(2), work(3))
+    assert sorted(seen) == [(2, 2, 2), (2, 2, 2), (3, 3, 3), (3, 3, 3)]
+    # one switch per profile group
+    assert mock_board.set.await_args_list == [mocker.call(SelectPID(2)), mocker.call(SelectPID(3))]
+    assert profile._scheduler.idle
+
+
+async def test_profile_manager_nested_contexts(mock_board, mocker: MockerFixture) -> None:
+    """Profile work nested in a context runs under it instead of waiting on it."""
+    profile = Profile(board=mock_board)
+    selected = dict(pid_profile=1, rate_profile=1)
+
+    async def select(fields):
+        selected.update(fields.profile)
+
+    async def status(fields, lazy=False):
+        return Container(**selected)
+
+    mock_board.set.side_effect = select
+    mock_board.get.side_effect = status
+    mock_board.get_many.side_effect = lambda *fields, lazy: [None] * len(fields)
+
+    async def nested():
+        async with profile(pid=2):
+            async with profile(pid=3) as pro:
+                assert pro.pid == selected["pid_profile"] == 3
+            matrix = await profile.read_all(pid_fields=[PidAdvanced], rate_fields=[])
+            assert sorted(matrix.pid) == [1, 2, 3]
+
+    await asyncio.wait_for(nested(), 1)
+    assert mock_board.set.await_args_list[:2] == [mocker.call(SelectPID(2)), mocker.call(SelectPID(3))]
+    # read_all ends on the selection it started from
+    assert selected == dict(pid_profile=3, rate_profile=1)
+    assert profile._scheduler.idle
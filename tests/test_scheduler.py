@@ -0,0 +1,155 @@
+import asyncio
+
+from bonfo.scheduler import MAX_BYPASSES, ProfileScheduler, compatible, merge, resolve, switch_cost
+
+
+def test_compatible():
+    assert compatible((1, 2), (None, None))
+    assert compatible((1, 2), (1, None))
+    assert compatible((1, 2), (1, 2))
+    assert not compatible((1, 2), (2, None))
+    assert not compatible(None, (None, None))
+
+
+def test_switch_cost_and_resolve():
+    assert switch_cost((1, 1), (None, None)) == 0
+    assert switch_cost((1, 1), (2, None)) == 1
+    assert switch_cost((1, 1), (2, 3)) == 2
+    assert resolve((1, 1), (None, 3)) == (1, 3)
+
+
+async def test_acquire_idle_and_join():
+    scheduler = ProfileScheduler()
+    assert await scheduler.acquire((2, None), (1, 1)) == (2, 1)
+    # compatible work joins the running group
+    assert await scheduler.acquire((None, 1), (2, 1)) == (2, 1)
+    assert scheduler.holders == 2
+    scheduler.release((2, 1))
+    scheduler.release((2, 1))
+    assert scheduler.idle
+
+
+async def test_groups_run_one_at_a_time_cheapest_first():
+    scheduler = ProfileScheduler()
+    order = []
+
+    async def work(target):
+        selection = await scheduler.acquire(target, (1, 1))
+        order.append((target, selection))
+        await asyncio.sleep(0)
+        scheduler.release(selection)
+
+    await scheduler.acquire((1, 1), (1, 1))
+    tasks = [asyncio.create_task(work(target)) for target in [(3, 3), (2, None), (1, 1), (3, None)]]
+    await asyncio.sleep(0)
+    # waiting work doesn't join even when compatible, so it can't jump the queue
+    assert len(scheduler.waiting) == 4
+    scheduler.release((1, 1))
+    await asyncio.gather(*tasks)
+    assert order == [
+        ((1, 1), (1, 1)),
+        ((2, None), (2, 1)),
+        ((3, 3), (3, 3)),
+        ((3, None), (3, 3)),
+    ]
+
+
+async def test_exclusive_runs_alone():
+    scheduler = ProfileScheduler()
+    await scheduler.acquire((None, None), (1, 1), exclusive=True)
+    task = asyncio.create_task(scheduler.acquire((None, None), (1, 1)))
+    await asyncio.sleep(0)
+    assert not task.done()
+    scheduler.release((1, 1))
+    assert await task == (1, 1)
+
+
+async def test_bypassed_waiter_goes_next():
+    scheduler = ProfileScheduler()
+    await scheduler.acquire((1, 1), (1, 1))
+    far = asyncio.create_task(scheduler.acquire((3, 6), (1, 1)))
+    await asyncio.sleep(0)
+    for _ in range(MAX_BYPASSES):
+        near = asyncio.create_task(scheduler.acquire((1, 1), (1, 1)))
+        await asyncio.sleep(0)
+        scheduler.release((1, 1))
+        await near
+    assert not far.done()
+    near = asyncio.create_task(scheduler.acquire((1, 1), (1, 1)))
+    await asyncio.sleep(0)
+    scheduler.release((1, 1))
+    assert await far == (3, 6)
+    assert not near.done()
+    scheduler.release((3, 6))
+    assert await near == (1, 1)
+
+
+async def test_cancelled_waiter_is_removed():
+    scheduler = ProfileScheduler()
+    await scheduler.acquire((1, 1), (1, 1))
+    task = asyncio.create_task(scheduler.acquire((2, 2), (1, 1)))
+    await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert scheduler.waiting == []
+    scheduler.release((1, 1))
+    assert scheduler.idle
+
+
+async def test_release_skips_waiter_cancelled_before_waking():
+    scheduler = ProfileScheduler()
+    await scheduler.acquire((1, 1), (1, 1))
+    task = asyncio.create_task(scheduler.acquire((2, 2), (1, 1)))
+    await asyncio.sleep(0)
+    task.cancel()
+    # released before the cancelled task gets to remove itself
+    scheduler.release((1, 1))
+    await asyncio.gather(task, return_exceptions=True)
+    assert scheduler.holders == 0
+    assert scheduler.selection is None
+    assert scheduler.idle
+    assert await scheduler.acquire((2, 2), (1, 1)) == (2, 2)
+
+
+async def test_nested_acquire_runs_under_the_held_grant():
+    scheduler = ProfileScheduler()
+
+    async def work():
+        await scheduler.acquire((2, None), (1, 1))
+        # the task's own grant doesn't hold up its nested work, even exclusive work
+        assert await scheduler.acquire((3, None), (2, 1)) == (3, 1)
+        assert await scheduler.acquire((None, None), (3, 1), exclusive=True) == (3, 1)
+        scheduler.release((3, 1))
+        scheduler.release((3, 1))
+        scheduler.release((3, 1))
+
+    other = asyncio.create_task(asyncio.sleep(0))
+    await asyncio.wait_for(work(), 1)
+    await other
+    assert scheduler.idle
+    assert scheduler._grants == {}
+
+    # other tasks still wait for the grant to be released
+    await scheduler.acquire((1, 1), (1, 1))
+    waiting = asyncio.create_task(scheduler.acquire((2, 2), (1, 1)))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    scheduler.release((1, 1))
+    assert await waiting == (2, 2)
+
+
+async def test_revert_waits_for_last_work():
+    scheduler = ProfileScheduler()
+    await scheduler.acquire((2, 2), (1, 1))
+    await scheduler.acquire((2, None), (2, 2))
+    scheduler.request_revert((1, 1))
+    assert scheduler.take_revert() is None
+    scheduler.release((2, 2))
+    assert scheduler.take_revert() == (1, 1)
+    assert scheduler.take_revert() is None
+
+
+def test_merge():
+    assert merge((3, None), (None, 2)) == (3, 2)
+    assert merge((3, None), (3, 2)) == (3, 2)
+    assert merge((3, None), (2, None)) is None
@@ -0,0 +1,53 @@
+import pytest
+
+from bonfo.board import Board
+from bonfo.exceptions import MessageError
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.config import EepromWrite, SelectPID
+from bonfo.msp.fields.statuses import ApiVersion, BoardInfo, Name, StatusEx
+from bonfo.simulator import SIMULATED_PAYLOADS, SimulatedBoard, reply_frame
+
+
+def test_simulator_respond():
+    simulator = SimulatedBoard(payloads={MSP.API_VERSION: b"\x00\x01\x2b"})
+    assert simulator.respond(MSP.API_VERSION, b"") == b"$M>\x03\x01\x00\x01\x2b\x28"
+    # sets become the reply to the matching get
+    assert simulator.respond(MSP.SET_NAME, b"bob") == reply_frame(MSP.SET_NAME)
+    assert simulator.payloads[MSP.NAME] == b"bob"
+    # unsupported messages
+    assert simulator.respond(MSP.BOARD_INFO, b"") == b"$M!\x00\x04\x04"
+    assert simulator.requests == 3
+
+
+async def test_simulated_board():
+    async with SimulatedBoard() as simulator:
+        # connect() logs errors instead of raising, check results once it's done
+        async with Board(simulator.url, initial_data=True).connect() as board:
+            status, board_info = await board.get_many(StatusEx, BoardInfo)
+            await board.set(EepromWrite())
+    assert board.info.api == ApiVersion(0, 1, 43)
+    assert board.info.name == Name("simulator")
+    assert (board.profile.pid, board.profile.rate) == (1, 1)
+    assert status == StatusEx.parse(SIMULATED_PAYLOADS[MSP.STATUS_EX])
+    assert board_info is None
+    # board info, profiles, then the three above
+    assert simulator.requests == 7 + 1 + 3
+
+
+def test_simulator_flash():
+    simulator = SimulatedBoard(flash=bytes(range(100)), flash_read_limit=10)
+    assert simulator.respond(MSP.DATAFLASH_SUMMARY, b"") == reply_frame(
+        MSP.DATAFLASH_SUMMARY, b"\x03\x01\x00\x00\x00\xc8\x00\x00\x00\x64\x00\x00\x00"
+    )
+    # reads past the limit are cut short
+    read = simulator.respond(MSP.DATAFLASH_READ, b"\x05\x00\x00\x00\x40\x00\x00")
+    assert read == reply_frame(MSP.DATAFLASH_READ, b"\x05\x00\x00\x00\x0a\x00\x00" + bytes(range(5, 15)))
+
+
+async def test_simulated_board_refused_set(mocker):
+    async with SimulatedBoard() as simulator:
+        mocker.patch.object(simulator, "respond", side_effect=lambda code, payload: reply_frame(code, error=True))
+        board = Board(simulator.url, initial_data=False)
+        await board.ready.wait()
+        with pytest.raises(MessageError, match="refused"):
+            await board.set(SelectPID(2))
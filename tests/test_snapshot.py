@@ -0,0 +1,175 @@
+import pytest
+from pytest_mock import MockerFixture
+from semver import VersionInfo
+
+from bonfo.config.export import snapshot_conf
+from bonfo.config.root import BoardConf
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.base import LazyFields
+from bonfo.msp.fields.config import FeatureConfig, Features, RcTuning
+from bonfo.msp.fields.pids import PidAdvanced, PidCoefficients
+from bonfo.msp.fields.statuses import ApiVersion, CombinedBoardInfo, FcVariant, FcVersion, Name
+from bonfo.profile import ProfileMatrix
+from bonfo.snapshot import SNAPSHOT_VERSION, Snapshot, SnapshotRecord, diff_snapshots, snapshot_fields, take_snapshot
+
+
+def test_snapshot_fields():
+    readable = snapshot_fields()
+    assert ApiVersion in readable
+    assert Name in readable
+    # read per profile instead
+    assert PidAdvanced not in readable
+    assert RcTuning not in readable
+    # set only and live sensor fields
+    assert all(fields.get_code is not None for fields in readable)
+    assert all(fields.get_code not in (MSP.ATTITUDE, MSP.RAW_IMU) for fields in readable)
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = Snapshot(
+        records=[
+            SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"),
+            SnapshotRecord(MSP.PID_ADVANCED, b"\x01\x02", pid_profile=2),
+        ],
+        board=dict(name="bob"),
+    )
+    path = tmp_path / "snapshot.json"
+    snapshot.save(path)
+    loaded = Snapshot.load(path)
+    assert loaded == snapshot
+    assert loaded.version == SNAPSHOT_VERSION
+    assert loaded.get(ApiVersion) == ApiVersion(0, 1, 43)
+    assert loaded.find(MSP.PID_ADVANCED, pid=2).payload == b"\x01\x02"
+    assert loaded.find(MSP.PID_ADVANCED, pid=1) is None
+
+
+async def test_take_snapshot(mock_board, mocker: MockerFixture):
+    mock_board.info = CombinedBoardInfo(None, ApiVersion(0, 1, 43), FcVersion(4, 2, 11), None, None, None, None)
+    mock_board.get_many.side_effect = [
+        [ApiVersion.parse(b"\x00\x01\x2b", lazy=True), FcVariant.parse(b"BTFL", lazy=True)],
+        [None],
+    ]
+    mock_board.profile.read_all = mocker.AsyncMock(
+        return_value=ProfileMatrix(
+            pid={1: {PidCoefficients: PidCoefficients.parse(b"\x01" * 30, lazy=True)}},
+            rate={3: {RcTuning: None}},
+        )
+    )
+    progress = mocker.Mock()
+
+    snapshot = await take_snapshot(
+        mock_board,
+        fields=[ApiVersion, FcVariant, Name],
+        pid_fields=[PidCoefficients],
+        rate_fields=[RcTuning],
+        window=2,
+        progress=progress,
+    )
+
+    mock_board.get_many.assert_has_awaits(
+        [mocker.call(ApiVersion, FcVariant, lazy=True), mocker.call(Name, lazy=True)]
+    )
+    mock_board.profile.read_all.assert_awaited_once_with([PidCoefficients], [RcTuning], lazy=True)
+    assert snapshot.board == dict(api="0.1.43", version="4.2.11")
+    assert snapshot.records == [
+        SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"),
+        SnapshotRecord(MSP.FC_VARIANT, b"BTFL"),
+        SnapshotRecord(MSP.PID, b"\x01" * 30, pid_profile=1),
+    ]
+    assert progress.call_count == 3
+    report = progress.call_args.args[0]
+    # 3 + 3 pid profiles + 6 rate profiles
+    assert report.total == 12
+    assert report.done == 5
+    assert report.bytes == 5 * 6 + (3 + 4 + 30 + 3 * 6)
+
+
+def test_snapshot_binary_round_trip(tmp_path):
+    snapshot = Snapshot(
+        records=[
+            SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"),
+            SnapshotRecord(MSP.PID_ADVANCED, b"\x01\x02", pid_profile=2),
+            SnapshotRecord(MSP.RC_TUNING, b"", rate_profile=6),
+        ],
+        board=dict(name="bob", api="0.1.43"),
+    )
+    data = snapshot.to_bytes()
+    assert data.startswith(b"BFSN")
+    assert Snapshot.from_bytes(data) == snapshot
+    path = tmp_path / "snapshot.bsnap"
+    snapshot.save(path, binary=True)
+    assert Snapshot.load(path) == snapshot
+    with pytest.raises(ValueError):
+        Snapshot.from_bytes(b"NOPE" + data[4:])
+
+
+def test_snapshot_binary_lengths_are_checked():
+    data = Snapshot(
+        records=[SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"), SnapshotRecord(MSP.NAME, b"bob")],
+        board=dict(name="bob"),
+    ).to_bytes()
+    with pytest.raises(ValueError, match="Not a binary snapshot"):
+        Snapshot.from_bytes(data[:10])
+    with pytest.raises(ValueError, match="bytes of board metadata"):
+        Snapshot.from_bytes(data[:30])
+    with pytest.raises(ValueError, match="record 2 of 2 is missing"):
+        Snapshot.from_bytes(data[:-8])
+    with pytest.raises(ValueError, match="record 2 of 2 has 3 bytes of payload but 1 left"):
+        Snapshot.from_bytes(data[:-2])
+    with pytest.raises(ValueError, match="2 bytes after the last of 2 records"):
+        Snapshot.from_bytes(data + b"\x00\x00")
+
+
+def test_snapshot_decodes_lazily(mocker: MockerFixture):
+    snapshot = Snapshot(records=[SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b")], board=dict(api="0.1.43"))
+    api = snapshot.get(ApiVersion)
+    assert isinstance(api, LazyFields)
+    assert api.api_minor == 43
+    assert snapshot.get(ApiVersion, lazy=False) == ApiVersion(0, 1, 43)
+    assert snapshot.msp_version == VersionInfo(0, 1, 43)
+
+
+def test_diff_snapshots(mocker: MockerFixture):
+    before = Snapshot(
+        records=[
+            SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"),
+            SnapshotRecord(MSP.FEATURE_CONFIG, b"\x00\x04\x00\x00"),
+            SnapshotRecord(MSP.NAME, b"bob"),
+        ]
+    )
+    after = Snapshot(
+        records=[
+            SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"),
+            SnapshotRecord(MSP.FEATURE_CONFIG, b"\x00\x44\x00\x00"),
+            SnapshotRecord(MSP.FC_VARIANT, b"BTFL"),
+        ]
+    )
+    decode = mocker.spy(SnapshotRecord, "decode")
+    diffs = diff_snapshots(before, after)
+    # identical payloads are never decoded
+    assert decode.call_count == 2
+    assert [diff.key for diff in diffs] == [
+        (MSP.FEATURE_CONFIG, None, None),
+        (MSP.NAME, None, None),
+        (MSP.FC_VARIANT, None, None),
+    ]
+    features, name, variant = diffs
+    assert features.fields is FeatureConfig
+    assert features.changed == dict(features=(Features.OSD, Features.OSD | Features.AIRMODE))
+    assert name.after is None
+    assert variant.before is None
+
+
+def test_snapshot_conf():
+    snapshot = Snapshot(
+        records=[
+            SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2b"),
+            SnapshotRecord(MSP.FEATURE_CONFIG, b"\x00\x44\x00\x00"),
+            SnapshotRecord(MSP.RC_TUNING, bytes(23), rate_profile=2),
+        ],
+        board=dict(api="0.1.43"),
+    )
+    conf = snapshot_conf(snapshot)
+    assert conf.settings == dict(FeatureConfig=dict(features=["OSD", "AIRMODE"]))
+    assert conf.rate_profiles[2]["RcTuning"]["roll_rate"] == 0.0
+    assert BoardConf.from_yaml(conf.to_yaml()) == conf
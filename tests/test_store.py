@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bonfo.msp.codes import MSP
+from bonfo.snapshot import Snapshot, SnapshotRecord
+from bonfo.store import SnapshotStore, object_hash
+
+NOW = datetime(2022, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def make_snapshot(uid="aa", version="4.3.0", name=b"bob", created=NOW):
+    return Snapshot(
+        records=[
+            SnapshotRecord(MSP.NAME, name),
+            SnapshotRecord(MSP.API_VERSION, b"\x00\x01\x2c"),
+            SnapshotRecord(MSP.PID_ADVANCED, b"\x01\x02", pid_profile=2),
+        ],
+        board=dict(uid=uid, version=version, git_hash="abc"),
+        created=created,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    with SnapshotStore(tmp_path / "bonfo.db") as store:
+        yield store
+
+
+def test_object_hash():
+    assert object_hash(MSP.NAME, b"bob") == object_hash(MSP.NAME, b"bob")
+    # same bytes from a different message are a different object
+    assert object_hash(MSP.NAME, b"bob") != object_hash(MSP.SET_NAME, b"bob")
+
+
+def test_put_get(store):
+    snapshot = make_snapshot()
+    snapshot_id = store.put(snapshot)
+    assert store.get(snapshot_id) == snapshot
+    with pytest.raises(KeyError):
+        store.get(snapshot_id + 1)
+
+
+def test_payloads_are_stored_once(store):
+    for day in range(5):
+        store.put(make_snapshot(created=NOW + timedelta(days=day)))
+    store.put(make_snapshot(name=b"jim"))
+    assert store.stats() == dict(snapshots=6, objects=4, bytes=3 + 3 + 2 + 3)
+
+
+def test_find(store):
+    old = store.put(make_snapshot(created=NOW - timedelta(days=30)))
+    new = store.put(make_snapshot())
+    other = store.put(make_snapshot(uid="bb", version="4.2.11"))
+    assert [entry.id for entry in store.find()] == [other, new, old]
+    assert [entry.id for entry in store.find(uid="aa")] == [new, old]
+    assert [entry.id for entry in store.find(version="4.2.11")] == [other]
+    assert [entry.id for entry in store.find(since=NOW - timedelta(days=1))] == [other, new]
+    assert [entry.id for entry in store.find(until=NOW)] == [old]
+    assert [entry.id for entry in store.find(uid="aa", limit=1)] == [new]
+    assert store.latest("bb") == store.get(other)
+    assert store.latest("cc") is None
+
+
+def test_delete_collects_unused_payloads(store):
+    first = store.put(make_snapshot())
+    second = store.put(make_snapshot(name=b"jim"))
+    store.delete(second)
+    assert store.stats()["objects"] == 3
+    store.delete(first)
+    assert store.stats() == dict(snapshots=0, objects=0, bytes=0)
+
+
+def test_state(store):
+    assert store.get_state("port") is None
+    assert store.get_state("port", "default") == "default"
+    store.set_state("port", dict(device="/dev/tty"))
+    store.set_state("port", dict(device="/dev/tty0"))
+    assert store.get_state("port") == dict(device="/dev/tty0")
@@ -0,0 +1,112 @@
+import math
+
+import pytest
+
+from bonfo.msp.codes import MSP
+from bonfo.msp.fields.sensors import Attitude
+from bonfo.msp.fields.statuses import RawIMU, StatusEx
+from bonfo.msp.utils import parse_payload
+from bonfo.telemetry import Ring, TelemetryStore, flatten
+from tests import messages
+
+
+def attitude(roll: int, pitch: int = 0, yaw: int = 0) -> Attitude:
+    return Attitude(roll=roll, pitch=pitch, yaw=yaw)
+
+
+def test_flatten():
+    imu = RawIMU.parse(bytes(range(18)))
+    columns = flatten(imu)
+    names = ("accelerometer", "gyroscope", "magnetometer")
+    assert list(columns) == [f"{name}[{index}]" for name in names for index in range(3)]
+    assert columns["accelerometer[0]"] == 1.0
+    # lazy and compact results flatten the same way
+    assert flatten(RawIMU.parse(bytes(range(18)), lazy=True)) == columns
+    assert flatten(parse_payload(MSP.RAW_IMU, bytes(range(18)), compact=True)) == columns
+
+    status = flatten(StatusEx.parse(messages.status_ex_response[5:-1]))
+    # flags become numbers, bytes are left out
+    assert status["active_sensors"] == 33.0
+    assert "additional_mode" not in status
+
+
+def test_ring_wraps():
+    ring = Ring(["value"], 4)
+    for t in range(6):
+        ring.append(float(t), dict(value=t * 10.0))
+    assert len(ring) == 4
+    assert list(ring.read(ring.time, 0, 4)) == [2.0, 3.0, 4.0, 5.0]
+    assert list(ring.read(ring.columns["value"], 1, 3)) == [30.0, 40.0]
+    assert ring.row(3.5, 0) == 2
+    assert ring.covers(2.0)
+    assert not ring.covers(1.0)
+    # missing values are NaN
+    ring.append(6.0, dict())
+    assert math.isnan(ring.columns["value"][2])
+
+
+def test_store_raw_and_tiers():
+    store = TelemetryStore(size=100, resolutions=(1.0, 10.0), tier_size=10)
+    for sample in range(50):
+        store.append(attitude(sample), t=sample * 0.1)
+
+    raw = store.read(Attitude)
+    assert raw.resolution is None
+    assert len(raw) == 50
+    assert raw.mean["roll"] is raw.minimum["roll"]
+
+    tier = store.read(Attitude, points=10)
+    assert tier.resolution == 1.0
+    # the fifth second is still filling
+    assert list(tier.time) == [0.0, 1.0, 2.0, 3.0]
+    assert list(tier.minimum["roll"]) == [0.0, 10.0, 20.0, 30.0]
+    assert list(tier.maximum["roll"]) == [9.0, 19.0, 29.0, 39.0]
+    assert list(tier.mean["roll"]) == [4.5, 14.5, 24.5, 34.5]
+
+    # a range inside the raw ring reads just those samples
+    window = store.read(Attitude, start=1.0, stop=2.0)
+    assert list(window.mean["roll"]) == list(map(float, range(10, 20)))
+
+    with pytest.raises(KeyError):
+        store.read(RawIMU)
+
+
+def test_store_memory_is_constant():
+    store = TelemetryStore(size=50, resolutions=(1.0, 10.0), tier_size=20)
+    store.append(attitude(0), t=0.0)
+    allocated = store.nbytes
+    for sample in range(1, 5000):
+        store.append(attitude(sample % 100), t=sample * 0.1)
+    assert store.nbytes == allocated
+
+    # the raw ring holds the last 5 seconds and the 1 second tier the last 20, older starts read coarser tiers
+    assert store.read(Attitude, start=485.0).resolution == 1.0
+    hour = store.read(Attitude, start=300.0, points=20)
+    assert hour.resolution == 10.0
+    assert len(hour) == 19
+
+
+def test_store_filters_fields():
+    store = TelemetryStore(fields=(Attitude,))
+    store.append(RawIMU.parse(bytes(18)))
+    store.append(attitude(1))
+    assert list(store.histories) == [Attitude]
+    assert TelemetryStore(fields=None).fields is None
+
+
+def test_store_attach(mocker):
+    board = mocker.Mock()
+    store = TelemetryStore().attach(board)
+    board.subscribe.assert_called_once_with(store.append)
+    store.detach()
+    board.subscribe.return_value.assert_called_once_with()
+
+
+def test_series_to_numpy():
+    numpy = pytest.importorskip("numpy")
+    store = TelemetryStore()
+    for sample in range(3):
+        store.append(attitude(sample), t=float(sample))
+    times, columns = store.read(Attitude).to_numpy()
+    assert numpy.array_equal(columns["roll"], [0.0, 1.0, 2.0])
+    assert numpy.array_equal(times, [0.0, 1.0, 2.0])
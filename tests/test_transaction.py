@@ -0,0 +1,120 @@
+import functools
+
+import pytest
+from construct import Container
+from pytest_mock import MockerFixture
+
+from bonfo.board import Board
+from bonfo.exceptions import TransactionError
+from bonfo.msp.fields.config import EepromWrite, FeatureConfig, Features, RcTuning, SelectRate
+from bonfo.msp.fields.statuses import Name
+from bonfo.profile import Profile
+
+
+def ack(fields, message_type="IN"):
+    return Container(frame_id=fields.set_code, message_type=message_type)
+
+
+@pytest.fixture
+def board(mock_board, mocker: MockerFixture):
+    values = {
+        FeatureConfig: FeatureConfig(features=Features.OSD),
+        Name: Name(name="bob"),
+        RcTuning: RcTuning.parse(bytes(23)),
+    }
+    rejected = set()
+
+    async def set_many(*fields):
+        acks = []
+        for requested in fields:
+            if type(requested) in rejected:
+                acks.append(ack(requested, "ERR"))
+                continue
+            if not isinstance(requested, EepromWrite):
+                values[type(requested)] = requested
+            acks.append(ack(requested))
+        return acks
+
+    async def get_many(*fields, lazy=False):
+        return [values[requested] for requested in fields]
+
+    mock_board.set_many = mocker.AsyncMock(side_effect=set_many)
+    mock_board.get_many.side_effect = get_many
+    mock_board.get.return_value = Container(pid_profile=1, rate_profile=1)
+    mock_board.msp_version = None
+    mock_board.profile = Profile(board=mock_board)
+    mock_board.transaction = functools.partial(Board.transaction, mock_board)
+    mock_board.values = values
+    mock_board.rejected = rejected
+    return mock_board
+
+
+async def test_transaction_commit(board, mocker: MockerFixture):
+    features = FeatureConfig(features=Features.AIRMODE)
+    async with board.transaction() as transaction:
+        transaction.set(features)
+        transaction.set(Name(name="jim"))
+        assert len(transaction) == 2
+        # nothing sent until the context exits
+        board.set_many.assert_not_awaited()
+    assert board.set_many.await_args_list == [
+        mocker.call(features, Name(name="jim")),
+        mocker.call(EepromWrite()),
+    ]
+    # previous values read in one exchange
+    board.get_many.assert_awaited_once_with(FeatureConfig, Name)
+    assert board.values[Name] == Name(name="jim")
+
+
+async def test_transaction_body_raises(board):
+    with pytest.raises(RuntimeError):
+        async with board.transaction() as transaction:
+            transaction.set(Name(name="jim"))
+            raise RuntimeError()
+    board.set_many.assert_not_awaited()
+
+
+async def test_transaction_rollback(board, mocker: MockerFixture):
+    board.rejected.add(Name)
+    with pytest.raises(TransactionError) as error:
+        async with board.transaction() as transaction:
+            transaction.set(FeatureConfig(features=Features.AIRMODE))
+            transaction.set(Name(name="jim"))
+    assert error.value.failed == [Name(name="jim")]
+    assert error.value.rolled_back is False
+    # the accepted set was restored, and nothing saved
+    assert board.values[FeatureConfig] == FeatureConfig(features=Features.OSD)
+    assert mocker.call(EepromWrite()) not in board.set_many.await_args_list
+
+
+async def test_transaction_verify(board, mocker: MockerFixture):
+    original = board.values[FeatureConfig]
+
+    async def get_many(*fields, lazy=False):
+        # the board ignores the new value
+        return [original if requested is FeatureConfig else board.values[requested] for requested in fields]
+
+    board.get_many.side_effect = get_many
+    with pytest.raises(TransactionError) as error:
+        async with board.transaction(verify=True) as transaction:
+            transaction.set(FeatureConfig(features=Features.AIRMODE), previous=original)
+    assert error.value.rolled_back is True
+    assert board.values[FeatureConfig] == original
+
+
+async def test_transaction_profiles(board, mocker: MockerFixture):
+    selected = dict(rate=1)
+
+    async def set_fields(fields):
+        selected["rate"] = fields.profile["rate_profile"]
+
+    async def get_fields(fields, lazy=False):
+        return Container(pid_profile=1, rate_profile=selected["rate"])
+
+    board.set.side_effect = set_fields
+    board.get.side_effect = get_fields
+    tuning = RcTuning.parse(bytes(23))
+    async with board.transaction() as transaction:
+        transaction.set(tuning, rate=3)
+    assert board.set.await_args_list == [mocker.call(SelectRate(3)), mocker.call(SelectRate(1))]
+    assert board.set_many.await_args_list == [mocker.call(tuning), mocker.call(EepromWrite())]